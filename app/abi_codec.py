@@ -0,0 +1,150 @@
+from typing import List, Sequence, Tuple
+from eth_utils import keccak
+
+# Fixed-layout ABI encoders/decoders for the handful of calls on the hot
+# paths. Selectors are computed once at import; encoding is plain byte
+# concatenation of 32-byte words instead of generic eth_abi type dispatch.
+# Addresses are taken as 0x-prefixed hex in any case.
+
+
+def _selector(sig: str) -> bytes:
+    return keccak(text=sig)[:4]
+
+
+SEL_SWAP_EXACT_ETH_FOR_TOKENS = _selector(
+    "swapExactETHForTokens(uint256,address[],address,uint256)"
+)
+SEL_GET_AMOUNTS_OUT = _selector("getAmountsOut(uint256,address[])")
+SEL_BALANCE_OF = _selector("balanceOf(address)")
+SEL_DECIMALS = _selector("decimals()")
+SEL_APPROVE = _selector("approve(address,uint256)")
+SEL_GET_PAIR = _selector("getPair(address,address)")
+SEL_GET_RESERVES = _selector("getReserves()")
+SEL_GET_BLOCK_NUMBER = _selector("getBlockNumber()")
+SEL_AGGREGATE3 = _selector("aggregate3((address,bool,bytes)[])")
+
+_ZERO12 = bytes(12)
+_TRUE = (1).to_bytes(32, "big")
+_UINT256_MAX = 2**256 - 1
+
+
+def _word(n: int) -> bytes:
+    if not 0 <= n <= _UINT256_MAX:
+        raise ValueError(f"uint256 out of range: {n}")
+    return n.to_bytes(32, "big")
+
+
+def _addr(a: str) -> bytes:
+    raw = bytes.fromhex(a[2:] if a[:2] in ("0x", "0X") else a)
+    if len(raw) != 20:
+        raise ValueError(f"invalid address: {a}")
+    return _ZERO12 + raw
+
+
+def _addr_array(path: Sequence[str]) -> bytes:
+    return _word(len(path)) + b"".join(_addr(a) for a in path)
+
+
+def _padded(data: bytes) -> bytes:
+    return data + bytes(-len(data) % 32)
+
+
+# === Encoders ===
+
+
+def encode_swap_exact_eth_for_tokens(
+    amount_out_min: int, path: Sequence[str], to: str, deadline: int
+) -> bytes:
+    return (
+        SEL_SWAP_EXACT_ETH_FOR_TOKENS
+        + _word(amount_out_min)
+        + _word(0x80)  # offset of path: 4 head words
+        + _addr(to)
+        + _word(deadline)
+        + _addr_array(path)
+    )
+
+
+def encode_get_amounts_out(amount_in: int, path: Sequence[str]) -> bytes:
+    return SEL_GET_AMOUNTS_OUT + _word(amount_in) + _word(0x40) + _addr_array(path)
+
+
+def encode_balance_of(owner: str) -> bytes:
+    return SEL_BALANCE_OF + _addr(owner)
+
+
+def encode_approve(spender: str, value: int) -> bytes:
+    return SEL_APPROVE + _addr(spender) + _word(value)
+
+
+def encode_get_pair(token_a: str, token_b: str) -> bytes:
+    return SEL_GET_PAIR + _addr(token_a) + _addr(token_b)
+
+
+DECIMALS_CALLDATA = SEL_DECIMALS
+GET_RESERVES_CALLDATA = SEL_GET_RESERVES
+GET_BLOCK_NUMBER_CALLDATA = SEL_GET_BLOCK_NUMBER
+
+
+def encode_aggregate3(calls: Sequence[Tuple[str, bytes]]) -> bytes:
+    """aggregate3 with allowFailure=true on every (target, calldata)."""
+    heads: List[bytes] = []
+    tails: List[bytes] = []
+    offset = 32 * len(calls)
+    for target, data in calls:
+        heads.append(_word(offset))
+        # tuple: target, allowFailure, offset of callData (3 head words), callData
+        item = _addr(target) + _TRUE + _word(0x60) + _word(len(data)) + _padded(data)
+        tails.append(item)
+        offset += len(item)
+    return SEL_AGGREGATE3 + _word(0x20) + _word(len(calls)) + b"".join(heads) + b"".join(tails)
+
+
+# === Decoders ===
+
+
+def _read(data: bytes, pos: int) -> int:
+    if pos + 32 > len(data):
+        raise ValueError("ABI data too short")
+    return int.from_bytes(data[pos : pos + 32], "big")
+
+
+def decode_uint(data: bytes) -> int:
+    return _read(data, 0)
+
+
+def decode_address(data: bytes) -> str:
+    _read(data, 0)  # length check
+    return "0x" + data[12:32].hex()
+
+
+def decode_uint_array(data: bytes) -> List[int]:
+    """Single uint256[] return value (e.g. getAmountsOut)."""
+    start = _read(data, 0)
+    n = _read(data, start)
+    base = start + 32
+    if base + 32 * n > len(data):
+        raise ValueError("ABI data too short")
+    return [int.from_bytes(data[base + 32 * i : base + 32 * i + 32], "big") for i in range(n)]
+
+
+def decode_reserves(data: bytes) -> Tuple[int, int, int]:
+    """getReserves() → (reserve0, reserve1, blockTimestampLast)."""
+    return _read(data, 0), _read(data, 32), _read(data, 64)
+
+
+def decode_aggregate3(data: bytes) -> List[Tuple[bool, bytes]]:
+    """aggregate3 return value: (bool success, bytes returnData)[]."""
+    start = _read(data, 0)
+    n = _read(data, start)
+    base = start + 32
+    out: List[Tuple[bool, bytes]] = []
+    for i in range(n):
+        item = base + _read(data, base + 32 * i)
+        ok = _read(data, item) != 0
+        blob = item + _read(data, item + 32)
+        size = _read(data, blob)
+        if blob + 32 + size > len(data):
+            raise ValueError("ABI data too short")
+        out.append((ok, data[blob + 32 : blob + 32 + size]))
+    return out
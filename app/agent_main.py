@@ -1,3 +1,4 @@
+import asyncio
 import json
 import requests
 from uuid import uuid4
@@ -12,7 +13,7 @@ from uagents_core.contrib.protocols.chat import (
 )
 from uagents import Agent, Context, Protocol
 
-from .orders_kv import get_order
+from .orders_kv import get_order, list_active, migrate_orders, compact_orders
 from .config import (
     ASI1_BASE_URL,
     ASI1_HEADERS,
@@ -21,6 +22,8 @@ from .config import (
     BSC_RPC_URL,
     GAS_BUDGET_MULTIPLIER,
     MIN_SWAP_VALUE_WEI,
+    ORDERS_COMPACT_INTERVAL_S,
+    SETTLEMENT_FALLBACK_INTERVAL_S,
     explorer_address,
     explorer_token,
     explorer_tx,
@@ -28,7 +31,12 @@ from .config import (
 from .registry import LST_REGISTRY_BSC
 from .tools import tools_schema, dispatch_tool
 from .settlement import settlement_tick
-from .rpc import rpc
+from .heads import SettlementTrigger, follow_new_heads
+from .quoting import note_head
+from .market_poller import note_block, run_market_poller, run_onchain_prices
+from .peg_history import run_peg_recorder
+from .order_wallets import check_hd_orders, warm_pool
+from .rpc import async_rpc, close_clients
 
 
 def _text_msg(text: str) -> ChatMessage:
@@ -74,6 +82,8 @@ async def process_query(query: str, ctx: Context):
             if txh:
                 lines.append(f"- Tx: `{txh}`")
                 lines.append(f"  ↗ Explorer: {explorer_tx(txh)}")
+            if o.get("swap_delay_s") is not None:
+                lines.append(f"- Funding → swap: {o.get('swap_delay_s')}s")
             delivered = o.get("delivered_raw")
             if delivered is not None:
                 lines.append(f"- Delivered (raw units): {delivered}")
@@ -90,7 +100,9 @@ async def process_query(query: str, ctx: Context):
                 "Tool usage:\n"
                 "• When the user asks for LST list or prices, call the function list_lst_tokens.\n"
                 "• When the user asks for BNB price or BNB info, call the function get_bnb_info.\n"
+                "• When the user asks about LST peg history, depeg risk or peg stability, call the function get_peg_stats (optional symbol_or_address).\n"
                 "• When the user wants to buy an LST (or asks for a pay link that lets them send BNB), call the function create_managed_buy with symbol_or_address and recipient_address (optional slippage_bps).\n"
+                "• When the user wants pay links for many recipients at once (campaigns, airdrops), call the function create_managed_buys with the list of orders.\n"
                 "Behavior:\n"
                 "• After creating a managed pay link, instruct the user to send any BNB amount (including gas) to the provided order address; explain the agent will swap BNB→LST on PancakeSwap v2 and deliver tokens to the recipient.\n"
                 "• If the recipient address is missing, ask for it. If the token symbol is unknown, show the supported list.\n"
@@ -155,7 +167,7 @@ async def process_query(query: str, ctx: Context):
                 order_id = tool_result.get("order_id", "")
 
                 try:
-                    gp = rpc("eth_gasPrice", [])
+                    gp = await async_rpc("eth_gasPrice", [])
                     if "error" in gp:
                         raise RuntimeError(gp["error"].get("message", "gasPrice error"))
                     gas_price = int(gp["result"], 16)  # wei
@@ -183,6 +195,27 @@ async def process_query(query: str, ctx: Context):
                 )
                 return text
 
+            if func_name == "create_managed_buys" and "orders" in tool_result:
+                # Rendered directly: hundreds of orders don't belong in an LLM round trip.
+                lines = [
+                    f"🧾 **{tool_result['created']} managed orders created**"
+                    f" ({tool_result['failed']} failed)\n"
+                ]
+                for r in tool_result["orders"]:
+                    if r.get("ok"):
+                        lines.append(
+                            f"- {r['token']['symbol']} → `{r['recipient']}`: send BNB to "
+                            f"`{r['recv_addr']}` (order `{r['order_id']}`, "
+                            f"slippage {r['slippage_bps'] / 100:.2f}%) `{r['uri']}`"
+                        )
+                    else:
+                        lines.append(f"- item {r['index']}: ❌ {r['error']}")
+                lines.append(
+                    "\nAny amount (including gas) can be sent to each order address. "
+                    "Check an order with `/status <order_id>`."
+                )
+                return "\n".join(lines)
+
             if not tool_result.get("ok"):
                 err = tool_result.get("error", "Unknown error")
                 return f"Tool `{func_name}` failed: {err}"
@@ -208,6 +241,8 @@ async def process_query(query: str, ctx: Context):
 
 agent = Agent(name="bnb-chain-lst-agent", port=8001, mailbox=True)
 chat_proto = Protocol(spec=chat_protocol_spec)
+_trigger: SettlementTrigger | None = None
+_background: list[asyncio.Task] = []
 
 
 @agent.on_event("startup")
@@ -216,11 +251,54 @@ async def _startup(ctx: Context):
         f"🚀 Starting in {'DEV (testnet)' if IS_DEV else 'PROD (mainnet)'} mode | chainId={CHAIN_ID}"
     )
     ctx.logger.info(f"RPC: {BSC_RPC_URL}")
+    migrate_orders(ctx)
+    try:
+        check_hd_orders(ctx, list_active(ctx))
+    except RuntimeError as e:
+        # uAgents logs startup handler exceptions and keeps running; orders
+        # whose keys cannot be derived must stop the agent instead.
+        ctx.logger.error(str(e))
+        raise SystemExit(1) from e
+    warm_pool(ctx)
+
+    # Settlement wakes once per new block (newHeads, or HTTP polling).
+    global _trigger
+    _trigger = SettlementTrigger(lambda: settlement_tick(ctx))
+    _background.append(asyncio.create_task(_trigger.serve(ctx)))
+    _background.append(asyncio.create_task(follow_new_heads(ctx, _on_head)))
+    # Tools read prices / pool stats from the poller's in-memory snapshot;
+    # on-chain prices in it are re-read once per new block.
+    _background.append(asyncio.create_task(run_market_poller(ctx)))
+    _background.append(asyncio.create_task(run_onchain_prices(ctx)))
+    _background.append(asyncio.create_task(run_peg_recorder(ctx)))
+
+
+@agent.on_event("shutdown")
+async def _shutdown(ctx: Context):
+    for t in _background:
+        t.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+    _background.clear()
+    await close_clients()
+
+
+def _on_head(block_number: int) -> None:
+    note_head(block_number)
+    note_block(block_number)
+    if _trigger is not None:
+        _trigger.wake(block_number)
+
+
+@agent.on_interval(period=SETTLEMENT_FALLBACK_INTERVAL_S)
+async def _settle(ctx: Context):
+    # Safety net in case the head stream stalls; debounced by the trigger.
+    if _trigger is not None:
+        _trigger.wake()
 
 
-@agent.on_interval(period=6.0)
-async def _settle(ctx: Context):
-    await settlement_tick(ctx)
+@agent.on_interval(period=ORDERS_COMPACT_INTERVAL_S)
+async def _compact(ctx: Context):
+    compact_orders(ctx)
 
 
 @chat_proto.on_message(model=ChatMessage)
@@ -1,31 +1,100 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 from eth_account import Account
 from eth_account.datastructures import SignedTransaction as EASignedTx
+from eth_account.signers.local import LocalAccount
 from eth_utils import to_checksum_address
 from hexbytes import HexBytes
 
-from .rpc import rpc
+from .rpc import rpc, async_rpc, async_rpc_batch
 from .config import CHAIN_ID
 
 Account.enable_unaudited_hdwallet_features()
 
 
-def get_nonce(address: str) -> int:
-    j = rpc("eth_getTransactionCount", [to_checksum_address(address), "pending"])
+def _quantity(j: dict, what: str) -> int:
     if "error" in j:
-        raise RuntimeError(j["error"].get("message", "nonce error"))
+        raise RuntimeError(j["error"].get("message", f"{what} error"))
     return int(j["result"], 16)
 
 
+def _tx_hash(j: dict) -> str:
+    if "error" in j:
+        raise RuntimeError(j["error"].get("message", "eth_sendRawTransaction error"))
+    return j["result"]
+
+
+def get_nonce(address: str) -> int:
+    j = rpc("eth_getTransactionCount", [to_checksum_address(address), "pending"])
+    return _quantity(j, "nonce")
+
+
 def get_balance_wei(address: str) -> int:
     j = rpc("eth_getBalance", [to_checksum_address(address), "latest"])
-    if "error" in j:
-        raise RuntimeError(j["error"].get("message", "balance error"))
-    return int(j["result"], 16)
+    return _quantity(j, "balance")
+
+
+def _batch_calls(method: str, addresses: List[str], tag: str):
+    uniq = list(dict.fromkeys(to_checksum_address(a) for a in addresses))
+    return uniq, [(method, [a, tag]) for a in uniq]
+
+
+def _batch_quantities(uniq: List[str], res: List[dict]) -> Dict[str, int | None]:
+    """
+    Items that error come back as None so the caller can fall back to a
+    single call for just that address.
+    """
+    out: Dict[str, int | None] = {}
+    for a, j in zip(uniq, res):
+        try:
+            out[a] = int(j["result"], 16) if "error" not in j else None
+        except Exception:
+            out[a] = None
+    return out
 
 
 def send_raw_tx(raw_hex: str) -> str:
-    j = rpc("eth_sendRawTransaction", [raw_hex])
-    if "error" in j:
-        raise RuntimeError(j["error"].get("message", "eth_sendRawTransaction error"))
-    return j["result"]
+    return _tx_hash(rpc("eth_sendRawTransaction", [raw_hex]))
+
+
+async def async_get_nonce(address: str) -> int:
+    j = await async_rpc(
+        "eth_getTransactionCount", [to_checksum_address(address), "pending"]
+    )
+    return _quantity(j, "nonce")
+
+
+async def async_get_balance_wei(address: str) -> int:
+    j = await async_rpc("eth_getBalance", [to_checksum_address(address), "latest"])
+    return _quantity(j, "balance")
+
+
+async def async_get_balances_wei(addresses: List[str]) -> Dict[str, int | None]:
+    uniq, calls = _batch_calls("eth_getBalance", addresses, "latest")
+    return _batch_quantities(uniq, await async_rpc_batch(calls))
+
+
+async def async_get_nonces(addresses: List[str]) -> Dict[str, int | None]:
+    uniq, calls = _batch_calls("eth_getTransactionCount", addresses, "pending")
+    return _batch_quantities(uniq, await async_rpc_batch(calls))
+
+
+async def async_send_raw_tx(raw_hex: str) -> str:
+    return _tx_hash(await async_rpc("eth_sendRawTransaction", [raw_hex]))
+
+
+def sign_raw(acct: LocalAccount, tx: dict) -> str:
+    """Sign a legacy tx dict; returns the raw tx as 0x-hex."""
+    signed = acct.sign_transaction(tx)
+    if hasattr(signed, "rawTransaction"):
+        raw_bytes = bytes(HexBytes(getattr(signed, "rawTransaction")))
+    elif isinstance(signed, (bytes, bytearray, HexBytes)):
+        raw_bytes = bytes(HexBytes(signed))
+    elif hasattr(signed, "raw_transaction"):
+        raw_bytes = bytes(HexBytes(getattr(signed, "raw_transaction")))
+    else:
+        raise TypeError(f"Unsupported signed tx type: {type(signed)}")
+    return "0x" + HexBytes(raw_bytes).hex()
+
+
+async def async_sign_and_send(acct: LocalAccount, tx: dict) -> str:
+    return await async_send_raw_tx(sign_raw(acct, tx))
@@ -0,0 +1,82 @@
+from typing import Any, Callable, Dict, Hashable, Tuple
+import threading
+import time
+
+
+class SwrCache:
+    """
+    In-process TTL cache with stale-while-revalidate.
+
+    - younger than ttl_s: served as is
+    - older, but within max_stale_s: served immediately while one background
+      thread refreshes the entry
+    - missing or older than max_stale_s: loaded synchronously (one loader per
+      key; concurrent callers wait for it). If that load fails and any old
+      value exists, the old value is served instead of the error.
+
+    get() returns (value, age_s) so responses can say how old their data is.
+    """
+
+    def __init__(self, ttl_s: float, max_stale_s: float):
+        self.ttl_s = ttl_s
+        self.max_stale_s = max_stale_s
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing: set = set()
+        self._guard = threading.Lock()
+
+    def _lock(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[float, Any]:
+        value = loader()
+        entry = (time.time(), value)
+        self._entries[key] = entry
+        return entry
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            with self._lock(key):
+                self._load(key, loader)
+        except Exception:
+            pass  # keep serving the stale value; next get() retries
+        finally:
+            with self._guard:
+                self._refreshing.discard(key)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[Any, float]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = now - entry[0]
+            if age < self.ttl_s:
+                return entry[1], age
+            if age < self.max_stale_s:
+                with self._guard:
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    threading.Thread(
+                        target=self._refresh, args=(key, loader), daemon=True
+                    ).start()
+                return entry[1], age
+
+        with self._lock(key):
+            # Another caller may have loaded it while we waited.
+            fresh = self._entries.get(key)
+            if fresh is not None and time.time() - fresh[0] < self.ttl_s:
+                return fresh[1], time.time() - fresh[0]
+            try:
+                ts, value = self._load(key, loader)
+            except Exception:
+                if fresh is None:
+                    raise
+                return fresh[1], time.time() - fresh[0]
+        return value, time.time() - ts
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
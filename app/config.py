@@ -20,8 +20,16 @@ ASI1_HEADERS = {
 
 # === BNB Chain Config ===
 BSC_RPC_URL = os.getenv("BSC_RPC_URL_DEV") if IS_DEV else os.getenv("BSC_RPC_URL")
+# Optional websocket endpoint for eth_subscribe newHeads (HTTP polling otherwise)
+BSC_WS_URL = os.getenv("BSC_WS_URL_DEV") if IS_DEV else os.getenv("BSC_WS_URL")
 CHAIN_ID = 97 if IS_DEV else 56
 
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "16"))
+RPC_MAX_RETRIES = int(os.getenv("RPC_MAX_RETRIES", "3"))
+RPC_BACKOFF_S = float(os.getenv("RPC_BACKOFF_S", "0.25"))
+RPC_TIMEOUT_S = float(os.getenv("RPC_TIMEOUT_S", "20"))
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", "100"))
+
 def explorer_base() -> str:
     return "https://testnet.bscscan.com" if IS_DEV else "https://bscscan.com"
 
@@ -58,6 +66,33 @@ if not BSC_RPC_URL:
 GT_BASE = "https://api.geckoterminal.com/api/v2"
 CG_BASE = "https://api.coingecko.com/api/v3"
 
+# Price lookups are cached in-process: fresh for the per-source TTL, then
+# served stale (while refreshing in the background) up to PRICE_MAX_STALE_S
+BNB_PRICE_TTL_S = float(os.getenv("BNB_PRICE_TTL_S", "30"))
+LST_PRICE_TTL_S = float(os.getenv("LST_PRICE_TTL_S", "60"))
+DEX_PRICE_TTL_S = float(os.getenv("DEX_PRICE_TTL_S", "10"))
+PRICE_MAX_STALE_S = float(os.getenv("PRICE_MAX_STALE_S", "900"))
+# BNB price sources are hedged: the next source starts after this delay (or
+# as soon as the previous one fails); the whole race is bounded by the budget
+BNB_HEDGE_DELAY_S = float(os.getenv("BNB_HEDGE_DELAY_S", "0.5"))
+BNB_PRICE_BUDGET_S = float(os.getenv("BNB_PRICE_BUDGET_S", "6"))
+
+# Background market poller: prices / pool stats refresh intervals; tools fall
+# back to live lookups when the snapshot is older than MARKET_SNAPSHOT_MAX_AGE_S
+MARKET_POLL_INTERVAL_S = float(os.getenv("MARKET_POLL_INTERVAL_S", "30"))
+POOL_STATS_POLL_INTERVAL_S = float(os.getenv("POOL_STATS_POLL_INTERVAL_S", "300"))
+MARKET_SNAPSHOT_MAX_AGE_S = float(os.getenv("MARKET_SNAPSHOT_MAX_AGE_S", "900"))
+# Per-token pool stats cache for auto-slippage (failures cached for less)
+POOL_STATS_TTL_S = float(os.getenv("POOL_STATS_TTL_S", "300"))
+POOL_STATS_NEG_TTL_S = float(os.getenv("POOL_STATS_NEG_TTL_S", "60"))
+
+# Auto-slippage from the order's price impact on current reserves:
+# base + mult × impact, clamped to [min, max] (all bps)
+SLIPPAGE_BASE_BPS = int(os.getenv("SLIPPAGE_BASE_BPS", "50"))
+SLIPPAGE_IMPACT_MULT = float(os.getenv("SLIPPAGE_IMPACT_MULT", "1.0"))
+SLIPPAGE_MIN_BPS = int(os.getenv("SLIPPAGE_MIN_BPS", "50"))
+SLIPPAGE_MAX_BPS = int(os.getenv("SLIPPAGE_MAX_BPS", "300"))
+
 # === Binance config ===
 
 BINANCE_BASE = "https://api.binance.com"
@@ -69,11 +104,25 @@ PANCAKE_SWAP_BASE = "https://pancakeswap.finance/swap"
 
 if IS_DEV:
     ROUTER_V2 = "0x9Ac64Cc6e4415144C455BD8E4837Fea55603e5c3"  # Pancake V2 router (testnet)
+    FACTORY_V2 = "0x6725F303b657a9451d8BA641348b6761A6CC7a17"  # Pancake V2 factory (testnet)
     WBNB_BSC = "0xae13d989dac2f0debff460ac112a837c89baa7cd".lower()  # WBNB (testnet)
 else:
     ROUTER_V2 = "0x10ED43C718714eb63d5aA57B78B54704E256024E"  # Pancake V2 router (mainnet)
+    FACTORY_V2 = "0xcA143Ce32Fe78f1f7019d7d551a6402fC5350c73"  # Pancake V2 factory (mainnet)
     WBNB_BSC = "0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c".lower()  # WBNB (mainnet)
 
+# Multicall3 is deployed at the same address on BSC mainnet and testnet
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_CHUNK = int(os.getenv("MULTICALL3_CHUNK", "200"))
+
+# BSC-USD (USDT, 18 decimals) on mainnet; the WBNB/USDT pair prices BNB/USD
+USDT_BSC = "0x55d398326f99059fF775485246999027B3197955".lower()
+# LST pricing: "onchain" (pair reserves, per block; HTTP only for 24h change)
+# or "http" (CoinGecko / GeckoTerminal)
+LST_PRICE_MODE = os.getenv("LST_PRICE_MODE", "onchain").lower()
+# Pair reserves are cached per block; without a head feed, for this long
+RESERVES_TTL_S = float(os.getenv("RESERVES_TTL_S", "3"))
+
 # === Agent Wallet Config ===
 
 AGENT_PRIV = os.getenv("AGENT_PRIV")
@@ -82,6 +131,83 @@ if not AGENT_PRIV:
 
 GAS_BUDGET_MULTIPLIER = float(os.getenv("GAS_BUDGET_MULTIPLIER", "1.2"))
 MIN_SWAP_VALUE_WEI = int(os.getenv("MIN_SWAP_VALUE_WEI", str(200_000_000_000_000)))
+# Max orders settled concurrently per tick (1 = sequential)
+SETTLEMENT_CONCURRENCY = int(os.getenv("SETTLEMENT_CONCURRENCY", "8"))
+
+# Funding detection follows new blocks; a full balance sweep runs when the
+# cursor falls this many blocks behind
+FUNDING_MAX_BLOCKS = int(os.getenv("FUNDING_MAX_BLOCKS", "200"))
+# Blocks fetched per batched eth_getBlockByNumber request while catching up;
+# the cursor is persisted after each chunk
+FUNDING_CHUNK_BLOCKS = max(1, int(os.getenv("FUNDING_CHUNK_BLOCKS", "8")))
+# The cursor is kept in memory and written to ctx.storage at most this often;
+# after a restart the blocks since the last save are scanned again
+FUNDING_CURSOR_SAVE_S = float(os.getenv("FUNDING_CURSOR_SAVE_S", "60"))
+
+# Broadcast swaps without a receipt after this long are looked up in the
+# mempool: still pending → replaced (same nonce, gas price × RECEIPT_GAS_BUMP,
+# at most RECEIPT_MAX_REPLACEMENTS tries); unknown to the node → re-sent
+RECEIPT_TIMEOUT_S = float(os.getenv("RECEIPT_TIMEOUT_S", "300"))
+RECEIPT_GAS_BUMP = float(os.getenv("RECEIPT_GAS_BUMP", "1.125"))
+RECEIPT_MAX_REPLACEMENTS = int(os.getenv("RECEIPT_MAX_REPLACEMENTS", "3"))
+
+# Per-token swap gas model fed by receipt gasUsed: once a token has
+# GAS_MODEL_MIN_SAMPLES, settlement uses percentile × margin instead of
+# eth_estimateGas
+GAS_MODEL_MIN_SAMPLES = int(os.getenv("GAS_MODEL_MIN_SAMPLES", "5"))
+GAS_MODEL_WINDOW = int(os.getenv("GAS_MODEL_WINDOW", "50"))
+GAS_MODEL_PERCENTILE = float(os.getenv("GAS_MODEL_PERCENTILE", "95"))
+GAS_MODEL_MARGIN = float(os.getenv("GAS_MODEL_MARGIN", "1.2"))
+
+# Per-order polling schedule (seconds)
+SCHED_FAST_S = float(os.getenv("SCHED_FAST_S", "3"))
+SCHED_FRESH_WINDOW_S = float(os.getenv("SCHED_FRESH_WINDOW_S", "900"))
+SCHED_BASE_S = float(os.getenv("SCHED_BASE_S", "15"))
+SCHED_MAX_S = float(os.getenv("SCHED_MAX_S", "300"))
+SCHED_DORMANT_AFTER_S = float(os.getenv("SCHED_DORMANT_AFTER_S", str(24 * 3600)))
+SCHED_DORMANT_INTERVAL_S = float(os.getenv("SCHED_DORMANT_INTERVAL_S", "1800"))
+# Empty orders older than this are expired and stop being watched
+ORDER_EXPIRE_AFTER_S = float(os.getenv("ORDER_EXPIRE_AFTER_S", str(30 * 24 * 3600)))
+
+# Settlement runs once per new block; polling / safety-net intervals
+HEADS_POLL_INTERVAL_S = float(os.getenv("HEADS_POLL_INTERVAL_S", "1.5"))
+SETTLEMENT_FALLBACK_INTERVAL_S = float(os.getenv("SETTLEMENT_FALLBACK_INTERVAL_S", "30"))
+
+# === Order Store Config ===
+
+# "sqlite" (default) or "kv" (uAgents ctx.storage, whose JSON file is
+# rewritten whole on every commit)
+ORDERS_BACKEND = (os.getenv("ORDERS_BACKEND") or "sqlite").strip().lower()
+ORDERS_SQLITE_PATH = os.getenv("ORDERS_SQLITE_PATH", "orders.db")
+
+# complete/refunded orders older than this move to the append-only archive
+ORDERS_ARCHIVE_DIR = os.getenv("ORDERS_ARCHIVE_DIR", "orders_archive")
+ORDERS_ARCHIVE_AFTER_S = int(os.getenv("ORDERS_ARCHIVE_AFTER_S", str(7 * 24 * 3600)))
+ORDERS_COMPACT_INTERVAL_S = float(os.getenv("ORDERS_COMPACT_INTERVAL_S", "3600"))
+# JSONL audit log of every committed order change (empty disables it)
+ORDERS_CHANGELOG_PATH = os.getenv("ORDERS_CHANGELOG_PATH", "orders_changes.jsonl")
+# once the log reaches this size it is rotated to <path>.1 (0 disables rotation)
+ORDERS_CHANGELOG_MAX_BYTES = int(os.getenv("ORDERS_CHANGELOG_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Order deposit wallets: derived from this BIP-39 mnemonic by index
+# (ORDER_WALLET_PATH/<index>) when set; orders then store only the index.
+# Without it every order gets a random key stored in the order record.
+ORDER_WALLET_MNEMONIC = os.getenv("ORDER_WALLET_MNEMONIC") or None
+ORDER_WALLET_PATH = os.getenv("ORDER_WALLET_PATH", "m/44'/60'/0'/0")
+ORDER_ACCOUNT_CACHE_SIZE = int(os.getenv("ORDER_ACCOUNT_CACHE_SIZE", "256"))
+
+# Max orders per create_managed_buys call
+BULK_MAX_ORDERS = int(os.getenv("BULK_MAX_ORDERS", "500"))
+# Pre-derived wallet addresses kept ready; the default covers a full bulk call
+ORDER_WALLET_POOL_SIZE = int(os.getenv("ORDER_WALLET_POOL_SIZE", str(BULK_MAX_ORDERS)))
+
+# === Peg History Config ===
+
+# Fixed-cadence peg samples in memory-mapped ring buffers (default: 7 days of
+# one-minute samples per token)
+PEG_HISTORY_DIR = os.getenv("PEG_HISTORY_DIR", "peg_history")
+PEG_SAMPLE_INTERVAL_S = int(os.getenv("PEG_SAMPLE_INTERVAL_S", "60"))
+PEG_HISTORY_CAPACITY = int(os.getenv("PEG_HISTORY_CAPACITY", str(7 * 24 * 60)))
 
 # === General Config ===
 
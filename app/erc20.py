@@ -1,20 +1,29 @@
-from eth_abi import encode
-from eth_utils import to_checksum_address, keccak
-from .rpc import rpc_call_generic
-
-def _sel(sig: str) -> bytes:
-    return keccak(text=sig)[:4]
+from typing import List, Dict, Optional
+from eth_utils import to_checksum_address
+from .rpc import rpc_call_generic, multicall3
+from .abi_codec import DECIMALS_CALLDATA, encode_balance_of
 
 def erc20_balance_of(token: str, owner: str) -> int:
-    data = _sel("balanceOf(address)") + encode(["address"], [to_checksum_address(owner)])
+    data = encode_balance_of(owner)
     j = rpc_call_generic(to_checksum_address(token), "0x" + data.hex(), 0)
     if "error" in j:
         raise RuntimeError(j["error"].get("message", "balanceOf error"))
     return int(j["result"], 16)
 
 def erc20_decimals(token: str) -> int:
-    data = _sel("decimals()")
+    data = DECIMALS_CALLDATA
     j = rpc_call_generic(to_checksum_address(token), "0x" + data.hex(), 0)
     if "error" in j:
         raise RuntimeError(j["error"].get("message", "decimals error"))
     return int(j["result"], 16)
+
+def _uint_or_none(ok: bool, data: bytes) -> Optional[int]:
+    return int.from_bytes(data[:32], "big") if ok and len(data) >= 32 else None
+
+def erc20_decimals_many(tokens: List[str]) -> Dict[str, Optional[int]]:
+    """
+    decimals() for many tokens in one Multicall3 round trip, keyed by lowercase address.
+    """
+    uniq = list(dict.fromkeys(t.lower() for t in tokens))
+    res = multicall3([(to_checksum_address(t), DECIMALS_CALLDATA) for t in uniq])
+    return {t: _uint_or_none(ok, data) for t, (ok, data) in zip(uniq, res)}
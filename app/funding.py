@@ -0,0 +1,67 @@
+from typing import Dict, Any, List
+import time
+from uagents import Context
+
+from .rpc import async_rpc, async_rpc_batch
+from .config import FUNDING_MAX_BLOCKS, FUNDING_CHUNK_BLOCKS, FUNDING_CURSOR_SAVE_S
+
+FUNDING_CURSOR_KEY = "funding_cursor_v1"
+
+# Last scanned block. ctx.storage lags behind by up to FUNDING_CURSOR_SAVE_S:
+# saving it every block would rewrite the storage file once per block, and
+# re-scanning a few blocks after a restart only finds the same hits again.
+_cursor: int | None = None
+_saved_at = float("-inf")
+
+
+def _advance(ctx: Context, block: int, force: bool = False) -> None:
+    global _cursor, _saved_at
+    _cursor = block
+    now = time.monotonic()
+    if force or now - _saved_at >= FUNDING_CURSOR_SAVE_S:
+        ctx.storage.set(FUNDING_CURSOR_KEY, block)
+        _saved_at = now
+
+
+async def scan_funding(
+    ctx: Context, orders: List[Dict[str, Any]]
+) -> Dict[str, int] | None:
+    """
+    Follow new blocks (eth_getBlockByNumber with full transactions) from the
+    cursor and return {order_id: block_timestamp} for orders whose
+    recv_addr was the `to` of a transaction. Cost scales with blocks, not
+    with open orders. Blocks are read FUNDING_CHUNK_BLOCKS at a time and the
+    cursor advances after each chunk, so a failed read only repeats its own
+    chunk on the next tick.
+
+    Returns None when the caller should fall back to a full balance sweep:
+    first run, cursor too far behind, or a block read failed. Transfers made
+    by contracts never show up as a tx `to`; the order scheduler's periodic
+    re-checks cover those.
+    """
+    latest = int((await async_rpc("eth_blockNumber", []))["result"], 16)
+    cursor = _cursor if _cursor is not None else ctx.storage.get(FUNDING_CURSOR_KEY)
+
+    if cursor is None or latest - int(cursor) > FUNDING_MAX_BLOCKS:
+        _advance(ctx, latest, force=True)
+        return None
+    if latest <= int(cursor):
+        return {}
+
+    by_addr = {o["recv_addr"].lower(): o["id"] for o in orders}
+    hits: Dict[str, int] = {}
+    for start in range(int(cursor) + 1, latest + 1, FUNDING_CHUNK_BLOCKS):
+        end = min(start + FUNDING_CHUNK_BLOCKS, latest + 1)
+        blocks = await async_rpc_batch(
+            [("eth_getBlockByNumber", [hex(n), True]) for n in range(start, end)]
+        )
+        if any("error" in b or not b.get("result") for b in blocks):
+            return None
+        for b in blocks:
+            ts = int(b["result"].get("timestamp") or "0x0", 16)
+            for tx in b["result"].get("transactions") or []:
+                oid = by_addr.get((tx.get("to") or "").lower())
+                if oid:
+                    hits.setdefault(oid, ts)
+        _advance(ctx, end - 1)
+    return hits
@@ -0,0 +1,62 @@
+from typing import Dict, List, Optional
+import math
+from uagents import Context
+
+from .config import (
+    GAS_MODEL_MIN_SAMPLES,
+    GAS_MODEL_WINDOW,
+    GAS_MODEL_PERCENTILE,
+    GAS_MODEL_MARGIN,
+)
+
+GAS_MODEL_KEY = "gas_model_v1"
+
+# A revert that burned at least this share of the tx gas limit is treated
+# as out of gas rather than as a slippage/liquidity revert.
+OUT_OF_GAS_RATIO = 0.97
+
+
+def _load(ctx: Context) -> Dict[str, List[int]]:
+    return ctx.storage.get(GAS_MODEL_KEY) or {}
+
+
+def _percentile(samples: List[int], pct: float) -> int:
+    """Nearest-rank percentile."""
+    s = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(s)))
+    return s[min(rank, len(s)) - 1]
+
+
+def record_gas_used(ctx: Context, token: str, gas_used: int) -> None:
+    """Add a swap receipt's gasUsed to the token's rolling window."""
+    if gas_used <= 0:
+        return
+    model = _load(ctx)
+    samples = model.get(token.lower(), [])
+    samples.append(int(gas_used))
+    model[token.lower()] = samples[-GAS_MODEL_WINDOW:]
+    ctx.storage.set(GAS_MODEL_KEY, model)
+
+
+def forget(ctx: Context, token: str) -> None:
+    """Drop a token's samples so the next swap goes back to eth_estimateGas."""
+    model = _load(ctx)
+    if model.pop(token.lower(), None) is not None:
+        ctx.storage.set(GAS_MODEL_KEY, model)
+
+
+def is_out_of_gas(gas_used: int, gas_limit: int | None) -> bool:
+    """Whether a reverted tx used (nearly) all of its gas limit."""
+    return bool(gas_limit) and gas_used >= gas_limit * OUT_OF_GAS_RATIO
+
+
+def gas_limit_for(ctx: Context, token: str) -> Optional[int]:
+    """
+    Learned swap gas limit for WBNB→token: GAS_MODEL_PERCENTILE of the
+    recent gasUsed samples × GAS_MODEL_MARGIN. None while the model is cold
+    (fewer than GAS_MODEL_MIN_SAMPLES), in which case the caller estimates.
+    """
+    samples = _load(ctx).get(token.lower()) or []
+    if len(samples) < GAS_MODEL_MIN_SAMPLES:
+        return None
+    return int(_percentile(samples, GAS_MODEL_PERCENTILE) * GAS_MODEL_MARGIN)
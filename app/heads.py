@@ -0,0 +1,104 @@
+from typing import Awaitable, Callable
+import asyncio
+import json
+import time
+import aiohttp
+from uagents import Context
+
+from .rpc import async_rpc
+from .config import BSC_WS_URL, HEADS_POLL_INTERVAL_S
+
+
+class SettlementTrigger:
+    """
+    Debounced wake-up for settlement. wake() may be called from any source
+    (newHeads, HTTP polling, a fallback interval); at most one run is in
+    flight, and every wake that lands during a run collapses into a single
+    follow-up run.
+    """
+
+    def __init__(self, run: Callable[[], Awaitable[None]]):
+        self._run = run
+        self._event = asyncio.Event()
+        self.last_block: int | None = None
+        self.last_wake_at: float | None = None
+
+    def wake(self, block_number: int | None = None) -> None:
+        if block_number is not None:
+            self.last_block = block_number
+        self.last_wake_at = time.time()
+        self._event.set()
+
+    async def serve(self, ctx: Context) -> None:
+        while True:
+            await self._event.wait()
+            self._event.clear()
+            try:
+                await self._run()
+            except Exception as e:
+                ctx.logger.error(f"[heads] settlement run failed: {e}")
+
+
+async def _follow_ws(ctx: Context, on_head: Callable[[int], None]) -> None:
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(BSC_WS_URL, heartbeat=30) as ws:
+            await ws.send_str(
+                json.dumps(
+                    {
+                        "jsonrpc": "2.0",
+                        "id": 1,
+                        "method": "eth_subscribe",
+                        "params": ["newHeads"],
+                    }
+                )
+            )
+            ctx.logger.info(f"[heads] subscribed to newHeads via {BSC_WS_URL}")
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                j = json.loads(msg.data)
+                if "error" in j:
+                    raise RuntimeError(j["error"].get("message", "eth_subscribe error"))
+                head = (j.get("params") or {}).get("result") or {}
+                if head.get("number"):
+                    on_head(int(head["number"], 16))
+    raise ConnectionError("newHeads stream closed")
+
+
+async def _poll_heads(
+    on_head: Callable[[int], None], duration_s: float | None = None
+) -> None:
+    last = None
+    started = time.time()
+    while duration_s is None or time.time() - started < duration_s:
+        try:
+            n = int((await async_rpc("eth_blockNumber", []))["result"], 16)
+            if last is None or n > last:
+                last = n
+                on_head(n)
+        except Exception:
+            pass
+        await asyncio.sleep(HEADS_POLL_INTERVAL_S)
+
+
+async def follow_new_heads(ctx: Context, on_head: Callable[[int], None]) -> None:
+    """
+    Call on_head(block_number) once per new block. Uses eth_subscribe newHeads
+    over BSC_WS_URL when configured; while the websocket is down (or when no
+    URL is set) it polls eth_blockNumber over HTTP instead.
+    """
+    if not BSC_WS_URL:
+        ctx.logger.info("[heads] BSC_WS_URL not set, polling eth_blockNumber")
+        await _poll_heads(on_head)
+        return
+    backoff = 1.0
+    while True:
+        started = time.time()
+        try:
+            await _follow_ws(ctx, on_head)
+        except Exception as e:
+            ctx.logger.warning(f"[heads] websocket down ({e}); polling for {backoff:.0f}s")
+        if time.time() - started > 60:
+            backoff = 1.0
+        await _poll_heads(on_head, duration_s=backoff)
+        backoff = min(backoff * 2, 60.0)
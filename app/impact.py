@@ -0,0 +1,54 @@
+import math
+from typing import Dict, Tuple
+import numpy as np
+
+from .quoting import PANCAKE_V2_FEE_BPS, Reserves, amounts_out_v2
+from .config import SLIPPAGE_BASE_BPS, SLIPPAGE_IMPACT_MULT, SLIPPAGE_MIN_BPS, SLIPPAGE_MAX_BPS
+
+# Grid of input sizes the curve is evaluated at: 10^-4 … 10^4 BNB, log-spaced.
+_GRID_LOG10 = np.linspace(14, 22, 65)
+_GRID_WEI = [int(10 ** x) for x in _GRID_LOG10]
+
+# token (lowercase) -> (reserves the curve was built from, impact curve).
+# Reserves change at most once per block, so this is a per-block cache.
+_curves: Dict[str, Tuple[Reserves, np.ndarray]] = {}
+
+
+def impact_curve(token: str, reserves: Reserves) -> np.ndarray:
+    """
+    Price impact (bps, excluding the 0.25% fee) of a WBNB→token buy at every
+    _GRID_WEI size, from exact v2 outputs over the pair reserves.
+    """
+    token = token.lower()
+    hit = _curves.get(token)
+    if hit is not None and hit[0] == reserves:
+        return hit[1]
+    r_in, r_out = reserves
+    outs = amounts_out_v2(_GRID_WEI, r_in, r_out).astype(float)
+    # out at spot price after fee: a × (1 - fee) × r_out / r_in
+    spot = np.array(_GRID_WEI, dtype=float) * (10_000 - PANCAKE_V2_FEE_BPS) / 10_000 * r_out / r_in
+    curve = np.clip((1.0 - outs / spot) * 10_000, 0.0, 10_000.0)
+    _curves[token] = (reserves, curve)
+    return curve
+
+
+def impact_bps(token: str, amount_in_wei: int, reserves: Reserves) -> float:
+    """Interpolated price impact of buying with amount_in_wei, in bps."""
+    if amount_in_wei <= 0 or reserves[0] <= 0 or reserves[1] <= 0:
+        return 0.0
+    curve = impact_curve(token, reserves)
+    return float(np.interp(math.log10(amount_in_wei), _GRID_LOG10, curve))
+
+
+def impact_slippage_bps(token: str, amount_in_wei: int, reserves: Reserves) -> tuple[int, str]:
+    """
+    Slippage tolerance sized to the order. The local quote already prices in
+    our own impact; the tolerance covers other trades landing first, which
+    move a pool more the thinner it is relative to the order. So:
+    SLIPPAGE_BASE_BPS + SLIPPAGE_IMPACT_MULT × impact, clamped to
+    [SLIPPAGE_MIN_BPS, SLIPPAGE_MAX_BPS]. No network calls.
+    """
+    imp = impact_bps(token, amount_in_wei, reserves)
+    raw = SLIPPAGE_BASE_BPS + SLIPPAGE_IMPACT_MULT * imp
+    bps = int(min(max(round(raw), SLIPPAGE_MIN_BPS), SLIPPAGE_MAX_BPS))
+    return bps, f"price impact {imp / 100:.2f}% for this size → using {bps / 100:.2f}%"
@@ -1,9 +1,17 @@
 from uagents import Context
 from eth_utils import to_checksum_address
 from .utils import find_token
-from .orders_kv import create_order
+from .orders_kv import create_order, batch
+from .order_wallets import allocate_many, hd_enabled
 from .slippage import auto_slippage_bps
-from .config import CHAIN_ID
+from .config import CHAIN_ID, BULK_MAX_ORDERS
+
+
+def _user_slippage_bps(value) -> int:
+    bps = int(value)
+    if not 0 <= bps < 10_000:
+        raise ValueError(f"slippage_bps must be between 0 and 9999, got {bps}")
+    return bps
 
 
 def create_managed_buy(
@@ -18,29 +26,104 @@ def create_managed_buy(
 
     if slippage_bps is None:
         sbps, reason = auto_slippage_bps(token_addr)
+        reason += " (re-sized to the deposit's price impact at settlement)"
     else:
-        sbps, reason = slippage_bps, "user-specified"
+        sbps, reason = _user_slippage_bps(slippage_bps), "user-specified"
 
     ctx.logger.info(
         f"[managed] resolved token '{symbol_or_address}' -> {t['symbol']} @ {token_addr}"
     )
 
-    order = create_order(ctx, t["symbol"], token_addr, recip, sbps)
+    order = create_order(
+        ctx, t["symbol"], token_addr, recip, sbps, slippage_auto=slippage_bps is None
+    )
 
-    pay_addr = order["recv_addr"]
-    uri = f"ethereum:{pay_addr}@{CHAIN_ID}"
+    return {
+        **_order_result(order, t, token_addr, sbps, reason),
+        "notes": [
+            "Send BNB to the order address.",
+            "Amount can be any; include enough for gas.",
+            "Agent swaps BNB→LST and delivers tokens to your address.",
+        ],
+    }
 
+
+def _order_result(order: dict, t: dict, token_addr: str, sbps: int, reason: str) -> dict:
+    pay_addr = order["recv_addr"]
     return {
         "ok": True,
-        "uri": uri,
+        "uri": f"ethereum:{pay_addr}@{CHAIN_ID}",
         "order_id": order["id"],
         "recv_addr": pay_addr,
+        "recipient": order["recipient"],
         "slippage_bps": sbps,
         "slippage_reason": reason,
         "token": {"symbol": t["symbol"], "address": token_addr},
+    }
+
+
+def create_managed_buys(ctx: Context, items: list[dict]):
+    """
+    Bulk create_managed_buy for campaigns: items are
+    {"symbol_or_address", "recipient_address", optional "slippage_bps"}.
+    Auto-slippage is resolved once per token and every order is written in
+    a single store commit. Invalid items are reported per item and don't
+    stop the rest. Up to BULK_MAX_ORDERS items per call.
+    """
+    if len(items) > BULK_MAX_ORDERS:
+        return {
+            "ok": False,
+            "error": f"too many orders ({len(items)}); max {BULK_MAX_ORDERS} per call",
+        }
+
+    auto: dict[str, tuple[int, str]] = {}
+    results: list[dict | None] = [None] * len(items)
+    valid: list[tuple[int, dict, str, str, int, str]] = []
+    for i, it in enumerate(items):
+        try:
+            t = find_token(it["symbol_or_address"])
+            token_addr = to_checksum_address(t["address"])
+            recip = to_checksum_address(it["recipient_address"])
+            if it.get("slippage_bps") is None:
+                if token_addr not in auto:
+                    sbps, reason = auto_slippage_bps(token_addr)
+                    auto[token_addr] = (
+                        sbps,
+                        reason + " (re-sized to the deposit's price impact at settlement)",
+                    )
+                sbps, reason = auto[token_addr]
+            else:
+                sbps, reason = _user_slippage_bps(it["slippage_bps"]), "user-specified"
+        except Exception as e:
+            results[i] = {"ok": False, "index": i, "error": str(e)}
+            continue
+        valid.append((i, t, token_addr, recip, sbps, reason))
+
+    # HD wallet indices for the whole call are reserved with one counter write.
+    wallets = allocate_many(ctx, len(valid)) if hd_enabled() else [None] * len(valid)
+    with batch(ctx):
+        for (i, t, token_addr, recip, sbps, reason), wallet in zip(valid, wallets):
+            order = create_order(
+                ctx,
+                t["symbol"],
+                token_addr,
+                recip,
+                sbps,
+                slippage_auto=items[i].get("slippage_bps") is None,
+                hd_wallet=wallet,
+            )
+            results[i] = {**_order_result(order, t, token_addr, sbps, reason), "index": i}
+
+    created = sum(1 for r in results if r["ok"])
+    ctx.logger.info(f"[managed] bulk: created {created}/{len(items)} orders")
+    return {
+        "ok": created > 0,
+        "created": created,
+        "failed": len(items) - created,
+        "orders": results,
         "notes": [
-            "Send BNB to the order address.",
+            "Send BNB to each order address.",
             "Amount can be any; include enough for gas.",
-            "Agent swaps BNB→LST and delivers tokens to your address.",
+            "Agent swaps BNB→LST and delivers tokens to each recipient.",
         ],
     }
@@ -0,0 +1,64 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping
+import time
+
+from .config import MARKET_SNAPSHOT_MAX_AGE_S
+
+
+def freeze(d: Mapping | None) -> Mapping:
+    return MappingProxyType(dict(d or {}))
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Immutable market data published by the background poller. Readers take
+    a reference with current() and never see a half-updated snapshot; the
+    poller swaps in a new object each round.
+
+    - bnb_info: get_bnb_info() fields (without age_s)
+    - lst_prices: { address_lower: {"usd", "usd_24h_change", "last_updated_at"} }
+    - dex_prices: { address_lower: BNB per token | None }
+    - pool_stats: { address_lower: {"liquidity_usd", "price_change_24h"} }
+    - onchain: fetch_onchain_prices() result ("bnb_usd", "price_bnb",
+      "dex_price_bnb") from pair reserves, refreshed once per new block
+    - onchain_block: block number the on-chain prices were read at
+    - *_at: unix time each part was fetched (parts are refreshed independently)
+    """
+
+    bnb_info: Mapping[str, Any] = field(default_factory=lambda: freeze({}))
+    lst_prices: Mapping[str, Mapping[str, Any]] = field(default_factory=lambda: freeze({}))
+    dex_prices: Mapping[str, Any] = field(default_factory=lambda: freeze({}))
+    pool_stats: Mapping[str, Mapping[str, Any]] = field(default_factory=lambda: freeze({}))
+    onchain: Mapping[str, Any] = field(default_factory=lambda: freeze({}))
+    onchain_block: int | None = None
+    prices_at: float = 0.0
+    pool_stats_at: float = 0.0
+    onchain_at: float = 0.0
+
+
+_current: MarketSnapshot | None = None
+
+
+def publish(snapshot: MarketSnapshot) -> None:
+    global _current
+    _current = snapshot
+
+
+def current(part: str = "prices") -> MarketSnapshot | None:
+    """
+    The latest snapshot, or None when there is none yet or the requested
+    part ("prices", "pool_stats" or "onchain") is older than
+    MARKET_SNAPSHOT_MAX_AGE_S (poller stalled); callers then fall back.
+    """
+    snap = _current
+    if snap is None:
+        return None
+    at = {
+        "pool_stats": snap.pool_stats_at,
+        "onchain": snap.onchain_at,
+    }.get(part, snap.prices_at)
+    if time.time() - at > MARKET_SNAPSHOT_MAX_AGE_S:
+        return None
+    return snap
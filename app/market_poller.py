@@ -0,0 +1,121 @@
+import asyncio
+import time
+from dataclasses import replace
+from typing import Any, Dict
+from uagents import Context
+
+from .market import MarketSnapshot, freeze, publish
+from .prices import (
+    _fetch_bnb_info,
+    fetch_lst_prices_bsc,
+    fetch_dex_prices_bnb,
+    fetch_onchain_prices,
+)
+from .registry import LST_REGISTRY_BSC
+from .slippage import fetch_pool_stats_bsc
+from .config import (
+    MARKET_POLL_INTERVAL_S,
+    POOL_STATS_POLL_INTERVAL_S,
+    IS_DEV,
+    LST_PRICE_MODE,
+)
+
+_last: MarketSnapshot = MarketSnapshot()
+# Set by note_block for every new head; run_onchain_prices clears it per read.
+_new_block = asyncio.Event()
+_block: int | None = None
+
+
+def _merge(**parts: Any) -> None:
+    """
+    Fold freshly fetched parts into the snapshot and publish it. Runs on the
+    event loop, so refreshes running in threads never overwrite each other.
+    """
+    global _last
+    _last = replace(_last, **parts)
+    publish(_last)
+
+
+def refresh_prices() -> Dict[str, Any]:
+    """
+    BNB info and LST USD prices, plus the router DEX prices in HTTP mode (in
+    on-chain mode those come from the per-block reserves read instead).
+    Raises if any source fails.
+    """
+    addrs = [t["address"] for t in LST_REGISTRY_BSC]
+    id_map = {t["address"].lower(): t.get("coingecko_id") for t in LST_REGISTRY_BSC}
+    parts: Dict[str, Any] = {
+        "bnb_info": freeze(_fetch_bnb_info()),
+        "lst_prices": freeze(
+            {k: freeze(v) for k, v in fetch_lst_prices_bsc(addrs, id_map).items()}
+        ),
+    }
+    if LST_PRICE_MODE != "onchain":
+        parts["dex_prices"] = freeze(fetch_dex_prices_bnb(addrs))
+    parts["prices_at"] = time.time()
+    return parts
+
+
+def refresh_pool_stats(old: MarketSnapshot) -> Dict[str, Any]:
+    """GeckoTerminal pool stats per registry token; failed tokens keep old stats."""
+    stats = dict(old.pool_stats)
+    for t in LST_REGISTRY_BSC:
+        s = fetch_pool_stats_bsc(t["address"])
+        if s:
+            stats[t["address"].lower()] = freeze(s)
+    return {"pool_stats": freeze(stats), "pool_stats_at": time.time()}
+
+
+def refresh_onchain(block_number: int | None) -> Dict[str, Any]:
+    """Registry + BNB/USD prices from pair reserves (one Multicall3 eth_call)."""
+    chain = fetch_onchain_prices([t["address"] for t in LST_REGISTRY_BSC])
+    if chain["bnb_usd"] is None:
+        raise ValueError("WBNB/USDT reserves unavailable")
+    return {
+        "onchain": freeze({k: freeze(v) if isinstance(v, dict) else v for k, v in chain.items()}),
+        "onchain_block": block_number,
+        "onchain_at": time.time(),
+    }
+
+
+def note_block(block_number: int) -> None:
+    """newHeads hook: schedule an on-chain price read for this block."""
+    global _block
+    _block = block_number
+    _new_block.set()
+
+
+async def run_market_poller(ctx: Context) -> None:
+    """
+    Refresh the market snapshot every MARKET_POLL_INTERVAL_S (pool stats
+    every POOL_STATS_POLL_INTERVAL_S). Upstream traffic is fixed by these
+    intervals, independent of chat load. Failed rounds keep serving the
+    previous snapshot until it's too old (see market.current).
+    """
+    if IS_DEV:
+        return
+    while True:
+        try:
+            _merge(**await asyncio.to_thread(refresh_prices))
+        except Exception as e:
+            ctx.logger.warning(f"[market] price refresh failed: {e}")
+        if time.time() - _last.pool_stats_at >= POOL_STATS_POLL_INTERVAL_S:
+            _merge(**await asyncio.to_thread(refresh_pool_stats, _last))
+        await asyncio.sleep(MARKET_POLL_INTERVAL_S)
+
+
+async def run_onchain_prices(ctx: Context) -> None:
+    """
+    In on-chain mode, re-read pair reserves once per new block (see
+    note_block) and publish them in the snapshot. Heads that arrive during
+    a read collapse into one follow-up read.
+    """
+    if IS_DEV or LST_PRICE_MODE != "onchain":
+        return
+    while True:
+        await _new_block.wait()
+        _new_block.clear()
+        try:
+            _merge(**await asyncio.to_thread(refresh_onchain, _block))
+        except Exception as e:
+            ctx.logger.warning(f"[market] on-chain price refresh failed: {e}")
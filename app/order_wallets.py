@@ -0,0 +1,179 @@
+from typing import Dict, List, Tuple
+from functools import lru_cache
+import threading
+from eth_account import Account
+from eth_account.hdaccount import key_from_seed, seed_from_mnemonic
+from eth_account.hdaccount.deterministic import (
+    SECP256K1_N,
+    Node,
+    SoftNode,
+    derive_child_key,
+    ec_point,
+    hmac_sha512,
+)
+from eth_account.signers.local import LocalAccount
+from uagents import Context
+
+from .config import (
+    ORDER_WALLET_MNEMONIC,
+    ORDER_WALLET_PATH,
+    ORDER_WALLET_POOL_SIZE,
+    ORDER_ACCOUNT_CACHE_SIZE,
+)
+
+NEXT_INDEX_KEY = "order_wallet_next_v1"
+
+_seed: bytes | None = None
+# (key, chain code, compressed public key) at ORDER_WALLET_PATH
+_parent: Tuple[bytes, bytes, bytes] | None = None
+
+
+def hd_enabled() -> bool:
+    return bool(ORDER_WALLET_MNEMONIC)
+
+
+def _get_seed() -> bytes:
+    # BIP-39 seed stretching (PBKDF2, 2048 rounds) runs once per process.
+    global _seed
+    if _seed is None:
+        if not ORDER_WALLET_MNEMONIC:
+            raise RuntimeError("ORDER_WALLET_MNEMONIC not set; cannot derive HD order wallets")
+        _seed = seed_from_mnemonic(ORDER_WALLET_MNEMONIC, "")
+    return _seed
+
+
+def _parent_node() -> Tuple[bytes, bytes, bytes]:
+    # Derived once per process: every order wallet is a soft child of it.
+    global _parent
+    if _parent is None:
+        node = hmac_sha512(b"Bitcoin seed", _get_seed())
+        key, chain = node[:32], node[32:]
+        for part in ORDER_WALLET_PATH.split("/")[1:]:
+            key, chain = derive_child_key(key, chain, Node.decode(part))
+        _parent = (key, chain, ec_point(key))
+    return _parent
+
+
+def _key(index: int) -> bytes:
+    """
+    BIP-32 CKDpriv of ORDER_WALLET_PATH/index from the cached parent, so no
+    curve multiplication is needed (key_from_seed re-derives the whole path
+    and its public keys on every call).
+    """
+    key, chain, pub = _parent_node()
+    i = hmac_sha512(chain, pub + SoftNode(int(index)).serialize())
+    child = (int.from_bytes(i[:32], "big") + int.from_bytes(key, "big")) % SECP256K1_N
+    if int.from_bytes(i[:32], "big") >= SECP256K1_N or child == 0:
+        # Invalid child (p < 2^-127): the library's rule skips to the next one.
+        return key_from_seed(_get_seed(), f"{ORDER_WALLET_PATH}/{int(index)}")
+    return child.to_bytes(32, "big")
+
+
+@lru_cache(maxsize=ORDER_ACCOUNT_CACHE_SIZE)
+def account_for(index: int) -> LocalAccount:
+    """Signing account of HD order wallet `index` (LRU-cached)."""
+    return Account.from_key(_key(index))
+
+
+@lru_cache(maxsize=ORDER_ACCOUNT_CACHE_SIZE)
+def _account_from_key(priv: str) -> LocalAccount:
+    return Account.from_key(priv)
+
+
+def order_account(o: dict) -> LocalAccount:
+    """
+    Signing account for an order: HD orders store only wallet_index; orders
+    created before HD wallets (or without a mnemonic) carry recv_priv.
+    """
+    if o.get("wallet_index") is not None:
+        return account_for(int(o["wallet_index"]))
+    return _account_from_key(o["recv_priv"])
+
+
+class AddressPool:
+    """
+    Addresses of the next ORDER_WALLET_POOL_SIZE wallet indices, derived by a
+    background thread so allocate() is a dict lookup. The pool is topped up
+    after every allocation and by default covers a full BULK_MAX_ORDERS
+    call; a miss (bursts back to back) derives inline.
+    """
+
+    def __init__(self, size: int = ORDER_WALLET_POOL_SIZE):
+        self.size = int(size)
+        self._addrs: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._refilling = False
+
+    def _fill(self, start: int) -> None:
+        try:
+            for i in range(start, start + self.size):
+                if i in self._addrs:
+                    continue
+                addr = Account.from_key(_key(i)).address
+                with self._lock:
+                    self._addrs[i] = addr
+        finally:
+            with self._lock:
+                self._refilling = False
+
+    def refill(self, start: int) -> None:
+        with self._lock:
+            for i in [i for i in self._addrs if i < start]:
+                del self._addrs[i]
+            if self._refilling or len(self._addrs) >= self.size:
+                return
+            self._refilling = True
+        threading.Thread(target=self._fill, args=(start,), daemon=True).start()
+
+    def take(self, index: int) -> str:
+        with self._lock:
+            addr = self._addrs.pop(index, None)
+        return addr or account_for(index).address
+
+
+_pool = AddressPool()
+
+
+def warm_pool(ctx: Context) -> None:
+    """Start deriving addresses from the persisted next index (startup)."""
+    if hd_enabled():
+        _pool.refill(int(ctx.storage.get(NEXT_INDEX_KEY) or 0))
+
+
+def check_hd_orders(ctx: Context, orders: List[dict]) -> None:
+    """
+    Startup check: raise if HD wallet indices were handed out (counter or a
+    stored order with wallet_index) but ORDER_WALLET_MNEMONIC is not set,
+    since those orders could never be signed for.
+    """
+    if hd_enabled():
+        return
+    issued = int(ctx.storage.get(NEXT_INDEX_KEY) or 0)
+    held = sum(1 for o in orders if o.get("wallet_index") is not None)
+    if issued or held:
+        raise RuntimeError(
+            f"ORDER_WALLET_MNEMONIC not set, but {held} open orders (and "
+            f"{issued} issued wallet indices) use HD order wallets. Set the "
+            "mnemonic they were created with."
+        )
+
+
+def allocate_many(ctx: Context, n: int) -> List[Tuple[int, str]]:
+    """
+    Reserve the next n wallet indices with a single counter write and return
+    their (index, address) pairs. The counter is persisted before the orders
+    are written, so an index is never handed out twice; an aborted order
+    batch only leaves a gap.
+    """
+    if n <= 0:
+        return []
+    start = int(ctx.storage.get(NEXT_INDEX_KEY) or 0)
+    ctx.storage.set(NEXT_INDEX_KEY, start + n)
+    wallets = [(i, _pool.take(i)) for i in range(start, start + n)]
+    _pool.refill(start + n)
+    return wallets
+
+
+def allocate(ctx: Context) -> Tuple[int, str]:
+    """Reserve the next wallet index and return (index, address)."""
+    return allocate_many(ctx, 1)[0]
@@ -0,0 +1,102 @@
+from typing import Dict, Any, List, Iterable
+import json
+import os
+import struct
+import zlib
+
+_HEADER = struct.Struct(">I")  # record length prefix
+_INDEX_FILE = "index.json"
+
+
+class OrderArchive:
+    """
+    Append-only archive for orders that can no longer change.
+
+    Orders are written to numbered segment files as length-prefixed,
+    zlib-compressed JSON records. A small offset index
+    {order_id: [segment, offset, length]} is kept in index.json, loaded
+    lazily, so get() is a single seek + read + decompress.
+    """
+
+    def __init__(self, root: str, segment_max_bytes: int = 16 * 1024 * 1024):
+        self.root = root
+        self.segment_max_bytes = int(segment_max_bytes)
+        self._index: Dict[str, List[int]] | None = None
+
+    def _segment_path(self, seg: int) -> str:
+        return os.path.join(self.root, f"segment-{seg:05d}.log")
+
+    def _load_index(self) -> Dict[str, List[int]]:
+        if self._index is None:
+            try:
+                with open(os.path.join(self.root, _INDEX_FILE)) as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {}
+        return self._index
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.root, _INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _current_segment(self) -> int:
+        segs = [
+            int(n[8:13])
+            for n in os.listdir(self.root)
+            if n.startswith("segment-") and n.endswith(".log")
+        ]
+        seg = max(segs) if segs else 1
+        path = self._segment_path(seg)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_max_bytes:
+            seg += 1
+        return seg
+
+    def append(self, orders: Iterable[Dict[str, Any]]) -> int:
+        """
+        Append orders and persist the index. Returns how many were written.
+        Records hit disk (fsync) before the index references them.
+        """
+        orders = list(orders)
+        if not orders:
+            return 0
+        os.makedirs(self.root, exist_ok=True)
+        index = self._load_index()
+        seg = self._current_segment()
+        f = open(self._segment_path(seg), "ab")
+        try:
+            for o in orders:
+                if f.tell() >= self.segment_max_bytes:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    f.close()
+                    seg += 1
+                    f = open(self._segment_path(seg), "ab")
+                blob = zlib.compress(json.dumps(o, separators=(",", ":")).encode())
+                offset = f.tell()
+                f.write(_HEADER.pack(len(blob)) + blob)
+                index[o["id"]] = [seg, offset, _HEADER.size + len(blob)]
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        self._save_index()
+        return len(orders)
+
+    def get(self, order_id: str) -> Dict[str, Any] | None:
+        loc = self._load_index().get(order_id)
+        if not loc:
+            return None
+        seg, offset, length = loc
+        with open(self._segment_path(seg), "rb") as f:
+            f.seek(offset)
+            raw = f.read(length)
+        (n,) = _HEADER.unpack_from(raw)
+        return json.loads(zlib.decompress(raw[_HEADER.size : _HEADER.size + n]))
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._load_index()
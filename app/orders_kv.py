@@ -1,24 +1,358 @@
-from typing import Dict, Any, List
-import secrets, time
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import copy, json, os, secrets, time
 from eth_account import Account
 from uagents import Context
+from uagents.storage import KeyValueStore
 
-ORDERS_KEY = "orders_v5"
+from .config import (
+    ORDERS_BACKEND,
+    ORDERS_SQLITE_PATH,
+    ORDERS_ARCHIVE_DIR,
+    ORDERS_ARCHIVE_AFTER_S,
+    ORDERS_CHANGELOG_PATH,
+    ORDERS_CHANGELOG_MAX_BYTES,
+)
+from .orders_sqlite import SqliteOrderStore
+from .orders_archive import OrderArchive
+from .order_wallets import allocate, hd_enabled
 
+# Layout: one storage key per order plus an index of the ids that can still
+# change, so list_active is O(active). KeyValueStore still rewrites its whole
+# JSON file on every save, so each commit is saved once (see _kv_commit) and
+# SQLite is the default backend.
+ORDER_KEY_PREFIX = "order_v6:"
+ACTIVE_INDEX_KEY = "orders_active_v6"
+ACTIVE_STATUSES = ("pending", "refund_pending", "broadcast")
 
-def _load(ctx: Context) -> Dict[str, Any]:
-    return ctx.storage.get(ORDERS_KEY) or {}
+# Terminal orders are listed as [id, finished_at] until compact_orders moves
+# them into the append-only archive.
+DONE_INDEX_KEY = "orders_done_v6"
+TERMINAL_STATUSES = ("complete", "refunded", "expired")
 
+# Multi-order commits on a storage that writes per key (anything but
+# KeyValueStore) are written here first and replayed on startup if the agent
+# died half way through applying them.
+JOURNAL_KEY = "orders_journal_v6"
 
-def _save(ctx: Context, orders: Dict[str, Any]) -> None:
-    ctx.storage.set(ORDERS_KEY, orders)
+# Pre-v6 layout: every order in one dict under a single key.
+LEGACY_ORDERS_KEY = "orders_v5"
+
+# Never written to the change log.
+_UNLOGGED_FIELDS = ("recv_priv",)
+
+# ORDERS_BACKEND=sqlite swaps ctx.storage for a SQLite (WAL) database with
+# the same public functions below.
+_sqlite: SqliteOrderStore | None = None
+_archive = OrderArchive(ORDERS_ARCHIVE_DIR)
+
+
+def _sql() -> SqliteOrderStore | None:
+    global _sqlite
+    if ORDERS_BACKEND != "sqlite":
+        return None
+    if _sqlite is None:
+        _sqlite = SqliteOrderStore(ORDERS_SQLITE_PATH)
+    return _sqlite
+
+
+def _key(order_id: str) -> str:
+    return f"{ORDER_KEY_PREFIX}{order_id}"
+
+
+def _active_ids(ctx: Context) -> List[str]:
+    return list(ctx.storage.get(ACTIVE_INDEX_KEY) or [])
+
+
+def _done_entries(ctx: Context) -> List[list]:
+    return list(ctx.storage.get(DONE_INDEX_KEY) or [])
+
+
+def _finished_at(order: Dict[str, Any]) -> int:
+    return int(order.get("finished_at") or order.get("created_at") or 0)
+
+
+def _index_updates(ctx: Context, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The active and done indexes brought in line with `orders`; only indexes
+    that changed are returned.
+    """
+    ids = _active_ids(ctx)
+    done = _done_entries(ctx)
+    done_ids = {oid for oid, _ in done}
+    ids_changed = done_changed = False
+    for o in orders:
+        active = o.get("status") in ACTIVE_STATUSES
+        if active and o["id"] not in ids:
+            ids.append(o["id"])
+            ids_changed = True
+        elif not active and o["id"] in ids:
+            ids.remove(o["id"])
+            ids_changed = True
+        if o.get("status") in TERMINAL_STATUSES and o["id"] not in done_ids:
+            done.append([o["id"], _finished_at(o)])
+            done_ids.add(o["id"])
+            done_changed = True
+    updates: Dict[str, Any] = {}
+    if ids_changed:
+        updates[ACTIVE_INDEX_KEY] = ids
+    if done_changed:
+        updates[DONE_INDEX_KEY] = done
+    return updates
+
+
+def _single_save(ctx: Context) -> bool:
+    return isinstance(ctx.storage, KeyValueStore)
+
+
+def _kv_commit(
+    ctx: Context, sets: Dict[str, Any], removes: Iterable[str] = ()
+) -> None:
+    """
+    Apply several ctx.storage changes. KeyValueStore rewrites its whole JSON
+    file on every set/remove, so there the dict is updated in place and saved
+    once; other storages get one call per key.
+    """
+    store = ctx.storage
+    if _single_save(ctx):
+        store._data.update(sets)
+        for k in removes:
+            store._data.pop(k, None)
+        store._save()
+        return
+    for k, v in sets.items():
+        store.set(k, v)
+    for k in removes:
+        if store.has(k):
+            store.remove(k)
+
+
+def _apply_kv(
+    ctx: Context, orders: List[Dict[str, Any]], removes: Iterable[str] = ()
+) -> None:
+    sets = {_key(o["id"]): o for o in orders}
+    sets.update(_index_updates(ctx, orders))
+    _kv_commit(ctx, sets, removes)
+
+
+def _write(ctx: Context, orders: List[Dict[str, Any]]) -> None:
+    """
+    Persist a set of orders as one unit: a single SQLite transaction, one
+    KeyValueStore save, or for other storages a journal write (the commit
+    point) followed by the per-order keys and indexes.
+    """
+    db = _sql()
+    if db is not None:
+        db.put_many(orders)
+        return
+    if len(orders) == 1 or _single_save(ctx):
+        _apply_kv(ctx, orders)
+        return
+    ctx.storage.set(JOURNAL_KEY, orders)
+    _apply_kv(ctx, orders, removes=[JOURNAL_KEY])
+
+
+def _append_changelog(changes: List[Dict[str, Any]]) -> None:
+    if not changes or not ORDERS_CHANGELOG_PATH:
+        return
+    # One rotated generation is kept; older history is dropped.
+    path = ORDERS_CHANGELOG_PATH
+    try:
+        if ORDERS_CHANGELOG_MAX_BYTES and os.path.getsize(path) >= ORDERS_CHANGELOG_MAX_BYTES:
+            os.replace(path, path + ".1")
+    except FileNotFoundError:
+        pass
+    with open(path, "a") as f:
+        for c in changes:
+            f.write(json.dumps(c, separators=(",", ":")) + "\n")
+
+
+class OrderBatch:
+    """
+    Unit of work over the order store. Mutations made while the batch is open
+    are staged in memory (reads see them) and written in one commit, together
+    with a change-log entry per touched field set.
+    """
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+        self.staged: Dict[str, Dict[str, Any]] = {}
+        self.changes: List[Dict[str, Any]] = []
+
+    def get(self, order_id: str) -> Dict[str, Any] | None:
+        if order_id in self.staged:
+            return self.staged[order_id]
+        return _load(self.ctx, order_id)
+
+    def stage(self, order: Dict[str, Any], changed: Dict[str, Any]) -> None:
+        self.staged[order["id"]] = order
+        if changed:
+            self.changes.append(
+                {
+                    "ts": int(time.time()),
+                    "id": order["id"],
+                    "changes": {
+                        k: v for k, v in changed.items() if k not in _UNLOGGED_FIELDS
+                    },
+                }
+            )
+
+    def commit(self) -> None:
+        if not self.staged:
+            return
+        _write(self.ctx, list(self.staged.values()))
+        _append_changelog(self.changes)
+        self.staged.clear()
+        self.changes.clear()
+
+
+_current_batch: ContextVar[OrderBatch | None] = ContextVar(
+    "orders_batch", default=None
+)
+
+
+@contextmanager
+def batch(ctx: Context) -> Iterator[OrderBatch]:
+    """
+    with batch(ctx) as tx: ... — every create/mark_*/set_* call inside the
+    block (including from tasks spawned inside it) is committed once on exit.
+    On exception nothing is written. Nested blocks join the outer batch.
+    """
+    current = _current_batch.get()
+    if current is not None:
+        yield current
+        return
+    tx = OrderBatch(ctx)
+    token = _current_batch.set(tx)
+    try:
+        yield tx
+    finally:
+        _current_batch.reset(token)
+    tx.commit()
+
+
+def _load(ctx: Context, order_id: str) -> Dict[str, Any] | None:
+    db = _sql()
+    if db is not None:
+        return db.get(order_id)
+    # ctx.storage hands back its live dict; mutating that in place would
+    # persist with the next unrelated set(), batch or no batch.
+    return copy.deepcopy(ctx.storage.get(_key(order_id)))
+
+
+def _get(ctx: Context, order_id: str) -> Dict[str, Any] | None:
+    tx = _current_batch.get()
+    if tx is not None:
+        return tx.get(order_id)
+    return _load(ctx, order_id)
+
+
+def _put(ctx: Context, order: Dict[str, Any], changed: Dict[str, Any]) -> None:
+    with batch(ctx) as tx:
+        tx.stage(order, changed)
+
+
+def _update(
+    ctx: Context, order_id: str, fn: Callable[[Dict[str, Any]], None]
+) -> Dict[str, Any] | None:
+    order = _get(ctx, order_id)
+    if order is None:
+        return None
+    before = dict(order)
+    fn(order)
+    changed = {k: v for k, v in order.items() if before.get(k) != v}
+    _put(ctx, order, changed)
+    return order
+
+
+def recover_orders(ctx: Context) -> int:
+    """
+    Re-apply a ctx.storage commit that was interrupted after its journal
+    write. Returns the number of orders re-applied.
+    """
+    pending = ctx.storage.get(JOURNAL_KEY)
+    if not pending:
+        return 0
+    _apply_kv(ctx, pending, removes=[JOURNAL_KEY])
+    ctx.logger.warning(f"[orders] replayed journal with {len(pending)} orders")
+    return len(pending)
+
+
+def _kv_orders(ctx: Context) -> List[Dict[str, Any]]:
+    """
+    Every order still held under per-order ctx.storage keys.
+    """
+    ids = dict.fromkeys(_active_ids(ctx) + [oid for oid, _ in _done_entries(ctx)])
+    orders = (ctx.storage.get(_key(oid)) for oid in ids)
+    return [o for o in orders if o is not None]
+
+
+def _migrate_to_sqlite(ctx: Context, db: SqliteOrderStore) -> int:
+    """
+    Move orders out of ctx.storage (legacy blob and v6 keys) into SQLite.
+    Rows already in the database win; the kv copies are removed after the
+    import is committed.
+    """
+    kv = _kv_orders(ctx)
+    legacy = ctx.storage.get(LEGACY_ORDERS_KEY) or {}
+    orders = {o["id"]: o for o in legacy.values()}
+    orders.update((o["id"], o) for o in kv)
+    if not orders:
+        return 0
+    db.put_many(o for oid, o in orders.items() if db.get(oid) is None)
+    _kv_commit(
+        ctx,
+        {},
+        [_key(o["id"]) for o in kv] + [ACTIVE_INDEX_KEY, DONE_INDEX_KEY, LEGACY_ORDERS_KEY],
+    )
+    ctx.logger.info(f"[orders] migrated {len(orders)} orders to sqlite")
+    return len(orders)
+
+
+def migrate_orders(ctx: Context) -> int:
+    """
+    Startup migration. Replays an interrupted ctx.storage commit first, then
+    moves the legacy orders_v5 blob into per-order keys, or, when the SQLite
+    backend is selected, moves everything still in ctx.storage into SQLite.
+    Safe to call on every startup; returns the number of orders migrated.
+    """
+    recover_orders(ctx)
+    db = _sql()
+    if db is not None:
+        return _migrate_to_sqlite(ctx, db)
+    legacy = ctx.storage.get(LEGACY_ORDERS_KEY)
+    if not legacy:
+        return 0
+    _apply_kv(
+        ctx,
+        [o for oid, o in legacy.items() if not ctx.storage.has(_key(oid))],
+        removes=[LEGACY_ORDERS_KEY],
+    )
+    ctx.logger.info(f"[orders] migrated {len(legacy)} orders from {LEGACY_ORDERS_KEY}")
+    return len(legacy)
 
 
 def create_order(
-    ctx: Context, symbol: str, token_address: str, recipient: str, slippage_bps: int
+    ctx: Context,
+    symbol: str,
+    token_address: str,
+    recipient: str,
+    slippage_bps: int,
+    slippage_auto: bool = False,
+    hd_wallet: Tuple[int, str] | None = None,
 ) -> Dict[str, Any]:
-    priv = "0x" + secrets.token_hex(32)
-    acct = Account.from_key(priv)
+    """
+    hd_wallet: an (index, address) pair already reserved with allocate_many
+    (bulk creation); otherwise one is allocated here when HD wallets are on.
+    """
+    if hd_wallet is not None or hd_enabled():
+        wallet = {}
+        wallet["wallet_index"], recv_addr = hd_wallet or allocate(ctx)
+    else:
+        priv = "0x" + secrets.token_hex(32)
+        wallet = {"recv_priv": priv}
+        recv_addr = Account.from_key(priv).address
     oid = secrets.token_hex(12)
     now = int(time.time())
 
@@ -28,9 +362,11 @@ def create_order(
         "token_address": token_address,
         "recipient": recipient,
         "slippage_bps": int(slippage_bps),
-        "recv_priv": priv,
-        "recv_addr": acct.address,
-        "status": "pending",  # pending | refund_pending | complete | refunded
+        # auto: settlement re-sizes slippage to the funded amount's price impact
+        "slippage_auto": bool(slippage_auto),
+        **wallet,  # wallet_index (HD) or recv_priv
+        "recv_addr": recv_addr,
+        "status": "pending",  # pending | broadcast | refund_pending | complete | refunded | expired
         "created_at": now,
         "last_error": None,
         "tx_hash": None,
@@ -39,18 +375,20 @@ def create_order(
         "notified_funded": False,
         "attempts": 0,
     }
-    orders = _load(ctx)
-    orders[oid] = order
-    _save(ctx, orders)
+    _put(ctx, order, order)
     return order
 
 
 def list_active(ctx: Context) -> List[Dict[str, Any]]:
-    return [
-        o
-        for o in _load(ctx).values()
-        if o.get("status") in ("pending", "refund_pending")
-    ]
+    db = _sql()
+    if db is not None:
+        return db.list_by_status(ACTIVE_STATUSES)
+    out = []
+    for oid in _active_ids(ctx):
+        o = _get(ctx, oid)
+        if o and o.get("status") in ACTIVE_STATUSES:
+            out.append(o)
+    return out
 
 
 def mark_complete(
@@ -59,61 +397,201 @@ def mark_complete(
     tx_hash: str | None = None,
     delivered_raw: int | None = None,
 ) -> None:
-    orders = _load(ctx)
-    if order_id in orders:
+    def _apply(o: Dict[str, Any]) -> None:
         if tx_hash is not None:
-            orders[order_id]["tx_hash"] = tx_hash
+            o["tx_hash"] = tx_hash
         if delivered_raw is not None:
-            orders[order_id]["delivered_raw"] = delivered_raw
-        orders[order_id]["status"] = "complete"
-        _save(ctx, orders)
+            o["delivered_raw"] = delivered_raw
+        o["status"] = "complete"
+        o["finished_at"] = int(time.time())
+
+    if _update(ctx, order_id, _apply):
         ctx.logger.info(f"[orders] mark_complete {order_id} tx={tx_hash}")
 
 
+def mark_broadcast(
+    ctx: Context,
+    order_id: str,
+    tx_hash: str,
+    swap_delay_s: float | None = None,
+    sent_tx: Dict[str, Any] | None = None,
+) -> None:
+    """
+    Swap tx sent; the order stays active until its receipt is seen.
+    sent_tx (the unsigned tx fields: nonce, gas, gasPrice, …) is kept so the
+    receipt tracker can tell an out-of-gas revert from any other.
+    """
+
+    def _apply(o: Dict[str, Any]) -> None:
+        o["status"] = "broadcast"
+        o["tx_hash"] = tx_hash
+        o["broadcast_at"] = int(time.time())
+        if sent_tx is not None:
+            o["sent_tx"] = dict(sent_tx)
+        if swap_delay_s is not None:
+            o["swap_delay_s"] = round(float(swap_delay_s), 3)
+
+    if _update(ctx, order_id, _apply):
+        ctx.logger.info(f"[orders] broadcast {order_id} tx={tx_hash}")
+
+
+def _retire_tx_hash(o: Dict[str, Any]) -> None:
+    # Earlier hashes are kept: any of them may still be mined, and the
+    # receipt tracker checks them all.
+    if o.get("tx_hash"):
+        o["prior_tx_hashes"] = [*(o.get("prior_tx_hashes") or []), o["tx_hash"]]
+
+
+def mark_replaced(
+    ctx: Context, order_id: str, tx_hash: str, sent_tx: Dict[str, Any]
+) -> None:
+    """
+    Broadcast tx re-sent (same hash) or replaced with the same nonce at a
+    higher gas price (new hash); the receipt timeout starts over.
+    """
+
+    def _apply(o: Dict[str, Any]) -> None:
+        if tx_hash != o.get("tx_hash"):
+            _retire_tx_hash(o)
+            o["tx_hash"] = tx_hash
+            o["replacements"] = int(o.get("replacements") or 0) + 1
+        o["sent_tx"] = dict(sent_tx)
+        o["broadcast_at"] = int(time.time())
+
+    if _update(ctx, order_id, _apply):
+        ctx.logger.warning(f"[orders] re-sent {order_id} tx={tx_hash}")
+
+
+def mark_replace_failed(ctx: Context, order_id: str, err: str) -> None:
+    """
+    A replacement was refused while the tx is still pending. Counts against
+    RECEIPT_MAX_REPLACEMENTS and restarts the receipt timeout, so the next
+    try waits instead of re-signing on every block.
+    """
+
+    def _apply(o: Dict[str, Any]) -> None:
+        o["replacements"] = int(o.get("replacements") or 0) + 1
+        o["broadcast_at"] = int(time.time())
+        o["last_error"] = err
+
+    if _update(ctx, order_id, _apply):
+        ctx.logger.warning(f"[orders] replacement of {order_id} refused: {err}")
+
+
+def mark_dropped(ctx: Context, order_id: str, err: str) -> None:
+    """
+    Broadcast tx never got a receipt and could not be re-sent; back to
+    pending so the (still funded) wallet is settled again.
+    """
+
+    def _apply(o: Dict[str, Any]) -> None:
+        o["status"] = "pending"
+        _retire_tx_hash(o)
+        o["tx_hash"] = None
+        o["broadcast_at"] = None
+        o["last_error"] = err
+
+    if _update(ctx, order_id, _apply):
+        ctx.logger.warning(f"[orders] dropped {order_id}: {err}")
+
+
+def mark_funded(ctx: Context, order_id: str, funded_at: int) -> None:
+    """
+    Record when funding was first seen (block time when known). Kept once.
+    """
+
+    def _apply(o: Dict[str, Any]) -> None:
+        if not o.get("funded_at"):
+            o["funded_at"] = int(funded_at)
+
+    if _update(ctx, order_id, _apply):
+        ctx.logger.info(f"[orders] funded {order_id} at {funded_at}")
+
+
 def mark_refund_pending(ctx: Context, order_id: str, err: str | None = None) -> None:
-    orders = _load(ctx)
-    if order_id in orders:
-        orders[order_id]["status"] = "refund_pending"
+    def _apply(o: Dict[str, Any]) -> None:
+        o["status"] = "refund_pending"
         if err:
-            orders[order_id]["last_error"] = err
-        _save(ctx, orders)
+            o["last_error"] = err
+
+    if _update(ctx, order_id, _apply):
         ctx.logger.warning(f"[orders] refund_pending {order_id}: {err or ''}")
 
 
 def mark_refunded(ctx: Context, order_id: str, tx_hash: str | None = None) -> None:
-    orders = _load(ctx)
-    if order_id in orders:
-        orders[order_id]["status"] = "refunded"
+    def _apply(o: Dict[str, Any]) -> None:
+        o["status"] = "refunded"
+        o["finished_at"] = int(time.time())
         if tx_hash:
-            orders[order_id]["tx_hash"] = tx_hash
-        _save(ctx, orders)
+            o["tx_hash"] = tx_hash
+
+    if _update(ctx, order_id, _apply):
         ctx.logger.info(f"[orders] refunded {order_id} tx={tx_hash}")
 
 
+def mark_expired(ctx: Context, order_id: str) -> None:
+    def _apply(o: Dict[str, Any]) -> None:
+        o["status"] = "expired"
+        o["finished_at"] = int(time.time())
+
+    if _update(ctx, order_id, _apply):
+        ctx.logger.info(f"[orders] expired {order_id}")
+
+
 def mark_error(ctx: Context, order_id: str, err: str) -> None:
-    orders = _load(ctx)
-    if order_id in orders:
-        orders[order_id]["last_error"] = err
-        orders[order_id]["attempts"] = int(orders[order_id].get("attempts") or 0) + 1
-        _save(ctx, orders)
+    def _apply(o: Dict[str, Any]) -> None:
+        o["last_error"] = err
+        o["attempts"] = int(o.get("attempts") or 0) + 1
+
+    if _update(ctx, order_id, _apply):
         ctx.logger.error(f"[orders] error {order_id}: {err}")
 
 
 def set_tx_hash(ctx: Context, order_id: str, tx_hash: str) -> None:
-    orders = _load(ctx)
-    if order_id in orders:
-        orders[order_id]["tx_hash"] = tx_hash
-        _save(ctx, orders)
+    def _apply(o: Dict[str, Any]) -> None:
+        o["tx_hash"] = tx_hash
+
+    if _update(ctx, order_id, _apply):
         ctx.logger.info(f"[orders] set_tx {order_id} -> {tx_hash}")
 
 
 def set_notify(ctx: Context, order_id: str, agent_addr: str) -> None:
-    orders = _load(ctx)
-    if order_id in orders:
-        orders[order_id]["notify_agent"] = agent_addr
-        _save(ctx, orders)
+    def _apply(o: Dict[str, Any]) -> None:
+        o["notify_agent"] = agent_addr
+
+    if _update(ctx, order_id, _apply):
         ctx.logger.info(f"[orders] set_notify {order_id} -> {agent_addr}")
 
 
 def get_order(ctx: Context, order_id: str) -> Dict[str, Any] | None:
-    return _load(ctx).get(order_id)
+    o = _get(ctx, order_id)
+    if o is None:
+        o = _archive.get(order_id)
+    return o
+
+
+def compact_orders(ctx: Context, older_than_s: int = ORDERS_ARCHIVE_AFTER_S) -> int:
+    """
+    Move complete/refunded orders finished more than older_than_s ago out of
+    the hot store into the append-only archive. get_order still finds them.
+    Returns the number of orders archived.
+    """
+    cutoff = int(time.time()) - int(older_than_s)
+    db = _sql()
+    if db is not None:
+        orders = db.list_terminal_before(TERMINAL_STATUSES, cutoff)
+        _archive.append(orders)
+        db.delete_many(o["id"] for o in orders)
+    else:
+        done = _done_entries(ctx)
+        due = [oid for oid, fin in done if fin < cutoff]
+        orders = [o for o in (_load(ctx, oid) for oid in due) if o is not None]
+        _archive.append(orders)
+        _kv_commit(
+            ctx,
+            {DONE_INDEX_KEY: [e for e in done if e[1] >= cutoff]},
+            [_key(oid) for oid in due],
+        )
+    if orders:
+        ctx.logger.info(f"[orders] archived {len(orders)} terminal orders")
+    return len(orders)
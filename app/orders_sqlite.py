@@ -0,0 +1,101 @@
+from typing import Dict, Any, List, Iterable
+import json
+import sqlite3
+import threading
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id         TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    recv_addr  TEXT NOT NULL,
+    recipient  TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+CREATE INDEX IF NOT EXISTS idx_orders_recv_addr ON orders(recv_addr);
+CREATE INDEX IF NOT EXISTS idx_orders_recipient ON orders(recipient);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+"""
+
+
+class SqliteOrderStore:
+    """
+    Order backend on SQLite in WAL mode. Each thread gets its own connection,
+    so readers (chat, /status) never block the settlement writer.
+    Indexed columns are copied out of the order dict; the full order is kept
+    as JSON in `data`. Addresses are stored lowercase.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(order: Dict[str, Any]) -> tuple:
+        return (
+            order["id"],
+            order.get("status") or "pending",
+            str(order.get("recv_addr") or "").lower(),
+            str(order.get("recipient") or "").lower(),
+            int(order.get("created_at") or 0),
+            json.dumps(order),
+        )
+
+    def get(self, order_id: str) -> Dict[str, Any] | None:
+        row = (
+            self._conn()
+            .execute("SELECT data FROM orders WHERE id = ?", (order_id,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, orders: Iterable[Dict[str, Any]]) -> None:
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO orders (id, status, recv_addr, recipient, created_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET status = excluded.status, "
+                "recv_addr = excluded.recv_addr, recipient = excluded.recipient, "
+                "created_at = excluded.created_at, data = excluded.data",
+                [self._row(o) for o in orders],
+            )
+
+    def _select(self, where: str, args: tuple) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            f"SELECT data FROM orders WHERE {where} ORDER BY created_at", args
+        )
+        return [json.loads(r[0]) for r in rows]
+
+    def list_by_status(self, statuses: Iterable[str]) -> List[Dict[str, Any]]:
+        statuses = tuple(statuses)
+        marks = ",".join("?" * len(statuses))
+        return self._select(f"status IN ({marks})", statuses)
+
+    def list_terminal_before(
+        self, statuses: Iterable[str], cutoff: int
+    ) -> List[Dict[str, Any]]:
+        statuses = tuple(statuses)
+        marks = ",".join("?" * len(statuses))
+        return self._select(
+            f"status IN ({marks}) AND "
+            "COALESCE(json_extract(data, '$.finished_at'), created_at) < ?",
+            (*statuses, int(cutoff)),
+        )
+
+    def delete_many(self, order_ids: Iterable[str]) -> None:
+        with self._conn() as conn:
+            conn.executemany(
+                "DELETE FROM orders WHERE id = ?", [(oid,) for oid in order_ids]
+            )
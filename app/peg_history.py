@@ -0,0 +1,152 @@
+from typing import Any, Dict, List
+import asyncio
+import os
+import time
+import numpy as np
+from uagents import Context
+
+from .config import (
+    PEG_HISTORY_DIR,
+    PEG_SAMPLE_INTERVAL_S,
+    PEG_HISTORY_CAPACITY,
+    IS_DEV,
+)
+from .prices import list_lst_tokens
+from .registry import LST_REGISTRY_BSC
+from .utils import find_token
+
+# ts == 0 marks an empty slot
+SAMPLE_DTYPE = np.dtype(
+    [("ts", "<f8"), ("price_bnb", "<f8"), ("peg_ratio", "<f8"), ("bnb_usd", "<f8")]
+)
+
+WINDOWS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+
+
+class PegRing:
+    """
+    Fixed-size ring buffer of peg samples backed by a memory-mapped .npy file,
+    so history survives restarts without a replay step. The write position
+    is recovered from the newest timestamp when the file is reopened.
+    """
+
+    def __init__(self, path: str, capacity: int = PEG_HISTORY_CAPACITY):
+        self.path = path
+        self.capacity = int(capacity)
+        buf = None
+        if os.path.exists(path):
+            buf = np.lib.format.open_memmap(path, mode="r+")
+            if buf.dtype != SAMPLE_DTYPE or buf.shape != (self.capacity,):
+                buf = None  # layout changed: start over
+        if buf is None:
+            buf = np.lib.format.open_memmap(
+                path, mode="w+", dtype=SAMPLE_DTYPE, shape=(self.capacity,)
+            )
+        self._buf = buf
+        ts = buf["ts"]
+        self._pos = int((np.argmax(ts) + 1) % self.capacity) if ts.any() else 0
+
+    def last_ts(self) -> float:
+        return float(self._buf["ts"][(self._pos - 1) % self.capacity])
+
+    def append(self, ts: float, price_bnb: float, peg_ratio: float, bnb_usd: float) -> None:
+        self._buf[self._pos] = (ts, price_bnb, peg_ratio, bnb_usd)
+        self._pos = (self._pos + 1) % self.capacity
+        self._buf.flush()
+
+    def window(self, seconds: float, now: float | None = None) -> np.ndarray:
+        """Samples from the last `seconds`, unordered."""
+        now = time.time() if now is None else now
+        ts = self._buf["ts"]
+        return self._buf[(ts > 0) & (ts >= now - seconds)]
+
+
+_rings: Dict[str, PegRing] = {}
+
+
+def _ring(address: str) -> PegRing:
+    key = address.lower()
+    ring = _rings.get(key)
+    if ring is None:
+        os.makedirs(PEG_HISTORY_DIR, exist_ok=True)
+        ring = PegRing(os.path.join(PEG_HISTORY_DIR, f"{key}.npy"))
+        _rings[key] = ring
+    return ring
+
+
+def _describe(x: np.ndarray) -> Dict[str, float] | None:
+    x = x[np.isfinite(x)]
+    if not x.size:
+        return None
+    return {
+        "min": float(x.min()),
+        "max": float(x.max()),
+        "mean": float(x.mean()),
+        "std": float(x.std()),
+    }
+
+
+def record_sample(tokens: List[Dict[str, Any]], now: float | None = None) -> int:
+    """
+    Append one sample per token (list_lst_tokens rows), stamped to the
+    PEG_SAMPLE_INTERVAL_S grid. Slots already written for this tick (e.g.
+    after a restart) are skipped. Returns how many samples were written.
+    """
+    now = time.time() if now is None else now
+    tick = now - (now % PEG_SAMPLE_INTERVAL_S)
+    written = 0
+    for t in tokens:
+        peg, px_bnb, px_usd = t.get("peg_ratio"), t.get("price_bnb"), t.get("price_usd")
+        if peg is None or px_bnb is None:
+            continue
+        ring = _ring(t["address"])
+        if ring.last_ts() >= tick:
+            continue
+        bnb_usd = (px_usd / px_bnb) if (px_usd is not None and px_bnb) else float("nan")
+        ring.append(tick, px_bnb, peg, bnb_usd)
+        written += 1
+    return written
+
+
+def get_peg_stats(symbol_or_address: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Peg statistics per registry token over 1h / 24h / 7d from the local ring
+    buffers (no external history APIs): min/max/mean/std of peg_ratio, of the
+    peg deviation in bps ((peg_ratio - 1) × 10 000) and of BNB/USD.
+    """
+    tokens = [find_token(symbol_or_address)] if symbol_or_address else LST_REGISTRY_BSC
+    now = time.time()
+    out: List[Dict[str, Any]] = []
+    for t in tokens:
+        ring = _ring(t["address"])
+        windows: Dict[str, Any] = {}
+        for name, seconds in WINDOWS.items():
+            w = ring.window(seconds, now)
+            windows[name] = {
+                "samples": int(w.size),
+                "peg_ratio": _describe(w["peg_ratio"]),
+                "deviation_bps": _describe((w["peg_ratio"] - 1.0) * 10_000),
+                "bnb_usd": _describe(w["bnb_usd"]),
+            }
+        out.append(
+            {
+                "symbol": t["symbol"],
+                "address": t["address"],
+                "sample_interval_s": PEG_SAMPLE_INTERVAL_S,
+                "windows": windows,
+            }
+        )
+    return out
+
+
+async def run_peg_recorder(ctx: Context) -> None:
+    """Sample list_lst_tokens every PEG_SAMPLE_INTERVAL_S into the ring buffers."""
+    if IS_DEV:
+        return
+    while True:
+        try:
+            tokens = await asyncio.to_thread(list_lst_tokens)
+            record_sample(tokens)
+        except Exception as e:
+            ctx.logger.warning(f"[peg] sample failed: {e}")
+        await asyncio.sleep(PEG_SAMPLE_INTERVAL_S - (time.time() % PEG_SAMPLE_INTERVAL_S))
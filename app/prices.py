@@ -1,61 +1,65 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Mapping
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timezone
+import threading
+import time
 import requests
+from eth_utils import to_checksum_address
 
-from .config import CG_BASE, GT_BASE, PANCAKE_INFO_BASE, DEFAULT_HEADERS, WBNB_BSC, IS_DEV
+from .config import (
+    CG_BASE,
+    GT_BASE,
+    PANCAKE_INFO_BASE,
+    DEFAULT_HEADERS,
+    WBNB_BSC,
+    IS_DEV,
+    ROUTER_V2,
+    BNB_PRICE_TTL_S,
+    LST_PRICE_TTL_S,
+    DEX_PRICE_TTL_S,
+    PRICE_MAX_STALE_S,
+    BNB_HEDGE_DELAY_S,
+    BNB_PRICE_BUDGET_S,
+    LST_PRICE_MODE,
+    USDT_BSC,
+)
+from .cache import SwrCache
+from . import market
 from .registry import LST_REGISTRY_BSC
+from .rpc import multicall3
+from .quoting import amount_out_v2, fetch_reserves
+from .erc20 import erc20_decimals_many
+from .abi_codec import DECIMALS_CALLDATA, decode_uint_array, encode_get_amounts_out
+
+_bnb_cache = SwrCache(BNB_PRICE_TTL_S, PRICE_MAX_STALE_S)
+_lst_cache = SwrCache(LST_PRICE_TTL_S, PRICE_MAX_STALE_S)
+_dex_cache = SwrCache(DEX_PRICE_TTL_S, PRICE_MAX_STALE_S)
+# token (lowercase) -> decimals(); immutable, read once per process
+_decimals: Dict[str, int] = {}
+
 
 def fetch_bnb_price() -> Dict[str, Any]:
     """
-    Returns {"bnb_usd": float, "source": str} without needing an API key.
-    Tries CoinGecko (by id) -> GeckoTerminal (WBNB) -> PancakeSwap Info.
+    Returns {"bnb_usd": float, "source": str, "age_s": float} without needing
+    an API key. Cached; shares the hedged source race with get_bnb_info.
     """
+    if IS_DEV:
+        data, age = _bnb_cache.get("price", _fetch_bnb_price)
+        return {**data, "age_s": round(age, 1)}
+    info = get_bnb_info()
+    return {"bnb_usd": info["price_usd"], "source": info["source"], "age_s": info["age_s"]}
 
-    try:
-        r = requests.get(
-            f"{CG_BASE}/simple/price",
-            params={"ids": "binancecoin", "vs_currencies": "usd", "precision": "full"},
-            headers=DEFAULT_HEADERS,
-            timeout=15,
-        )
-        r.raise_for_status()
-        px = r.json().get("binancecoin", {}).get("usd")
-        if px is not None:
-            return {"bnb_usd": float(px), "source": "coingecko_id"}
-    except Exception:
-        pass
-    try:
-        r = requests.get(
-            f"{GT_BASE}/simple/networks/bsc/token_price/{WBNB_BSC}",
-            headers=DEFAULT_HEADERS,
-            timeout=15,
-        )
-        r.raise_for_status()
-        px_map = r.json().get("data", {}).get("attributes", {}).get("token_prices", {})
-        px = px_map.get(WBNB_BSC)
-        if px is not None:
-            return {"bnb_usd": float(px), "source": "geckoterminal"}
-    except Exception:
-        pass
-    try:
-        r = requests.get(
-            f"{PANCAKE_INFO_BASE}/tokens/{WBNB_BSC}",
-            headers=DEFAULT_HEADERS,
-            timeout=15,
-        )
-        r.raise_for_status()
-        px = r.json().get("data", {}).get("price")
-        if px is not None:
-            return {"bnb_usd": float(px), "source": "pancakeswap_info"}
-    except Exception:
-        pass
-    raise RuntimeError("Unable to fetch BNB/USD from public sources (CG/GT/Pancake).")
+
+def _fetch_bnb_price() -> Dict[str, Any]:
+    info = _fetch_bnb_info()
+    return {"bnb_usd": info["price_usd"], "source": info["source"]}
 
 
 def get_bnb_info() -> Dict[str, Any]:
     """
-    Returns current BNB price/info with fallbacks.
-    Fields: symbol, name, coingecko_id, price_usd, change_24h_pct, last_updated, source, sources(list)
+    Returns current BNB price/info with fallbacks (cached, stale-while-revalidate).
+    Fields: symbol, name, coingecko_id, price_usd, change_24h_pct, last_updated,
+    source, sources(list), age_s (seconds since the data was fetched)
     """
     if IS_DEV:
         return {
@@ -67,101 +71,218 @@ def get_bnb_info() -> Dict[str, Any]:
             "last_updated": datetime.now(timezone.utc).isoformat(),
             "source": "dev",
             "sources": [],
+            "age_s": 0.0,
         }
-        
+    if LST_PRICE_MODE == "onchain":
+        try:
+            return _onchain_bnb_info()
+        except Exception:
+            pass  # nothing published yet → HTTP sources
+    return _http_bnb_info()
+
+
+def _http_bnb_info() -> Dict[str, Any]:
+    snap = market.current()
+    if snap is not None:
+        return {**snap.bnb_info, "age_s": round(time.time() - snap.prices_at, 1)}
+    data, age = _bnb_cache.get("info", _fetch_bnb_info)
+    return {**data, "age_s": round(age, 1)}
+
+
+def _onchain_bnb_info() -> Dict[str, Any]:
+    """
+    BNB/USD from the WBNB/USDT pair as last published in the market snapshot
+    (re-read once per block by the poller); HTTP sources only add the 24h
+    change. Never touches the network.
+    """
+    snap = market.current("onchain")
+    bnb_usd = snap.onchain.get("bnb_usd") if snap is not None else None
+    if bnb_usd is None:
+        raise ValueError("no on-chain prices published yet")
+    prices_snap = market.current()
+    change = prices_snap.bnb_info.get("change_24h_pct") if prices_snap else None
+    return {
+        "symbol": "BNB",
+        "name": "BNB",
+        "coingecko_id": "binancecoin",
+        "price_usd": bnb_usd,
+        "change_24h_pct": change,
+        "last_updated": datetime.fromtimestamp(snap.onchain_at, tz=timezone.utc).isoformat(),
+        "source": "pancakeswap_v2_reserves",
+        "sources": [f"https://bscscan.com/token/{USDT_BSC}"],
+        "block": snap.onchain_block,
+        "age_s": round(time.time() - snap.onchain_at, 1),
+    }
+
+
+def _now() -> tuple[int, str]:
     now_ts = int(datetime.now(tz=timezone.utc).timestamp())
-    now_iso = datetime.fromtimestamp(now_ts, tz=timezone.utc).isoformat()
+    return now_ts, datetime.fromtimestamp(now_ts, tz=timezone.utc).isoformat()
 
-    try:
-        r = requests.get(
-            f"{CG_BASE}/simple/price",
-            params={
-                "ids": "binancecoin",
-                "vs_currencies": "usd",
-                "include_24hr_change": "true",
-                "include_last_updated_at": "true",
-                "precision": "full",
-            },
-            headers=DEFAULT_HEADERS,
-            timeout=15,
-        )
-        r.raise_for_status()
-        data = r.json().get("binancecoin", {}) or {}
-        usd = data.get("usd")
-        if usd is not None:
-            return {
-                "symbol": "BNB",
-                "name": "BNB",
-                "coingecko_id": "binancecoin",
-                "price_usd": float(usd),
-                "change_24h_pct": (
-                    float(data.get("usd_24h_change"))
-                    if data.get("usd_24h_change") is not None
-                    else None
-                ),
-                "last_updated": datetime.fromtimestamp(
-                    (
-                        int(data.get("last_updated_at"))
-                        if data.get("last_updated_at")
-                        else now_ts
-                    ),
-                    tz=timezone.utc,
-                ).isoformat(),
-                "source": "coingecko_id",
-                "sources": [
-                    f"{CG_BASE}/simple/price?ids=binancecoin&vs_currencies=usd"
-                ],
-            }
-    except Exception:
-        pass
 
-    try:
-        r = requests.get(
-            f"{GT_BASE}/simple/networks/bsc/token_price/{WBNB_BSC}",
-            headers=DEFAULT_HEADERS,
-            timeout=15,
+def _bnb_from_coingecko(timeout: float) -> Dict[str, Any] | None:
+    now_ts, _ = _now()
+    r = requests.get(
+        f"{CG_BASE}/simple/price",
+        params={
+            "ids": "binancecoin",
+            "vs_currencies": "usd",
+            "include_24hr_change": "true",
+            "include_last_updated_at": "true",
+            "precision": "full",
+        },
+        headers=DEFAULT_HEADERS,
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    data = r.json().get("binancecoin", {}) or {}
+    usd = data.get("usd")
+    if usd is None:
+        return None
+    return {
+        "symbol": "BNB",
+        "name": "BNB",
+        "coingecko_id": "binancecoin",
+        "price_usd": float(usd),
+        "change_24h_pct": (
+            float(data.get("usd_24h_change"))
+            if data.get("usd_24h_change") is not None
+            else None
+        ),
+        "last_updated": datetime.fromtimestamp(
+            (
+                int(data.get("last_updated_at"))
+                if data.get("last_updated_at")
+                else now_ts
+            ),
+            tz=timezone.utc,
+        ).isoformat(),
+        "source": "coingecko_id",
+        "sources": [f"{CG_BASE}/simple/price?ids=binancecoin&vs_currencies=usd"],
+    }
+
+
+def _bnb_from_geckoterminal(timeout: float) -> Dict[str, Any] | None:
+    r = requests.get(
+        f"{GT_BASE}/simple/networks/bsc/token_price/{WBNB_BSC}",
+        headers=DEFAULT_HEADERS,
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    gt = r.json()
+    px_map = gt.get("data", {}).get("attributes", {}).get("token_prices", {}) or {}
+    px = px_map.get(WBNB_BSC)
+    if px is None:
+        return None
+    return {
+        "symbol": "BNB",
+        "name": "BNB (WBNB reference)",
+        "coingecko_id": "binancecoin",
+        "price_usd": float(px),
+        "change_24h_pct": None,
+        "last_updated": _now()[1],
+        "source": "geckoterminal",
+        "sources": [f"{GT_BASE}/simple/networks/bsc/token_price/{WBNB_BSC}"],
+    }
+
+
+def _bnb_from_pancake_info(timeout: float) -> Dict[str, Any] | None:
+    r = requests.get(
+        f"{PANCAKE_INFO_BASE}/tokens/{WBNB_BSC}",
+        headers=DEFAULT_HEADERS,
+        timeout=timeout,
+    )
+    r.raise_for_status()
+    px = r.json().get("data", {}).get("price")
+    if px is None:
+        return None
+    return {
+        "symbol": "BNB",
+        "name": "BNB (WBNB reference)",
+        "coingecko_id": "binancecoin",
+        "price_usd": float(px),
+        "change_24h_pct": None,
+        "last_updated": _now()[1],
+        "source": "pancakeswap_info",
+        "sources": [f"{PANCAKE_INFO_BASE}/tokens/{WBNB_BSC}"],
+    }
+
+
+# In preference order; a later source is only started when the earlier ones
+# failed or haven't answered within BNB_HEDGE_DELAY_S.
+_BNB_SOURCES = [
+    ("coingecko_id", _bnb_from_coingecko),
+    ("geckoterminal", _bnb_from_geckoterminal),
+    ("pancakeswap_info", _bnb_from_pancake_info),
+]
+
+_source_pool = ThreadPoolExecutor(max_workers=len(_BNB_SOURCES) * 2, thread_name_prefix="price-src")
+_stats_lock = threading.Lock()
+_source_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _record(name: str, ok: bool, latency_s: float) -> None:
+    with _stats_lock:
+        st = _source_stats.setdefault(
+            name, {"ok": 0, "fail": 0, "last_latency_ms": None, "avg_latency_ms": None}
         )
-        r.raise_for_status()
-        gt = r.json()
-        px_map = gt.get("data", {}).get("attributes", {}).get("token_prices", {}) or {}
-        px = px_map.get(WBNB_BSC)
-        if px is not None:
-            return {
-                "symbol": "BNB",
-                "name": "BNB (WBNB reference)",
-                "coingecko_id": "binancecoin",
-                "price_usd": float(px),
-                "change_24h_pct": None,
-                "last_updated": now_iso,
-                "source": "geckoterminal",
-                "sources": [f"{GT_BASE}/simple/networks/bsc/token_price/{WBNB_BSC}"],
-            }
-    except Exception:
-        pass
+        st["ok" if ok else "fail"] += 1
+        ms = round(latency_s * 1000, 1)
+        st["last_latency_ms"] = ms
+        avg = st["avg_latency_ms"]
+        st["avg_latency_ms"] = ms if avg is None else round(0.8 * avg + 0.2 * ms, 1)
+
 
+def source_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-source success/failure counts and latency (ms) of BNB price lookups."""
+    with _stats_lock:
+        return {k: dict(v) for k, v in _source_stats.items()}
+
+
+def _timed(name: str, fn, timeout: float) -> Dict[str, Any] | None:
+    t0 = time.monotonic()
     try:
-        r = requests.get(
-            f"{PANCAKE_INFO_BASE}/tokens/{WBNB_BSC}",
-            headers=DEFAULT_HEADERS,
-            timeout=15,
-        )
-        r.raise_for_status()
-        info = r.json()
-        px = info.get("data", {}).get("price")
-        if px is not None:
-            return {
-                "symbol": "BNB",
-                "name": "BNB (WBNB reference)",
-                "coingecko_id": "binancecoin",
-                "price_usd": float(px),
-                "change_24h_pct": None,
-                "last_updated": now_iso,
-                "source": "pancakeswap_info",
-                "sources": [f"{PANCAKE_INFO_BASE}/tokens/{WBNB_BSC}"],
-            }
+        res = fn(timeout)
     except Exception:
-        pass
+        _record(name, False, time.monotonic() - t0)
+        raise
+    _record(name, res is not None, time.monotonic() - t0)
+    return res
+
 
+def _fetch_bnb_info() -> Dict[str, Any]:
+    """
+    Hedged race over _BNB_SOURCES: start the first source, start the next one
+    whenever the previous failed or BNB_HEDGE_DELAY_S passed without an
+    answer, and return the first valid result. Everything is bounded by
+    BNB_PRICE_BUDGET_S; losers still running are left to finish in the pool
+    (their outcome only feeds source_stats).
+    """
+    deadline = time.monotonic() + BNB_PRICE_BUDGET_S
+    queue = list(_BNB_SOURCES)
+    running: set = set()
+    while queue or running:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        if queue:
+            name, fn = queue.pop(0)
+            running.add(_source_pool.submit(_timed, name, fn, deadline - now))
+        timeout = deadline - time.monotonic()
+        if queue:
+            timeout = min(timeout, BNB_HEDGE_DELAY_S)
+        done, running = wait(running, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                res = f.result()
+            except Exception:
+                continue
+            if res is not None:
+                for other in running:
+                    other.cancel()
+                return res
+    for f in running:
+        f.cancel()
     raise RuntimeError("Unable to fetch BNB price from public sources.")
 
 
@@ -273,7 +394,99 @@ def fetch_lst_prices_bsc(
     return result
 
 
+def fetch_dex_prices_bnb(addresses: List[str]) -> Dict[str, float | None]:
+    """
+    On-chain PancakeSwap v2 quote for every token in one Multicall3 eth_call:
+    getAmountsOut(1 WBNB, [WBNB, token]) plus token decimals().
+    Returns { address_lower: BNB per token (incl. 1 BNB price impact) | None }.
+    """
+    if not addresses:
+        return {}
+    one_bnb = 10**18
+    wbnb = to_checksum_address(WBNB_BSC)
+    calls = []
+    for a in addresses:
+        token = to_checksum_address(a)
+        calls.append((ROUTER_V2, encode_get_amounts_out(one_bnb, [wbnb, token])))
+        calls.append((token, DECIMALS_CALLDATA))
+    try:
+        res = multicall3(calls)
+    except Exception:
+        return {a.lower(): None for a in addresses}
+
+    out: Dict[str, float | None] = {}
+    for i, a in enumerate(addresses):
+        (q_ok, q_data), (d_ok, d_data) = res[2 * i], res[2 * i + 1]
+        try:
+            if not (q_ok and d_ok):
+                raise ValueError("quote failed")
+            tokens_out = decode_uint_array(q_data)[-1]
+            decimals = int.from_bytes(d_data[:32], "big")
+            out[a.lower()] = (10**decimals) / tokens_out if tokens_out else None
+        except Exception:
+            out[a.lower()] = None
+    return out
+
+
+def fetch_onchain_prices(addresses: List[str]) -> Dict[str, Any]:
+    """
+    Prices straight from PancakeSwap v2 pair reserves: every WBNB/token pair
+    plus WBNB/USDT for BNB/USD, in one Multicall3 getReserves eth_call
+    (cached per block by quoting.fetch_reserves; decimals are read once).
+    Returns {
+      "bnb_usd": float | None,
+      "price_bnb": { address_lower: spot BNB per token | None },
+      "dex_price_bnb": { address_lower: BNB per token for a 1 BNB buy | None },
+    }
+    """
+    tokens = [a.lower() for a in addresses]
+    missing = [t for t in tokens + [USDT_BSC] if t not in _decimals]
+    if missing:
+        for t, d in erc20_decimals_many(missing).items():
+            if d is not None:
+                _decimals[t] = d
+    reserves = fetch_reserves(tokens + [USDT_BSC])
+
+    def spot(t: str) -> float | None:
+        r, d = reserves.get(t), _decimals.get(t)
+        if not r or d is None or not r[0] or not r[1]:
+            return None
+        return (r[0] / 10**18) / (r[1] / 10**d)
+
+    def one_bnb_buy(t: str) -> float | None:
+        r, d = reserves.get(t), _decimals.get(t)
+        if not r or d is None:
+            return None
+        out = amount_out_v2(10**18, r[0], r[1])
+        return (10**d) / out if out else None
+
+    usdt_in_bnb = spot(USDT_BSC)
+    return {
+        "bnb_usd": (1 / usdt_in_bnb) if usdt_in_bnb else None,
+        "price_bnb": {t: spot(t) for t in tokens},
+        "dex_price_bnb": {t: one_bnb_buy(t) for t in tokens},
+    }
+
+
+def _cached_lst_prices(
+    addresses: List[str], id_map: Dict[str, str]
+) -> tuple[Dict[str, Dict[str, Any]], float]:
+    key = tuple(a.lower() for a in addresses)
+    return _lst_cache.get(key, lambda: fetch_lst_prices_bsc(addresses, id_map))
+
+
+def _cached_dex_prices(addresses: List[str]) -> tuple[Dict[str, float | None], float]:
+    key = tuple(a.lower() for a in addresses)
+    return _dex_cache.get(key, lambda: fetch_dex_prices_bnb(addresses))
+
+
 def list_lst_tokens() -> List[Dict[str, Any]]:
+    """
+    Registry tokens with USD/BNB prices, peg ratio and DEX price. Read from
+    the poller's market snapshot when it is current; otherwise each source
+    is looked up through its own cache. age_s is the age of the oldest
+    source used.
+    """
     if IS_DEV:
         enriched = []
         now_iso = datetime.now(timezone.utc).isoformat()
@@ -287,34 +500,92 @@ def list_lst_tokens() -> List[Dict[str, Any]]:
                     "price_usd": None,
                     "price_bnb": None,
                     "peg_ratio": None,
+                    "dex_price_bnb": None,
                     "change_24h_pct": None,
                     "sources": t.get("sources", []),
                     "last_updated": now_iso,
+                    "age_s": 0.0,
                 }
             )
         return enriched
     
+    if LST_PRICE_MODE == "onchain":
+        try:
+            return _list_onchain()
+        except Exception:
+            pass  # nothing published yet → HTTP pricing below
+
+    snap = market.current()
+    if snap is not None:
+        return _enrich(
+            snap.lst_prices,
+            snap.dex_prices,
+            snap.bnb_info.get("price_usd"),
+            round(time.time() - snap.prices_at, 1),
+        )
+
     addrs = [t["address"] for t in LST_REGISTRY_BSC]
     id_map = {t["address"].lower(): t.get("coingecko_id") for t in LST_REGISTRY_BSC}
-    prices = fetch_lst_prices_bsc(addrs, id_map)
+    prices, prices_age = _cached_lst_prices(addrs, id_map)
+    dex_prices, dex_age = _cached_dex_prices(addrs)
     bnb_info = fetch_bnb_price()
-    bnb_usd = bnb_info["bnb_usd"]
+    age_s = round(max(prices_age, dex_age, bnb_info["age_s"]), 1)
+    return _enrich(prices, dex_prices, bnb_info["bnb_usd"], age_s)
+
+
+def _list_onchain() -> List[Dict[str, Any]]:
+    """
+    price_bnb / peg_ratio / dex_price_bnb from pair reserves, price_usd via
+    the WBNB/USDT pair, all as last published in the market snapshot (read
+    once per block by the poller). The HTTP prices in the same snapshot only
+    supply change_24h_pct. Never touches the network.
+    """
+    snap = market.current("onchain")
+    chain = snap.onchain if snap is not None else {}
+    if chain.get("bnb_usd") is None:
+        raise ValueError("no on-chain prices published yet")
+    http = snap.lst_prices if market.current() is not None else {}
+    return _enrich(
+        http,
+        chain["dex_price_bnb"],
+        chain["bnb_usd"],
+        round(time.time() - snap.onchain_at, 1),
+        price_bnb=chain["price_bnb"],
+    )
 
+
+def _enrich(
+    prices: Mapping[str, Mapping[str, Any]],
+    dex_prices: Mapping[str, Any],
+    bnb_usd: float | None,
+    age_s: float,
+    price_bnb: Mapping[str, float | None] | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    One output row per registry token. Without price_bnb, BNB prices are
+    derived as USD price ÷ BNB/USD; with it (on-chain mode) USD prices are
+    derived from the BNB price instead.
+    """
     now_iso = datetime.now(timezone.utc).isoformat()
     enriched: List[Dict[str, Any]] = []
     for t in LST_REGISTRY_BSC:
         addr = t["address"].lower()
         p = prices.get(addr, {})
-        price_usd = float(p.get("usd")) if p.get("usd") is not None else None
         change_24h = (
             float(p.get("usd_24h_change"))
             if p.get("usd_24h_change") is not None
             else None
         )
-        last_upd = p.get("last_updated_at")
-        price_bnb = (
-            (price_usd / bnb_usd) if (price_usd is not None and bnb_usd) else None
-        )
+        if price_bnb is not None:
+            px_bnb = price_bnb.get(addr)
+            price_usd = (px_bnb * bnb_usd) if (px_bnb is not None and bnb_usd) else None
+            last_upd = None
+        else:
+            price_usd = float(p.get("usd")) if p.get("usd") is not None else None
+            px_bnb = (
+                (price_usd / bnb_usd) if (price_usd is not None and bnb_usd) else None
+            )
+            last_upd = p.get("last_updated_at")
 
         enriched.append(
             {
@@ -323,8 +594,10 @@ def list_lst_tokens() -> List[Dict[str, Any]]:
                 "address": t["address"],
                 "project": t["project"],
                 "price_usd": price_usd,
-                "price_bnb": price_bnb,
-                "peg_ratio": price_bnb,
+                "price_bnb": px_bnb,
+                "peg_ratio": px_bnb,
+                "dex_price_bnb": dex_prices.get(addr),
+                "price_source": "onchain" if price_bnb is not None else "http",
                 "change_24h_pct": change_24h,
                 "sources": t.get("sources", []),
                 "last_updated": (
@@ -332,6 +605,7 @@ def list_lst_tokens() -> List[Dict[str, Any]]:
                     if last_upd
                     else now_iso
                 ),
+                "age_s": age_s,
             }
         )
     return enriched
@@ -0,0 +1,203 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import time
+import numpy as np
+from eth_utils import to_checksum_address
+
+from .config import FACTORY_V2, MULTICALL3, WBNB_BSC, RESERVES_TTL_S
+from .rpc import (
+    multicall3,
+    async_multicall3,
+    router_amount_out_min,
+    async_router_amount_out_min,
+    apply_slippage,
+)
+from .abi_codec import (
+    GET_BLOCK_NUMBER_CALLDATA,
+    GET_RESERVES_CALLDATA,
+    decode_address,
+    decode_reserves,
+    encode_get_pair,
+)
+
+# PancakeSwap v2 charges 0.25% on the input amount.
+PANCAKE_V2_FEE_BPS = 25
+
+# token (lowercase) -> WBNB/token pair address, or None when no pair exists.
+# Pair addresses never change, so they are resolved once per process.
+_pairs: Dict[str, Optional[str]] = {}
+
+Reserves = Tuple[int, int]  # (reserve_wbnb, reserve_token)
+
+# token (lowercase) -> (block_number, fetched_at, reserves). An entry is
+# reused while no newer head has been seen (see note_head); without a head
+# feed it expires after RESERVES_TTL_S (about one BSC block).
+_reserves: Dict[str, Tuple[int, float, Optional[Reserves]]] = {}
+_head: Optional[int] = None
+
+
+def note_head(block_number: int) -> None:
+    """Called by the newHeads follower; invalidates reserves from older blocks."""
+    global _head
+    if _head is None or block_number > _head:
+        _head = block_number
+
+
+def amount_out_v2(amount_in: int, reserve_in: int, reserve_out: int) -> int:
+    """
+    PancakeSwap v2 getAmountOut, exact integer math (same rounding as the pair).
+    """
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    amount_in_with_fee = amount_in * (10_000 - PANCAKE_V2_FEE_BPS)
+    return (amount_in_with_fee * reserve_out) // (
+        reserve_in * 10_000 + amount_in_with_fee
+    )
+
+
+def amounts_out_v2(
+    amounts_in: Sequence[int] | np.ndarray, reserve_in: int, reserve_out: int
+) -> np.ndarray:
+    """
+    Vectorised amount_out_v2 over many input amounts. Uses an object array of
+    Python ints so uint112 reserves × fee never overflow and results match
+    the pair exactly.
+    """
+    a = np.asarray(amounts_in, dtype=object)
+    if reserve_in <= 0 or reserve_out <= 0:
+        return np.zeros(a.shape, dtype=object)
+    a = np.where(a > 0, a, 0)
+    with_fee = a * (10_000 - PANCAKE_V2_FEE_BPS)
+    return (with_fee * reserve_out) // (reserve_in * 10_000 + with_fee)
+
+
+def _get_pair_calls(tokens: List[str]) -> List[Tuple[str, bytes]]:
+    return [(FACTORY_V2, encode_get_pair(WBNB_BSC, t)) for t in tokens]
+
+
+def _store_pairs(tokens: List[str], res: List[Tuple[bool, bytes]]) -> None:
+    for t, (ok, data) in zip(tokens, res):
+        if not ok or len(data) < 32:
+            continue  # retried on the next lookup
+        pair = decode_address(data)
+        _pairs[t] = None if int(pair, 16) == 0 else to_checksum_address(pair)
+
+
+def _get_reserves_calls(pairs: List[str]) -> List[Tuple[str, bytes]]:
+    # Multicall3.getBlockNumber() rides along so the snapshot is tagged with
+    # the block it was read at.
+    return [(MULTICALL3, GET_BLOCK_NUMBER_CALLDATA)] + [
+        (p, GET_RESERVES_CALLDATA) for p in pairs
+    ]
+
+
+def _decode_reserves(token: str, ok: bool, data: bytes) -> Optional[Reserves]:
+    if not ok or len(data) < 96:
+        return None
+    r0, r1, _ = decode_reserves(data)
+    # Pair token0 is the lower address.
+    if WBNB_BSC.lower() < token.lower():
+        return int(r0), int(r1)
+    return int(r1), int(r0)
+
+
+def _fresh(token: str, now: float) -> bool:
+    hit = _reserves.get(token)
+    if hit is None:
+        return False
+    block, fetched_at, _ = hit
+    if _head is not None:
+        return block >= _head
+    return now - fetched_at < RESERVES_TTL_S
+
+
+def _plan(tokens: List[str]) -> Tuple[List[str], List[str]]:
+    tokens = list(dict.fromkeys(t.lower() for t in tokens))
+    now = time.time()
+    return tokens, [t for t in tokens if not _fresh(t, now)]
+
+
+def _store_reserves(stale: List[str], res: List[Tuple[bool, bytes]]) -> None:
+    ok, data = res[0]
+    block = int.from_bytes(data[:32], "big") if ok and len(data) >= 32 else 0
+    if block:
+        note_head(block)
+    now = time.time()
+    targets = [t for t in stale if _pairs.get(t)]
+    for t in stale:
+        if not _pairs.get(t):
+            _reserves[t] = (block, now, None)
+    for t, (ok, data) in zip(targets, res[1:]):
+        _reserves[t] = (block, now, _decode_reserves(t, ok, data))
+
+
+def _result(tokens: List[str]) -> Dict[str, Optional[Reserves]]:
+    return {t: (_reserves.get(t) or (0, 0.0, None))[2] for t in tokens}
+
+
+def fetch_reserves(tokens: List[str]) -> Dict[str, Optional[Reserves]]:
+    """
+    WBNB/token reserves for many tokens, read at most once per block in one
+    Multicall3 eth_call (plus a one-time getPair multicall for new tokens).
+    Returns { token_lower: (reserve_wbnb, reserve_token) | None }.
+    """
+    tokens, stale = _plan(tokens)
+    if stale:
+        missing = [t for t in stale if t not in _pairs]
+        if missing:
+            _store_pairs(missing, multicall3(_get_pair_calls(missing)))
+        pairs = [_pairs[t] for t in stale if _pairs.get(t)]
+        _store_reserves(stale, multicall3(_get_reserves_calls(pairs)))
+    return _result(tokens)
+
+
+async def async_fetch_reserves(tokens: List[str]) -> Dict[str, Optional[Reserves]]:
+    tokens, stale = _plan(tokens)
+    if stale:
+        missing = [t for t in stale if t not in _pairs]
+        if missing:
+            _store_pairs(missing, await async_multicall3(_get_pair_calls(missing)))
+        pairs = [_pairs[t] for t in stale if _pairs.get(t)]
+        _store_reserves(stale, await async_multicall3(_get_reserves_calls(pairs)))
+    return _result(tokens)
+
+
+def _wbnb_leg(path: list[str]) -> Optional[str]:
+    """Token of a direct WBNB→token path, the only shape quoted locally."""
+    if len(path) == 2 and path[0].lower() == WBNB_BSC.lower():
+        return path[1].lower()
+    return None
+
+
+def get_amount_out_min(
+    amount_in_wei: int,
+    path: list[str],
+    slippage_bps: int,
+    reserves: Reserves | None = None,
+) -> int:
+    """
+    Minimum output after slippage, quoted locally from cached pair reserves.
+    Falls back to the router's getAmountsOut (eth_call) for other path
+    shapes or when the reserves can't be read.
+    """
+    token = _wbnb_leg(path)
+    if reserves is None and token:
+        reserves = fetch_reserves([token]).get(token)
+    if reserves is not None:
+        out = amount_out_v2(amount_in_wei, reserves[0], reserves[1])
+        return apply_slippage(out, slippage_bps)
+    return router_amount_out_min(amount_in_wei, path, slippage_bps)
+
+
+async def async_get_amount_out_min(
+    amount_in_wei: int,
+    path: list[str],
+    slippage_bps: int,
+    reserves: Reserves | None = None,
+) -> int:
+    token = _wbnb_leg(path)
+    if reserves is None and token:
+        reserves = (await async_fetch_reserves([token])).get(token)
+    if reserves is not None:
+        out = amount_out_v2(amount_in_wei, reserves[0], reserves[1])
+        return apply_slippage(out, slippage_bps)
+    return await async_router_amount_out_min(amount_in_wei, path, slippage_bps)
@@ -0,0 +1,175 @@
+from typing import Dict, Any, List
+import time
+from eth_utils import keccak
+from uagents import Context
+
+from .rpc import async_rpc_batch
+from .orders_kv import (
+    batch,
+    mark_complete,
+    mark_dropped,
+    mark_error,
+    mark_refund_pending,
+    mark_replace_failed,
+    mark_replaced,
+)
+from .order_wallets import order_account
+from .agent_wallet import async_sign_and_send
+from .gas_model import forget as forget_gas_model, is_out_of_gas, record_gas_used
+from .config import RECEIPT_TIMEOUT_S, RECEIPT_GAS_BUMP, RECEIPT_MAX_REPLACEMENTS
+
+TRANSFER_TOPIC = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+
+
+def _topic_addr(topic: str) -> str:
+    return "0x" + topic[-40:].lower()
+
+
+def delivered_amount(receipt: Dict[str, Any], token: str, recipient: str) -> int:
+    """
+    Sum of ERC-20 Transfer(…, recipient, value) logs emitted by `token`.
+    """
+    token = token.lower()
+    recipient = recipient.lower()
+    total = 0
+    for log in receipt.get("logs") or []:
+        topics = log.get("topics") or []
+        if (
+            len(topics) == 3
+            and topics[0].lower() == TRANSFER_TOPIC
+            and (log.get("address") or "").lower() == token
+            and _topic_addr(topics[2]) == recipient
+        ):
+            total += int(log.get("data") or "0x0", 16)
+    return total
+
+
+def _tx_hashes(o: Dict[str, Any]) -> List[str]:
+    return [o["tx_hash"], *(o.get("prior_tx_hashes") or [])]
+
+
+async def track_receipts(ctx: Context, orders: List[Dict[str, Any]]) -> List[str]:
+    """
+    One batched eth_getTransactionReceipt for every hash of every broadcast
+    order (the current tx plus any it replaced); the first receipt found
+    settles the order.
+    - status 1 → complete, with delivered_raw from the Transfer log to the recipient;
+      gasUsed feeds the per-token gas model
+    - status 0 → reverted on-chain, routed to the refund flow; when it burned
+      (nearly) the whole gas limit the token's learned gas samples are dropped
+    - no receipt after RECEIPT_TIMEOUT_S → see _resend_stuck
+    Returns the ids whose status changed back to a balance-checked state.
+    """
+    inflight = [o for o in orders if o.get("tx_hash")]
+    if not inflight:
+        return []
+    res = iter(
+        await async_rpc_batch(
+            [("eth_getTransactionReceipt", [h]) for o in inflight for h in _tx_hashes(o)]
+        )
+    )
+    now = time.time()
+    requeue: List[str] = []
+    stuck: List[Dict[str, Any]] = []
+    for o in inflight:
+        found, failed = None, False
+        for h in _tx_hashes(o):
+            j = next(res)
+            if "error" in j:
+                failed = True
+            elif j.get("result") and found is None:
+                found = (h, j["result"])
+        if found is None:
+            if not failed and now - int(o.get("broadcast_at") or now) > RECEIPT_TIMEOUT_S:
+                stuck.append(o)
+            continue
+        tx_hash, receipt = found
+        gas_used = int(receipt.get("gasUsed") or "0x0", 16)
+        if int(receipt.get("status") or "0x0", 16) == 1:
+            delivered = delivered_amount(receipt, o["token_address"], o["recipient"])
+            mark_complete(ctx, o["id"], tx_hash=tx_hash, delivered_raw=delivered)
+            record_gas_used(ctx, o["token_address"], gas_used)
+        else:
+            sent = o.get("sent_tx") if tx_hash == o["tx_hash"] else None
+            if is_out_of_gas(gas_used, (sent or {}).get("gas")):
+                forget_gas_model(ctx, o["token_address"])
+                ctx.logger.warning(
+                    f"[gas] {o['id']} ran out of gas ({gas_used}); "
+                    f"re-estimating {o['token_address']}"
+                )
+            err = f"swap reverted on-chain: {tx_hash}"
+            with batch(ctx):
+                mark_error(ctx, o["id"], err)
+                mark_refund_pending(ctx, o["id"], err)
+            requeue.append(o["id"])
+    if stuck:
+        requeue += await _resend_stuck(ctx, stuck)
+    return requeue
+
+
+def _bumped(sent: Dict[str, Any]) -> Dict[str, Any] | None:
+    """
+    Replacement for `sent` at gas price × RECEIPT_GAS_BUMP. The wallet only
+    holds value + gas budget, so the extra gas cost comes out of the swap
+    value and the tx costs at most what the original did. None when the
+    value cannot cover it.
+    """
+    gas_price = int(sent["gasPrice"] * RECEIPT_GAS_BUMP) + 1
+    value = int(sent["value"]) - int(sent["gas"]) * (gas_price - int(sent["gasPrice"]))
+    if value <= 0:
+        return None
+    return {**sent, "gasPrice": gas_price, "value": value}
+
+
+async def _resend_stuck(ctx: Context, orders: List[Dict[str, Any]]) -> List[str]:
+    """
+    Broadcast txs without a receipt after RECEIPT_TIMEOUT_S, looked up with
+    one batched eth_getTransactionByHash:
+    - still in the mempool → replaced with the same nonce at gas price ×
+      RECEIPT_GAS_BUMP (up to RECEIPT_MAX_REPLACEMENTS tries, refused ones
+      included, then keep waiting); see _bumped
+    - unknown to the node → the same signed tx is sent again (same hash)
+    - unknown and cannot be re-sent → dropped, back to pending
+    Returns the ids sent back to pending.
+    """
+    res = await async_rpc_batch(
+        [("eth_getTransactionByHash", [o["tx_hash"]]) for o in orders]
+    )
+    requeue: List[str] = []
+    for o, j in zip(orders, res):
+        if "error" in j:
+            continue
+        pending = j.get("result") is not None
+        sent = o.get("sent_tx")
+        if pending:
+            if not sent or int(o.get("replacements") or 0) >= RECEIPT_MAX_REPLACEMENTS:
+                continue
+            tx = _bumped(sent)
+            if tx is None:
+                mark_replace_failed(ctx, o["id"], "value too small to pay for a gas bump")
+                continue
+        elif sent:
+            tx = sent
+        else:
+            mark_dropped(ctx, o["id"], f"no receipt after {RECEIPT_TIMEOUT_S:.0f}s")
+            requeue.append(o["id"])
+            continue
+        try:
+            txh = await async_sign_and_send(order_account(o), tx)
+        except Exception as e:
+            msg = str(e).lower()
+            if pending:
+                mark_replace_failed(ctx, o["id"], str(e))
+                continue
+            if "nonce too low" in msg or "already known" in msg:
+                # One of this order's txs is mined / queued already; its
+                # receipt shows up on a later pass.
+                ctx.logger.warning(f"[receipts] re-send of {o['id']} refused: {e}")
+                continue
+            mark_dropped(
+                ctx, o["id"], f"no receipt after {RECEIPT_TIMEOUT_S:.0f}s; re-send failed: {e}"
+            )
+            requeue.append(o["id"])
+            continue
+        mark_replaced(ctx, o["id"], txh, tx)
+    return requeue
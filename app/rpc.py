@@ -1,43 +1,330 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+import asyncio
+import itertools
+import time
+import aiohttp
 import requests
-from eth_abi import encode, decode
+from requests.adapters import HTTPAdapter
 
-from .config import BSC_RPC_URL, ROUTER_V2
-from .utils import selector
+from .config import (
+    BSC_RPC_URL,
+    ROUTER_V2,
+    MULTICALL3,
+    MULTICALL3_CHUNK,
+    RPC_POOL_SIZE,
+    RPC_MAX_RETRIES,
+    RPC_BACKOFF_S,
+    RPC_TIMEOUT_S,
+    RPC_BATCH_SIZE,
+)
+from .abi_codec import (
+    decode_aggregate3,
+    decode_uint_array,
+    encode_aggregate3,
+    encode_get_amounts_out,
+)
 
+# Per-method timeouts (seconds). Anything not listed uses RPC_TIMEOUT_S.
+RPC_METHOD_TIMEOUTS: Dict[str, float] = {
+    "eth_blockNumber": 5.0,
+    "eth_gasPrice": 5.0,
+    "eth_getBalance": 5.0,
+    "eth_getTransactionCount": 5.0,
+    "eth_call": 10.0,
+    "eth_estimateGas": 10.0,
+    "eth_sendRawTransaction": 20.0,
+}
 
-def rpc(method: str, params: list) -> dict:
-    r = requests.post(
-        BSC_RPC_URL,
-        json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
-        timeout=20,
-    )
-    r.raise_for_status()
-    return r.json()
+# Methods that must not be blindly re-sent after a transport error.
+_NO_RETRY_METHODS = {"eth_sendRawTransaction"}
 
+_RETRY_HTTP_STATUS = {429, 502, 503, 504}
+_RETRY_RPC_CODES = {-32005}  # "limit exceeded" on most public BSC nodes
 
-def rpc_call_generic(
-    to_addr: str, data_hex: str, value_dec_str: str | int = 0
-) -> Dict[str, Any]:
+
+def _chunks(calls: List[Tuple[str, list]], chunk_size: int):
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, len(calls), chunk_size):
+        yield calls[start : start + chunk_size]
+
+
+def _batch_payload(next_id, chunk: List[Tuple[str, list]]) -> List[dict]:
+    return [
+        {"jsonrpc": "2.0", "id": next_id(), "method": m, "params": p}
+        for m, p in chunk
+    ]
+
+
+def _batch_opts(client, chunk: List[Tuple[str, list]]) -> Tuple[float, bool]:
+    timeout = max(client.timeout_for(m) for m, _ in chunk)
+    retry = not any(m in _NO_RETRY_METHODS for m, _ in chunk)
+    return timeout, retry
+
+
+def _match_batch(payload: List[dict], j: Any) -> List[dict]:
+    """
+    Re-order a batch response by request id. Missing items and whole-chunk
+    failures become per-item {"error": ...} entries.
+    """
+    if not isinstance(j, list):
+        err = (j or {}).get("error") if isinstance(j, dict) else None
+        err = err or {"code": -32603, "message": "invalid batch response"}
+        return [{"error": err} for _ in payload]
+    by_id = {it.get("id"): it for it in j if isinstance(it, dict)}
+    return [
+        by_id.get(req["id"])
+        or {"error": {"code": -32603, "message": "missing batch item"}}
+        for req in payload
+    ]
+
+
+class RpcClient:
+    """
+    JSON-RPC client that owns a keep-alive connection pool.
+    Hands out unique request ids, applies per-method timeouts and retries
+    transient failures (connection errors, 429/5xx, rate limits) with backoff.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = RPC_POOL_SIZE,
+        max_retries: int = RPC_MAX_RETRIES,
+        backoff_s: float = RPC_BACKOFF_S,
+        default_timeout: float = RPC_TIMEOUT_S,
+        timeouts: Dict[str, float] | None = None,
+    ):
+        self.url = url
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_s = float(backoff_s)
+        self.default_timeout = float(default_timeout)
+        self.timeouts = dict(RPC_METHOD_TIMEOUTS if timeouts is None else timeouts)
+        self._ids = itertools.count(1)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def timeout_for(self, method: str) -> float:
+        return self.timeouts.get(method, self.default_timeout)
+
+    def _post(self, payload: Any, timeout: float, retry: bool) -> Any:
+        attempts = self.max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                r = self.session.post(self.url, json=payload, timeout=timeout)
+                if r.status_code in _RETRY_HTTP_STATUS and not last:
+                    time.sleep(self.backoff_s * (2**attempt))
+                    continue
+                r.raise_for_status()
+                j = r.json()
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                time.sleep(self.backoff_s * (2**attempt))
+                continue
+            err = j.get("error") if isinstance(j, dict) else None
+            if err and err.get("code") in _RETRY_RPC_CODES and not last:
+                time.sleep(self.backoff_s * (2**attempt))
+                continue
+            return j
+        raise RuntimeError("unreachable")
+
+    def call(self, method: str, params: list) -> dict:
+        payload = {
+            "jsonrpc": "2.0",
+            "id": self.next_id(),
+            "method": method,
+            "params": params,
+        }
+        return self._post(
+            payload, self.timeout_for(method), method not in _NO_RETRY_METHODS
+        )
+
+    def batch(
+        self, calls: List[Tuple[str, list]], chunk_size: int = RPC_BATCH_SIZE
+    ) -> List[dict]:
+        """
+        Send [(method, params), ...] as JSON-RPC array payloads of at most
+        chunk_size items. Returns one response dict per call, in call order.
+        A failed item (or a failed chunk) yields {"error": {...}} for that
+        position only; other items are unaffected.
+        """
+        out: List[dict] = []
+        for chunk in _chunks(calls, chunk_size):
+            payload = _batch_payload(self.next_id, chunk)
+            try:
+                j = self._post(payload, *_batch_opts(self, chunk))
+            except Exception as e:
+                j = {"error": {"code": -32603, "message": f"batch failed: {e}"}}
+            out.extend(_match_batch(payload, j))
+        return out
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncRpcClient:
     """
-    Perform eth_call with {to, data, value}. Returns JSON result or error.
+    asyncio counterpart of RpcClient on top of aiohttp, so settlement can
+    await RPC round trips instead of blocking the agent's event loop.
+    The session (and its keep-alive pool) is created lazily on first use.
     """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = RPC_POOL_SIZE,
+        max_retries: int = RPC_MAX_RETRIES,
+        backoff_s: float = RPC_BACKOFF_S,
+        default_timeout: float = RPC_TIMEOUT_S,
+        timeouts: Dict[str, float] | None = None,
+    ):
+        self.url = url
+        self.pool_size = int(pool_size)
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_s = float(backoff_s)
+        self.default_timeout = float(default_timeout)
+        self.timeouts = dict(RPC_METHOD_TIMEOUTS if timeouts is None else timeouts)
+        self._ids = itertools.count(1)
+        self._session: aiohttp.ClientSession | None = None
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def timeout_for(self, method: str) -> float:
+        return self.timeouts.get(method, self.default_timeout)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={"Content-Type": "application/json"},
+            )
+        return self._session
+
+    async def _post(self, payload: Any, timeout: float, retry: bool) -> Any:
+        session = self._get_session()
+        attempts = self.max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                async with session.post(
+                    self.url,
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=timeout),
+                ) as r:
+                    if r.status in _RETRY_HTTP_STATUS and not last:
+                        await asyncio.sleep(self.backoff_s * (2**attempt))
+                        continue
+                    r.raise_for_status()
+                    j = await r.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last:
+                    raise
+                await asyncio.sleep(self.backoff_s * (2**attempt))
+                continue
+            err = j.get("error") if isinstance(j, dict) else None
+            if err and err.get("code") in _RETRY_RPC_CODES and not last:
+                await asyncio.sleep(self.backoff_s * (2**attempt))
+                continue
+            return j
+        raise RuntimeError("unreachable")
+
+    async def call(self, method: str, params: list) -> dict:
+        payload = {
+            "jsonrpc": "2.0",
+            "id": self.next_id(),
+            "method": method,
+            "params": params,
+        }
+        return await self._post(
+            payload, self.timeout_for(method), method not in _NO_RETRY_METHODS
+        )
+
+    async def batch(
+        self, calls: List[Tuple[str, list]], chunk_size: int = RPC_BATCH_SIZE
+    ) -> List[dict]:
+        """
+        Same contract as RpcClient.batch; chunks are sent concurrently.
+        """
+
+        async def _one(chunk: List[Tuple[str, list]]) -> List[dict]:
+            payload = _batch_payload(self.next_id, chunk)
+            try:
+                j = await self._post(payload, *_batch_opts(self, chunk))
+            except Exception as e:
+                j = {"error": {"code": -32603, "message": f"batch failed: {e}"}}
+            return _match_batch(payload, j)
+
+        parts = await asyncio.gather(*(_one(c) for c in _chunks(calls, chunk_size)))
+        return [item for part in parts for item in part]
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+_client = RpcClient(BSC_RPC_URL)
+_async_client = AsyncRpcClient(BSC_RPC_URL)
+
+
+def rpc(method: str, params: list) -> dict:
+    return _client.call(method, params)
+
+
+def rpc_batch(calls: List[Tuple[str, list]]) -> List[dict]:
+    return _client.batch(calls)
+
+
+async def async_rpc(method: str, params: list) -> dict:
+    return await _async_client.call(method, params)
+
+
+async def async_rpc_batch(calls: List[Tuple[str, list]]) -> List[dict]:
+    return await _async_client.batch(calls)
+
+
+async def close_clients() -> None:
+    """Release both pools' connections (agent shutdown)."""
+    _client.close()
+    await _async_client.close()
+
+
+def _eth_call_params(
+    to_addr: str, data_hex: str, value_dec_str: str | int, gas: int | None = None
+) -> list:
     if isinstance(value_dec_str, str):
         value_int = int(value_dec_str) if value_dec_str else 0
     else:
         value_int = int(value_dec_str)
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "eth_call",
-        "params": [
-            {"to": to_addr, "data": data_hex, "value": hex(value_int)},
-            "latest",
-        ],
-        "id": 1,
-    }
-    r = requests.post(BSC_RPC_URL, json=payload, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    call = {"to": to_addr, "data": data_hex, "value": hex(value_int)}
+    if gas is not None:
+        call["gas"] = hex(int(gas))
+    return [call, "latest"]
+
+
+def rpc_call_generic(
+    to_addr: str, data_hex: str, value_dec_str: str | int = 0, gas: int | None = None
+) -> Dict[str, Any]:
+    """
+    Perform eth_call with {to, data, value[, gas]}. Returns JSON result or error.
+    """
+    return rpc("eth_call", _eth_call_params(to_addr, data_hex, value_dec_str, gas))
+
+
+async def async_rpc_call_generic(
+    to_addr: str, data_hex: str, value_dec_str: str | int = 0, gas: int | None = None
+) -> Dict[str, Any]:
+    return await async_rpc(
+        "eth_call", _eth_call_params(to_addr, data_hex, value_dec_str, gas)
+    )
 
 
 def rpc_call_router(data_hex: str) -> str:
@@ -50,48 +337,145 @@ def rpc_call_router(data_hex: str) -> str:
     return j["result"]
 
 
-def get_amount_out_min(amount_in_wei: int, path: list[str], slippage_bps: int) -> int:
-    sel = selector("getAmountsOut(uint256,address[])")
-    calldata = sel + encode(["uint256", "address[]"], [amount_in_wei, path])
-    data = "0x" + calldata.hex()
+async def async_rpc_call_router(data_hex: str) -> str:
+    j = await async_rpc_call_generic(ROUTER_V2, data_hex, 0)
+    if "error" in j:
+        raise RuntimeError(f"eth_call error: {j['error']}")
+    return j["result"]
+
+
+def _amounts_out_calldata(amount_in_wei: int, path: list[str]) -> str:
+    return "0x" + encode_get_amounts_out(amount_in_wei, path).hex()
+
 
-    res = rpc_call_router(data)
-    out_bytes = bytes.fromhex(res[2:])
-    amounts = decode(["uint256[]"], out_bytes)[0]
+def _amount_out_min_from_result(res: str, slippage_bps: int) -> int:
+    amounts = decode_uint_array(bytes.fromhex(res[2:]))
     if len(amounts) < 2:
         raise RuntimeError("Router returned invalid amounts")
-    amount_out = amounts[-1]
+    return apply_slippage(amounts[-1], slippage_bps)
+
+
+def router_amount_out_min(amount_in_wei: int, path: list[str], slippage_bps: int) -> int:
+    """
+    Router getAmountsOut over eth_call. quoting.get_amount_out_min quotes
+    locally and only uses this as a fallback / cross-check.
+    """
+    res = rpc_call_router(_amounts_out_calldata(amount_in_wei, path))
+    return _amount_out_min_from_result(res, slippage_bps)
 
-    if not (0 <= slippage_bps < 10_000):
-        raise ValueError("slippage_bps must be in [0, 9999]")
-    return (amount_out * (10_000 - slippage_bps)) // 10_000
 
+async def async_router_amount_out_min(
+    amount_in_wei: int, path: list[str], slippage_bps: int
+) -> int:
+    res = await async_rpc_call_router(_amounts_out_calldata(amount_in_wei, path))
+    return _amount_out_min_from_result(res, slippage_bps)
 
-def simulate_swap(tx: dict) -> Dict[str, Any]:
+
+def _simulation_result(j: dict) -> Dict[str, Any]:
+    if "error" in j:
+        msg = j["error"].get("message", "execution reverted")
+        return {"ok": False, "revert": msg}
+    raw = j.get("result", "0x")
+    decoded = None
+    amount_out = None
+    try:
+        decoded = decode_uint_array(bytes.fromhex(raw[2:]))
+        if len(decoded) >= 2:
+            amount_out = decoded[-1]
+    except Exception:
+        pass
+    return {"ok": True, "result": raw, "amounts": decoded, "amount_out": amount_out}
+
+
+def simulate_swap(tx: dict, gas: int | None = None) -> Dict[str, Any]:
     """
     eth_call the actual swap tx (to, data, value) to see if it would succeed.
+    With `gas` the call is capped at the limit the tx will be sent with, so
+    a limit that is too low shows up as an out-of-gas failure here.
     If success, many routers return encoded return data (amounts[]).
     If revert, return a human-friendly message.
     """
     try:
         j = rpc_call_generic(
-            to_addr=tx["to"], data_hex=tx["data"], value_dec_str=tx.get("value", "0")
+            to_addr=tx["to"],
+            data_hex=tx["data"],
+            value_dec_str=tx.get("value", "0"),
+            gas=gas,
         )
-        if "error" in j:
-            msg = j["error"].get("message", "execution reverted")
-            return {"ok": False, "revert": msg}
-        raw = j.get("result", "0x")
-        decoded = None
-        amount_out = None
-        try:
-            amounts = decode(["uint256[]"], bytes.fromhex(raw[2:]))[0]
-            decoded = [int(x) for x in amounts]
-            if len(decoded) >= 2:
-                amount_out = decoded[-1]
-        except Exception:
-            pass
-        return {"ok": True, "result": raw, "amounts": decoded, "amount_out": amount_out}
+        return _simulation_result(j)
     except requests.HTTPError as e:
         return {"ok": False, "revert": f"RPC HTTP error: {e}"}
     except Exception as e:
         return {"ok": False, "revert": f"Simulation error: {e}"}
+
+
+async def async_simulate_swap(tx: dict, gas: int | None = None) -> Dict[str, Any]:
+    try:
+        j = await async_rpc_call_generic(
+            to_addr=tx["to"],
+            data_hex=tx["data"],
+            value_dec_str=tx.get("value", "0"),
+            gas=gas,
+        )
+        return _simulation_result(j)
+    except aiohttp.ClientResponseError as e:
+        return {"ok": False, "revert": f"RPC HTTP error: {e}"}
+    except Exception as e:
+        return {"ok": False, "revert": f"Simulation error: {e}"}
+
+
+# === Multicall3 ===
+# aggregate3((address target, bool allowFailure, bytes callData)[])
+#   returns (bool success, bytes returnData)[]
+# Every sub-call is sent with allowFailure=true, so one reverting target
+# only fails its own slot. Large call lists are split into MULTICALL3_CHUNK
+# sized aggregate3 calls, all sent in a single JSON-RPC batch request.
+
+
+def _aggregate3_calls(calls: List[Tuple[str, bytes]]) -> List[Tuple[str, list]]:
+    out = []
+    for chunk in _chunks(calls, MULTICALL3_CHUNK):
+        data = encode_aggregate3(chunk)
+        out.append(
+            ("eth_call", [{"to": MULTICALL3, "data": "0x" + data.hex()}, "latest"])
+        )
+    return out
+
+
+def _aggregate3_results(
+    calls: List[Tuple[str, bytes]], responses: List[dict]
+) -> List[Tuple[bool, bytes]]:
+    out: List[Tuple[bool, bytes]] = []
+    for chunk, j in zip(_chunks(calls, MULTICALL3_CHUNK), responses):
+        try:
+            if "error" in j:
+                raise RuntimeError(j["error"].get("message", "aggregate3 error"))
+            rows = decode_aggregate3(bytes.fromhex(j["result"][2:]))
+            if len(rows) != len(chunk):
+                raise RuntimeError("aggregate3 returned wrong length")
+            out.extend(rows)
+        except Exception:
+            out.extend((False, b"") for _ in chunk)
+    return out
+
+
+def multicall3(calls: List[Tuple[str, bytes]]) -> List[Tuple[bool, bytes]]:
+    """
+    calls: [(target, calldata_bytes), ...]
+    Returns [(success, return_bytes), ...] aligned with calls.
+    """
+    if not calls:
+        return []
+    return _aggregate3_results(calls, rpc_batch(_aggregate3_calls(calls)))
+
+
+async def async_multicall3(calls: List[Tuple[str, bytes]]) -> List[Tuple[bool, bytes]]:
+    if not calls:
+        return []
+    return _aggregate3_results(calls, await async_rpc_batch(_aggregate3_calls(calls)))
+
+
+def apply_slippage(amount_out: int, slippage_bps: int) -> int:
+    if not (0 <= slippage_bps < 10_000):
+        raise ValueError("slippage_bps must be in [0, 9999]")
+    return (amount_out * (10_000 - slippage_bps)) // 10_000
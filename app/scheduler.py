@@ -0,0 +1,93 @@
+from typing import Dict, Any, Iterable, List, Set
+import heapq
+import time
+
+from .config import (
+    SCHED_FAST_S,
+    SCHED_FRESH_WINDOW_S,
+    SCHED_BASE_S,
+    SCHED_MAX_S,
+    SCHED_DORMANT_AFTER_S,
+    SCHED_DORMANT_INTERVAL_S,
+    ORDER_EXPIRE_AFTER_S,
+)
+
+
+class OrderScheduler:
+    """
+    Per-order polling schedule kept in a min-heap of (next_check_at, order_id).
+
+    - fresh orders (younger than SCHED_FRESH_WINDOW_S) are checked every SCHED_FAST_S
+    - after that the interval doubles on every idle check, from SCHED_BASE_S
+      up to SCHED_MAX_S (failed attempts count as idle checks too)
+    - orders older than SCHED_DORMANT_AFTER_S are dormant: every SCHED_DORMANT_INTERVAL_S
+    - wake() (e.g. a funding tx seen in a block) makes an order due immediately
+
+    State lives in memory; after a restart every active order is due once.
+    """
+
+    def __init__(self):
+        self._heap: List[tuple[float, str]] = []
+        self._next: Dict[str, float] = {}
+        self._idle: Dict[str, int] = {}
+
+    def _push(self, order_id: str, at: float) -> None:
+        self._next[order_id] = at
+        heapq.heappush(self._heap, (at, order_id))
+
+    def sync(self, orders: Iterable[Dict[str, Any]], now: float | None = None) -> None:
+        """Track new active orders (due now) and forget ones that left the set."""
+        now = time.time() if now is None else now
+        ids = set()
+        for o in orders:
+            ids.add(o["id"])
+            if o["id"] not in self._next:
+                self._idle[o["id"]] = 0
+                self._push(o["id"], now)
+        for oid in list(self._next):
+            if oid not in ids:
+                del self._next[oid]
+                self._idle.pop(oid, None)
+
+    def due(self, now: float | None = None) -> Set[str]:
+        now = time.time() if now is None else now
+        out: Set[str] = set()
+        while self._heap and self._heap[0][0] <= now:
+            at, oid = heapq.heappop(self._heap)
+            if self._next.get(oid) == at:  # skip stale heap entries
+                out.add(oid)
+        return out
+
+    def wake(self, order_ids: Iterable[str], now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        for oid in order_ids:
+            if oid in self._next:
+                self._idle[oid] = 0
+                self._push(oid, now)
+
+    def interval(self, o: Dict[str, Any], now: float) -> float:
+        age = now - int(o.get("created_at") or now)
+        if age >= SCHED_DORMANT_AFTER_S:
+            return SCHED_DORMANT_INTERVAL_S
+        if age < SCHED_FRESH_WINDOW_S:
+            return SCHED_FAST_S
+        idle = self._idle.get(o["id"], 0) + int(o.get("attempts") or 0)
+        return min(SCHED_BASE_S * (2 ** min(idle, 16)), SCHED_MAX_S)
+
+    def checked(self, o: Dict[str, Any], now: float | None = None) -> None:
+        """Record an idle check and schedule the next one."""
+        now = time.time() if now is None else now
+        if o["id"] not in self._next:
+            return
+        self._idle[o["id"]] = self._idle.get(o["id"], 0) + 1
+        self._push(o["id"], now + self.interval(o, now))
+
+
+def is_expired(o: Dict[str, Any], bal: int | None, now: float | None = None) -> bool:
+    """
+    An order expires only when it holds nothing and has outlived
+    ORDER_EXPIRE_AFTER_S; wallets with any balance are never dropped.
+    """
+    now = time.time() if now is None else now
+    age = now - int(o.get("created_at") or now)
+    return bal == 0 and age >= ORDER_EXPIRE_AFTER_S
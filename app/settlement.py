@@ -1,25 +1,48 @@
+import asyncio
+import time
 from decimal import Decimal
-from typing import Optional
+from typing import Optional, Tuple
 from uagents import Context
-from eth_account import Account
-from hexbytes import HexBytes
+from eth_account.signers.local import LocalAccount
 from eth_utils import to_checksum_address
 
 from .orders_kv import (
+    batch,
     list_active,
-    mark_complete,
+    mark_broadcast,
+    mark_expired,
+    mark_funded,
     mark_error,
-    set_tx_hash,
     mark_refund_pending,
     mark_refunded,
 )
-from .rpc import get_amount_out_min, simulate_swap, rpc
-from .tx_builders import build_swap_exact_eth_tx, estimate_gas_and_price
-from .agent_wallet import get_nonce, get_balance_wei, send_raw_tx
+from .rpc import async_simulate_swap, async_rpc
+from .quoting import (
+    Reserves,
+    amount_out_v2,
+    async_fetch_reserves,
+    async_get_amount_out_min,
+)
+from .funding import scan_funding
+from .receipts import track_receipts
+from .impact import impact_slippage_bps
+from .order_wallets import order_account
+from .gas_model import gas_limit_for, forget as forget_gas_model
+from .scheduler import OrderScheduler, is_expired
+from .tx_builders import build_swap_exact_eth_tx, async_estimate_gas
+from .agent_wallet import (
+    async_get_nonce,
+    async_get_balance_wei,
+    async_get_balances_wei,
+    async_get_nonces,
+    async_send_raw_tx,
+    sign_raw,
+)
 from .config import (
     CHAIN_ID,
     GAS_BUDGET_MULTIPLIER,
     MIN_SWAP_VALUE_WEI,
+    SETTLEMENT_CONCURRENCY,
     WBNB_BSC,
 )
 
@@ -28,35 +51,43 @@ def _budget(gas_limit: int, gas_price: int) -> int:
     return int(Decimal(gas_limit * gas_price) * Decimal(str(GAS_BUDGET_MULTIPLIER)))
 
 
-def _broadcast_legacy(
-    final_tx: dict, gas_limit: int, gas_price: int, nonce: int, priv: str, ctx: Context
-) -> str:
-    acct = Account.from_key(priv)
-    norm = {
+def _tx_gas(gas_limit: int) -> int:
+    """Gas limit the tx is sent with: the estimate/learned limit plus headroom."""
+    return int(gas_limit + max(20_000, gas_limit // 10))
+
+
+def _legacy_tx(final_tx: dict, gas_limit: int, gas_price: int, nonce: int) -> dict:
+    return {
         "chainId": int(CHAIN_ID),
         "to": to_checksum_address(final_tx["to"]),
         "value": int(final_tx["value"]),
-        "gas": int(gas_limit + max(20_000, gas_limit // 10)),
+        "gas": _tx_gas(gas_limit),
         "gasPrice": int(gas_price),
         "nonce": int(nonce),
         "data": final_tx.get("data") or "0x",
     }
-    signed = acct.sign_transaction(norm)
-    if hasattr(signed, "rawTransaction"):
-        raw_bytes = bytes(HexBytes(getattr(signed, "rawTransaction")))
-    elif isinstance(signed, (bytes, bytearray, HexBytes)):
-        raw_bytes = bytes(HexBytes(signed))
-    elif hasattr(signed, "raw_transaction"):
-        raw_bytes = bytes(HexBytes(getattr(signed, "raw_transaction")))
-    else:
-        raise TypeError(f"Unsupported signed tx type: {type(signed)}")
-    ctx.logger.info(f"\n  signed raw tx: 0x{HexBytes(raw_bytes).hex()}\n")
-    return send_raw_tx("0x" + HexBytes(raw_bytes).hex())
 
 
-def _gas_price_safe() -> int:
+async def _send_signed(norm: dict, acct: LocalAccount, ctx: Context) -> str:
+    raw_hex = sign_raw(acct, norm)
+    ctx.logger.info(f"\n  signed raw tx: {raw_hex}\n")
+    return await async_send_raw_tx(raw_hex)
+
+
+async def _broadcast_legacy(
+    final_tx: dict,
+    gas_limit: int,
+    gas_price: int,
+    nonce: int,
+    acct: LocalAccount,
+    ctx: Context,
+) -> str:
+    return await _send_signed(_legacy_tx(final_tx, gas_limit, gas_price, nonce), acct, ctx)
+
+
+async def _gas_price_safe() -> int:
     try:
-        gp = rpc("eth_gasPrice", [])
+        gp = await async_rpc("eth_gasPrice", [])
         if "error" in gp:
             raise RuntimeError(gp["error"].get("message", "gasPrice error"))
         return int(gp["result"], 16)
@@ -72,43 +103,80 @@ def _build_refund_tx(to_addr: str, value_wei: int) -> dict:
     }
 
 
-def _estimate_refund_cost(from_addr: str) -> tuple[int, int, int]:
+async def _estimate_refund_cost(gas_price: int | None = None) -> tuple[int, int, int]:
     """
     Returns (gas_limit, gas_price, budget) for a simple native transfer.
     """
-    gas_price = _gas_price_safe()
+    if gas_price is None:
+        gas_price = await _gas_price_safe()
     gas_limit = 30_000
     budget = _budget(gas_limit, gas_price)
     return gas_limit, gas_price, budget
 
 
-def _try_refund(ctx: Context, o: dict) -> Optional[str]:
+async def _try_refund(
+    ctx: Context,
+    o: dict,
+    acct: LocalAccount,
+    bal: int | None = None,
+    nonce: int | None = None,
+    gas_price: int | None = None,
+) -> Optional[str]:
     """
     Try to refund remaining BNB from recv_addr back to recipient.
     Returns tx hash if broadcasted, None if not enough to cover gas.
+    bal/nonce/gas_price may be passed in from the tick's batched pre-pass.
     """
-    bal = get_balance_wei(o["recv_addr"])
+    if bal is None:
+        bal = await async_get_balance_wei(o["recv_addr"])
     if bal <= 0:
         return None
-    gas_limit, gas_price, budget = _estimate_refund_cost(o["recv_addr"])
+    gas_limit, gas_price, budget = await _estimate_refund_cost(gas_price)
     amount = bal - budget
     if amount <= 0:
         return None
 
     tx = _build_refund_tx(o["recipient"], amount)
-    nonce = get_nonce(o["recv_addr"])
-    txh = _broadcast_legacy(tx, gas_limit, gas_price, nonce, o["recv_priv"], ctx)
+    if nonce is None:
+        nonce = await async_get_nonce(o["recv_addr"])
+    txh = await _broadcast_legacy(tx, gas_limit, gas_price, nonce, acct, ctx)
     ctx.logger.info(f"Refund tx sent for order {o['id']} → {txh} (amount {amount} wei)")
     return txh
 
 
-async def try_settle_one(ctx: Context, o: dict) -> Optional[str]:
+def _is_out_of_gas_error(revert: str | None) -> bool:
+    msg = (revert or "").lower()
+    return "out of gas" in msg or "gas required exceeds" in msg
+
+
+def _swap_path(o: dict) -> list[str]:
+    return [to_checksum_address(WBNB_BSC), to_checksum_address(o["token_address"])]
+
+
+async def try_settle_one(
+    ctx: Context,
+    o: dict,
+    bal: int | None = None,
+    nonce: int | None = None,
+    reserves: Reserves | None = None,
+    gas_price: int | None = None,
+) -> Optional[Tuple[str, dict]]:
+    """
+    Returns (tx hash, tx as sent) once a swap is broadcast, else None.
+    bal/nonce/reserves/gas_price come from the tick's batched pre-pass.
+    With all of them present a funded order costs two round trips before
+    broadcast (eth_estimateGas, then the eth_call simulation); both quotes
+    are computed locally from the pair reserves. Once the token's gas model
+    is warm, eth_estimateGas is skipped as well.
+    """
     ctx.logger.info(f"\n Checking order {o['id']}...")
     ctx.logger.info(f"\n  recv_addr: {o['recv_addr']}")
-    bal = get_balance_wei(o["recv_addr"])
+    if bal is None:
+        bal = await async_get_balance_wei(o["recv_addr"])
+    acct = order_account(o)
 
     if o.get("status") == "refund_pending":
-        txh = _try_refund(ctx, o)
+        txh = await _try_refund(ctx, o, acct, bal, nonce, gas_price)
         if txh:
             mark_refunded(ctx, o["id"], tx_hash=txh)
         else:
@@ -120,34 +188,42 @@ async def try_settle_one(ctx: Context, o: dict) -> Optional[str]:
         return None
 
     ctx.logger.info(f"\n Settling order {o['id']} with balance {bal} wei...")
-    path = [to_checksum_address(WBNB_BSC), to_checksum_address(o["token_address"])]
-
-    ctx.logger.info("\n  estimating gas...")
-    dummy_min = get_amount_out_min(bal, path, o["slippage_bps"])
-    dummy_tx = build_swap_exact_eth_tx(
-        bal, dummy_min, path, o["recipient"], deadline_unix=2**31 - 1
-    )
-
-    ctx.logger.info("\n  simulating gas...")
-    gas_limit, gas_price, gas_err = estimate_gas_and_price(
-        dummy_tx, from_address=o["recv_addr"]
-    )
-    if gas_limit is None or gas_price is None:
-        err = f"gas estimation failed: {gas_err or 'unknown'}"
-        mark_error(ctx, o["id"], err)
-        txh = _try_refund(ctx, o)
-        if txh:
-            mark_refunded(ctx, o["id"], tx_hash=txh)
-        else:
-            mark_refund_pending(ctx, o["id"], err)
-        return None
+    path = _swap_path(o)
+    slippage_bps = o["slippage_bps"]
+    if o.get("slippage_auto") and reserves is not None:
+        slippage_bps, why = impact_slippage_bps(o["token_address"], bal, reserves)
+        ctx.logger.info(f"\n  slippage: {why}")
+    if gas_price is None:
+        gas_price = await _gas_price_safe()
+
+    gas_limit = gas_limit_for(ctx, o["token_address"])
+    learned = gas_limit is not None
+    if learned:
+        ctx.logger.info(f"\n  learned gas limit: {gas_limit}, gas price: {gas_price} wei")
+    else:
+        ctx.logger.info("\n  estimating gas...")
+        dummy_min = await async_get_amount_out_min(bal, path, slippage_bps, reserves)
+        dummy_tx = build_swap_exact_eth_tx(
+            bal, dummy_min, path, o["recipient"], deadline_unix=2**31 - 1
+        )
+
+        gas_limit, gas_err = await async_estimate_gas(dummy_tx, from_address=o["recv_addr"])
+        if gas_limit is None:
+            err = f"gas estimation failed: {gas_err or 'unknown'}"
+            mark_error(ctx, o["id"], err)
+            txh = await _try_refund(ctx, o, acct, bal, nonce, gas_price)
+            if txh:
+                mark_refunded(ctx, o["id"], tx_hash=txh)
+            else:
+                mark_refund_pending(ctx, o["id"], err)
+            return None
 
-    ctx.logger.info(f"\n  estimated gas limit: {gas_limit}, gas price: {gas_price} wei")
+        ctx.logger.info(f"\n  estimated gas limit: {gas_limit}, gas price: {gas_price} wei")
 
     gas_budget = _budget(gas_limit, gas_price)
     amount_in = bal - gas_budget
     if amount_in <= 0:
-        txh = _try_refund(ctx, o)
+        txh = await _try_refund(ctx, o, acct, bal, nonce, gas_price)
         if txh:
             mark_refunded(ctx, o["id"], tx_hash=txh)
         else:
@@ -155,18 +231,27 @@ async def try_settle_one(ctx: Context, o: dict) -> Optional[str]:
         return None
 
     ctx.logger.info(f"\n  gas budget: {gas_budget} wei, amount_in: {amount_in} wei")
-    amount_out_min = get_amount_out_min(amount_in, path, o["slippage_bps"])
+    amount_out_min = await async_get_amount_out_min(
+        amount_in, path, slippage_bps, reserves
+    )
     final_tx = build_swap_exact_eth_tx(
         amount_in, amount_out_min, path, o["recipient"], deadline_unix=2**31 - 1
     )
 
     ctx.logger.info(f"\n  final tx: {final_tx}")
 
-    sim = simulate_swap(final_tx)
+    # Simulated with the gas limit it will be sent with, so a learned limit
+    # that has become too low fails here instead of on-chain.
+    sim = await async_simulate_swap(final_tx, gas=_tx_gas(gas_limit))
     if not sim.get("ok"):
         err = f"swap would revert: {sim.get('revert','unknown')}"
         mark_error(ctx, o["id"], err)
-        txh = _try_refund(ctx, o)
+        if learned and _is_out_of_gas_error(sim.get("revert")):
+            # Don't trust the learned limit for this token any more; the
+            # order is retried through eth_estimateGas before any refund.
+            forget_gas_model(ctx, o["token_address"])
+            return None
+        txh = await _try_refund(ctx, o, acct, bal, nonce, gas_price)
         if txh:
             mark_refunded(ctx, o["id"], tx_hash=txh)
         else:
@@ -174,31 +259,154 @@ async def try_settle_one(ctx: Context, o: dict) -> Optional[str]:
         return None
 
     ctx.logger.info(f"\n  simulation ok: {sim}")
-
-    nonce = get_nonce(o["recv_addr"])
+    # The simulation is the router-side cross-check of the local quote.
+    if reserves is not None and sim.get("amount_out") is not None:
+        expected = amount_out_v2(amount_in, reserves[0], reserves[1])
+        if expected and abs(sim["amount_out"] - expected) * 10_000 > expected * 10:
+            ctx.logger.warning(
+                f"  local quote {expected} vs simulated {sim['amount_out']} differ > 0.1%"
+            )
+
+    if nonce is None:
+        nonce = await async_get_nonce(o["recv_addr"])
     ctx.logger.info(f"\n  using nonce: {nonce}")
 
-    txh = _broadcast_legacy(final_tx, gas_limit, gas_price, nonce, o["recv_priv"], ctx)
+    sent = _legacy_tx(final_tx, gas_limit, gas_price, nonce)
+    txh = await _send_signed(sent, acct, ctx)
     ctx.logger.info(f"\n  sent tx: {txh} \n")
-    return txh
+    return txh, sent
 
 
-async def settlement_tick(ctx: Context):
-    ctx.logger.info("\n Settlement tick...")
-    pending = list_active(ctx)
-    ctx.logger.info(f"\n Pending orders: {pending}")
+_scheduler = OrderScheduler()
 
-    for o in pending:
+
+def _needs_settlement(o: dict, bal: int | None) -> bool:
+    """
+    Pre-pass filter: unknown balances (batch item failed) are kept so the
+    order falls back to a single-call read; otherwise only funded orders pass.
+    """
+    if bal is None:
+        return True
+    if o.get("status") == "refund_pending":
+        return bal > 0
+    return bal >= MIN_SWAP_VALUE_WEI
+
+
+async def _settle_guarded(
+    ctx: Context,
+    o: dict,
+    bal: int | None,
+    nonce: int | None,
+    reserves: Reserves | None,
+    gas_price: int | None,
+    funded_at: int | None = None,
+) -> None:
+    # One batch per order: its transitions commit together, as soon as the
+    # order is done, so a sent swap or refund is never held back by others.
+    with batch(ctx):
         try:
             ctx.logger.info(f"\n Trying to settle order {o['id']}...")
-            txh = await try_settle_one(ctx, o)
-
-            if txh:
-                set_tx_hash(ctx, o["id"], txh)
-                mark_complete(ctx, o["id"], tx_hash=txh)
-                ctx.logger.info(f"Settled order {o['id']} → {txh}")
+            sent = await try_settle_one(ctx, o, bal, nonce, reserves, gas_price)
+
+            if sent:
+                txh, tx = sent
+                funded_at = o.get("funded_at") or funded_at
+                delay = time.time() - funded_at if funded_at else None
+                mark_broadcast(ctx, o["id"], txh, swap_delay_s=delay, sent_tx=tx)
+                ctx.logger.info(
+                    f"Broadcast swap for order {o['id']} → {txh}"
+                    + (f" (funding→swap {delay:.1f}s)" if delay is not None else "")
+                )
 
         except Exception as e:
             mark_error(ctx, o["id"], str(e))
             mark_refund_pending(ctx, o["id"], str(e))
             ctx.logger.error(f"Order {o['id']} failed and set to refund_pending: {e}")
+
+
+async def settlement_tick(ctx: Context):
+    """
+    Orders are independent (one wallet each), so funded orders are settled
+    concurrently, at most SETTLEMENT_CONCURRENCY at a time. Store updates are
+    synchronous and run on the event loop thread, so they never interleave.
+    Each order's status transitions are committed in their own batch.
+    """
+    ctx.logger.info("\n Settlement tick...")
+    active = list_active(ctx)
+    if not active:
+        return
+
+    # In-flight swaps are confirmed from receipts, not balances. Orders sent
+    # back to pending/refund_pending are due immediately on the next pass.
+    inflight = [o for o in active if o.get("status") == "broadcast"]
+    active = [o for o in active if o.get("status") != "broadcast"]
+    if inflight:
+        requeued = await track_receipts(ctx, inflight)
+        if requeued:
+            ctx.logger.info(f"\n Requeued after receipt check: {requeued}")
+    if not active:
+        return
+
+    # Orders are balance-checked when the block scanner saw a transfer to
+    # them or when their scheduled check is due; a full sweep only happens
+    # when the scanner has no usable cursor.
+    now = int(time.time())
+    _scheduler.sync(active, now)
+    hits = await scan_funding(ctx, active)
+    if hits is None:
+        candidates = active
+    else:
+        _scheduler.wake(hits, now)
+        due = _scheduler.due(now)
+        candidates = [o for o in active if o["id"] in due]
+    if not candidates:
+        return
+
+    balances = await async_get_balances_wei([o["recv_addr"] for o in candidates])
+    funded = []
+    for o in candidates:
+        bal = balances.get(to_checksum_address(o["recv_addr"]))
+        if _needs_settlement(o, bal):
+            funded.append(o)
+        elif is_expired(o, bal, now):
+            mark_expired(ctx, o["id"])
+        # Funded orders normally leave the active set; if they don't (e.g.
+        # refund still short of gas) they back off like idle ones.
+        _scheduler.checked(o, now)
+    ctx.logger.info(
+        f"\n Active orders: {len(active)} | checked: {len(candidates)} | funded: {len(funded)}"
+    )
+    if not funded:
+        return
+
+    funded_at = {}
+    for o in funded:
+        if o.get("status") == "pending" and not o.get("funded_at"):
+            funded_at[o["id"]] = (hits or {}).get(o["id"], now)
+            mark_funded(ctx, o["id"], funded_at[o["id"]])
+
+    # One round of shared reads for every funded order: batched nonces, the
+    # pair reserves of every token being bought (one Multicall3 eth_call) and
+    # the gas price.
+    tokens = [o["token_address"] for o in funded if o.get("status") == "pending"]
+    nonces, reserves, gas_price = await asyncio.gather(
+        async_get_nonces([o["recv_addr"] for o in funded]),
+        async_fetch_reserves(tokens) if tokens else asyncio.sleep(0, {}),
+        _gas_price_safe(),
+    )
+    sem = asyncio.Semaphore(max(1, SETTLEMENT_CONCURRENCY))
+
+    async def _run(o: dict) -> None:
+        addr = to_checksum_address(o["recv_addr"])
+        async with sem:
+            await _settle_guarded(
+                ctx,
+                o,
+                balances.get(addr),
+                nonces.get(addr),
+                reserves.get(o["token_address"].lower()),
+                gas_price,
+                funded_at.get(o["id"]),
+            )
+
+    await asyncio.gather(*(_run(o) for o in funded))
@@ -1,56 +1,97 @@
-from typing import Dict, Any
-import json
+from typing import Dict, Any, Tuple
+import time
 import requests
 from eth_utils import to_checksum_address
 
-from .config import GT_BASE, DEFAULT_HEADERS, WBNB_BSC, IS_DEV
+from .config import (
+    GT_BASE,
+    DEFAULT_HEADERS,
+    WBNB_BSC,
+    IS_DEV,
+    POOL_STATS_TTL_S,
+    POOL_STATS_NEG_TTL_S,
+)
+from . import market
+
+# token (lowercase) -> (expires_at, stats). Failures are cached as {} for the
+# shorter POOL_STATS_NEG_TTL_S so a flaky token doesn't cost a request per order.
+_pool_stats: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _select_pool(payload: Dict[str, Any]) -> Dict[str, Any] | None:
+    """
+    Attributes of the first WBNB-paired pool in `included`, by the pool's
+    base/quote token relationship ids; else the first pool (top pools are
+    ordered by liquidity).
+    """
+    wbnb_id = f"bsc_{WBNB_BSC}"
+    first = None
+    for it in payload.get("included") or []:
+        if it.get("type") != "pool":
+            continue
+        rel = it.get("relationships") or {}
+        ids = {
+            ((rel.get(side) or {}).get("data") or {}).get("id", "").lower()
+            for side in ("base_token", "quote_token")
+        }
+        if wbnb_id in ids:
+            return it.get("attributes") or {}
+        if first is None:
+            first = it.get("attributes") or {}
+    return first
+
+
+def _stats_from_attrs(chosen: Dict[str, Any]) -> Dict[str, Any]:
+    liq = (
+        chosen.get("reserve_in_usd")
+        or chosen.get("reserve_usd")
+        or chosen.get("liquidity_usd")
+        or chosen.get("total_liquidity_usd")
+        or chosen.get("pool_liquidity_usd")
+    )
+    chg = chosen.get("price_change_24h") or chosen.get(
+        "price_change_percentage_24h"
+    )
+    if chg is None and isinstance(chosen.get("price_change_percentage"), dict):
+        chg = chosen["price_change_percentage"].get("h24")
+
+    liquidity_usd = float(liq) if liq is not None else None
+    price_change_24h = float(chg) if chg is not None else None
+
+    return {"liquidity_usd": liquidity_usd, "price_change_24h": price_change_24h}
+
 
 def fetch_pool_stats_bsc(token_addr: str) -> Dict[str, Any]:
     """
-    Try to fetch top pool stats for the token from GeckoTerminal.
+    Try to fetch top pool stats for the token from GeckoTerminal (uncached).
     Returns a dict with keys: { 'liquidity_usd', 'price_change_24h' } if available.
     """
     try:
         url = f"{GT_BASE}/networks/bsc/tokens/{to_checksum_address(token_addr)}?include=top_pools"
         r = requests.get(url, headers=DEFAULT_HEADERS, timeout=20)
         r.raise_for_status()
-        j = r.json()
-        included = j.get("included", []) or []
-
-        chosen = None
-        for it in included:
-            if it.get("type") != "pool":
-                continue
-            attrs = it.get("attributes", {}) or {}
-            txt = json.dumps(attrs).lower()
-            if WBNB_BSC in txt:
-                chosen = attrs
-                break
-            if chosen is None:
-                chosen = attrs
-
-        if not chosen:
-            return {}
-
-        liq = (
-            chosen.get("reserve_in_usd")
-            or chosen.get("reserve_usd")
-            or chosen.get("liquidity_usd")
-            or chosen.get("total_liquidity_usd")
-            or chosen.get("pool_liquidity_usd")
-        )
-        chg = chosen.get("price_change_24h") or chosen.get(
-            "price_change_percentage_24h"
-        )
-
-        liquidity_usd = float(liq) if liq is not None else None
-        price_change_24h = float(chg) if chg is not None else None
-
-        return {"liquidity_usd": liquidity_usd, "price_change_24h": price_change_24h}
+        chosen = _select_pool(r.json())
+        return _stats_from_attrs(chosen) if chosen else {}
     except Exception:
         return {}
 
 
+def cached_pool_stats(token_addr: str) -> Dict[str, Any]:
+    """
+    fetch_pool_stats_bsc behind a per-token TTL cache (POOL_STATS_TTL_S),
+    with negative caching of failures (POOL_STATS_NEG_TTL_S).
+    """
+    key = token_addr.lower()
+    now = time.time()
+    hit = _pool_stats.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    stats = fetch_pool_stats_bsc(token_addr)
+    ttl = POOL_STATS_TTL_S if stats else POOL_STATS_NEG_TTL_S
+    _pool_stats[key] = (now + ttl, stats)
+    return stats
+
+
 def auto_slippage_bps(token_addr: str) -> tuple[int, str]:
     """
     Decide slippage (in bps) based on pool liquidity and 24h price movement.
@@ -69,7 +110,10 @@ def auto_slippage_bps(token_addr: str) -> tuple[int, str]:
     HIGH_VOL = 5.0  # ≥ 5% 24h move
     VERY_HIGH_VOL = 10.0  # ≥ 10% 24h move
 
-    stats = fetch_pool_stats_bsc(token_addr)
+    snap = market.current("pool_stats")
+    stats = snap.pool_stats.get(token_addr.lower()) if snap is not None else None
+    if stats is None:
+        stats = cached_pool_stats(token_addr)
     liq = stats.get("liquidity_usd")
     vol = abs(stats.get("price_change_24h") or 0.0)
 
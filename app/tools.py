@@ -2,7 +2,8 @@ from typing import Dict, Any
 from uagents import Context
 
 from .prices import list_lst_tokens, get_bnb_info
-from .managed_buy import create_managed_buy
+from .peg_history import get_peg_stats
+from .managed_buy import create_managed_buy, create_managed_buys
 
 tools_schema = [
     {
@@ -29,6 +30,20 @@ tools_schema = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_peg_stats",
+            "description": "Returns LST peg statistics (min/max/mean/stddev of peg ratio, peg deviation in bps and BNB/USD) over the last 1h, 24h and 7d, from the agent's own sampled history.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "symbol_or_address": {"type": "string"},
+                },
+                "additionalProperties": False,
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -39,13 +54,40 @@ tools_schema = [
                 "properties": {
                     "symbol_or_address": {"type": "string"},
                     "recipient_address": {"type": "string"},
-                    "slippage_bps": {"type": "integer"},
+                    "slippage_bps": {"type": "integer", "minimum": 0, "maximum": 9999},
                 },
                 "required": ["symbol_or_address", "recipient_address"],
                 "additionalProperties": False,
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_managed_buys",
+            "description": "Bulk version of create_managed_buy for campaigns/airdrops: creates one managed order (deposit address + BNB pay URI) per (token, recipient) item in a single call.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "orders": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "symbol_or_address": {"type": "string"},
+                                "recipient_address": {"type": "string"},
+                                "slippage_bps": {"type": "integer", "minimum": 0, "maximum": 9999},
+                            },
+                            "required": ["symbol_or_address", "recipient_address"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["orders"],
+                "additionalProperties": False,
+            },
+        },
+    },
 ]
 
 
@@ -59,6 +101,9 @@ def dispatch_tool(
         elif func_name == "get_bnb_info":
             data = get_bnb_info()
             return {"ok": True, "bnb": data}
+        elif func_name == "get_peg_stats":
+            data = get_peg_stats(_args.get("symbol_or_address"))
+            return {"ok": True, "peg_stats": data}
         elif func_name == "create_managed_buy":
             return create_managed_buy(
                 ctx,
@@ -66,6 +111,8 @@ def dispatch_tool(
                 _args["recipient_address"],
                 _args.get("slippage_bps"),
             )
+        elif func_name == "create_managed_buys":
+            return create_managed_buys(ctx, _args["orders"])
         else:
             return {"ok": False, "error": f"Unsupported tool: {func_name}"}
     except Exception as e:
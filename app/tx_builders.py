@@ -1,20 +1,42 @@
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
-from eth_abi import encode
 from eth_utils import to_checksum_address
 
 from .config import ROUTER_V2, CHAIN_ID
+from .abi_codec import encode_approve, encode_swap_exact_eth_for_tokens
 from .utils import (
-    selector,
     wei_from_bnb,
     eip681_from_tx,
     find_token,
     parse_approve_amount,
 )
-from .rpc import get_amount_out_min, simulate_swap, rpc
+from .rpc import simulate_swap, rpc, async_rpc, router_amount_out_min
+from .quoting import get_amount_out_min, fetch_reserves
+from .impact import impact_slippage_bps
 from .slippage import auto_slippage_bps
 
 
+def _estimate_call_obj(tx: dict, from_address: str) -> dict:
+    return {
+        "from": to_checksum_address(from_address),
+        "to": to_checksum_address(tx["to"]),
+        "data": tx["data"],
+        "value": hex(int(tx.get("value", "0"))),
+    }
+
+
+def _gas_and_price(eg: dict, gp: dict) -> tuple[int | None, int | None, str | None]:
+    if "error" in eg:
+        return None, None, f"estimateGas error: {eg['error'].get('message')}"
+    gas_limit = int(eg.get("result", "0x0"), 16)
+
+    if "error" in gp:
+        return gas_limit, None, f"gasPrice error: {gp['error'].get('message')}"
+    gas_price = int(gp.get("result", "0x0"), 16)
+
+    return gas_limit, gas_price, None
+
+
 def estimate_gas_and_price(
     tx: dict, from_address: str
 ) -> tuple[int | None, int | None, str | None]:
@@ -22,27 +44,28 @@ def estimate_gas_and_price(
     Returns (gas_limit, gas_price, err). On failure, (None, None, "reason")
     """
     try:
-        call_obj = {
-            "from": to_checksum_address(from_address),
-            "to": to_checksum_address(tx["to"]),
-            "data": tx["data"],
-            "value": hex(int(tx.get("value", "0"))),
-        }
-        eg = rpc("eth_estimateGas", [call_obj])
+        eg = rpc("eth_estimateGas", [_estimate_call_obj(tx, from_address)])
         if "error" in eg:
-            return None, None, f"estimateGas error: {eg['error'].get('message')}"
-        gas_limit = int(eg.get("result", "0x0"), 16)
-
+            return _gas_and_price(eg, {})
         gp = rpc("eth_gasPrice", [])
-        if "error" in gp:
-            return gas_limit, None, f"gasPrice error: {gp['error'].get('message')}"
-        gas_price = int(gp.get("result", "0x0"), 16)
-
-        return gas_limit, gas_price, None
+        return _gas_and_price(eg, gp)
     except Exception as e:
         return None, None, f"estimation exception: {e}"
 
 
+async def async_estimate_gas(tx: dict, from_address: str) -> tuple[int | None, str | None]:
+    """
+    eth_estimateGas only, for callers that already hold a gas price.
+    Returns (gas_limit, err).
+    """
+    try:
+        eg = await async_rpc("eth_estimateGas", [_estimate_call_obj(tx, from_address)])
+        gas_limit, _, err = _gas_and_price(eg, {"result": "0x0"})
+        return gas_limit, err
+    except Exception as e:
+        return None, f"estimation exception: {e}"
+
+
 def build_swap_exact_eth_tx(
     amount_in_wei: int,
     amount_out_min: int,
@@ -50,10 +73,8 @@ def build_swap_exact_eth_tx(
     recipient: str,
     deadline_unix: int,
 ) -> dict:
-    sel = selector("swapExactETHForTokens(uint256,address[],address,uint256)")
-    calldata = sel + encode(
-        ["uint256", "address[]", "address", "uint256"],
-        [amount_out_min, path, to_checksum_address(recipient), deadline_unix],
+    calldata = encode_swap_exact_eth_for_tokens(
+        amount_out_min, path, to_checksum_address(recipient), deadline_unix
     )
     return {
         "to": to_checksum_address(ROUTER_V2),
@@ -69,8 +90,7 @@ def eip681_for_approve(token_address: str, spender: str, value_uint256: int) ->
     """
     token = to_checksum_address(token_address)
     spender = to_checksum_address(spender)
-    sel = selector("approve(address,uint256)")
-    calldata = sel + encode(["address", "uint256"], [spender, value_uint256])
+    calldata = encode_approve(spender, value_uint256)
     return f"ethereum:{token}@{CHAIN_ID}?value=0&data=0x{calldata.hex()}"
 
 
@@ -133,15 +153,25 @@ def create_buy_lst_tx_qr(
     recipient = to_checksum_address(recipient_address)
     sender_for_estimate = to_checksum_address(from_address or recipient_address)
 
+    amount_in_wei = wei_from_bnb(amount_bnb)
+    path = [wbnb, token_addr]
+
     if slippage_bps is None:
-        slippage_bps, slippage_reason = auto_slippage_bps(token_addr)
+        reserves = fetch_reserves([token_addr]).get(token_addr.lower())
+        if reserves is not None:
+            slippage_bps, slippage_reason = impact_slippage_bps(
+                token_addr, amount_in_wei, reserves
+            )
+        else:
+            slippage_bps, slippage_reason = auto_slippage_bps(token_addr)
     else:
         slippage_reason = "user-specified slippage"
 
-    amount_in_wei = wei_from_bnb(amount_bnb)
-    path = [wbnb, token_addr]
-
     amount_out_min = get_amount_out_min(amount_in_wei, path, slippage_bps)
+    try:
+        router_min = router_amount_out_min(amount_in_wei, path, slippage_bps)
+    except Exception:
+        router_min = None
     deadline = int(datetime.now(timezone.utc).timestamp()) + int(deadline_seconds)
 
     tx = build_swap_exact_eth_tx(
@@ -158,6 +188,7 @@ def create_buy_lst_tx_qr(
         f"Gas estimate: {gas_limit or 'n/a'} | Gas price (wei): {gas_price or 'n/a'}",
         *([f"Gas estimation note: {gas_err}"] if gas_err else []),
         "Router: PancakeSwap v2",
+        f"Min out (local reserves): {amount_out_min} | router cross-check: {router_min if router_min is not None else 'n/a'}",
     ]
 
     return {
@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from datetime import datetime, timezone
 from decimal import Decimal, ROUND_DOWN
+from functools import lru_cache
 from eth_utils import keccak
 
 from .config import CHAIN_ID, IS_DEV
@@ -41,7 +42,9 @@ def wei_from_bnb(amount_str: str) -> int:
     return int(wei)
 
 
+@lru_cache(maxsize=None)
 def selector(sig: str) -> bytes:
+    # Hot-path calldata uses the precomputed selectors in abi_codec.
     return keccak(text=sig)[:4]
 
 
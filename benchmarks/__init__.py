@@ -0,0 +1,12 @@
+"""
+Standalone benchmarks: python -m benchmarks.<name> [--help]. They run
+offline against local stand-ins (fake JSON-RPC / websocket servers,
+temporary stores) and print timings; nothing here is imported by the agent.
+"""
+
+import os
+
+# app.config fails fast without these; the benchmarks never reach them.
+os.environ.setdefault("ASI1_API_KEY", "bench")
+os.environ.setdefault("BSC_RPC_URL", "http://127.0.0.1:9")
+os.environ.setdefault("AGENT_PRIV", "0x" + "11" * 32)
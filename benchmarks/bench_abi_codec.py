@@ -0,0 +1,86 @@
+"""
+Encode/decode ops/sec: the previous hot-path code (keccak selector per call
++ generic eth_abi encode/decode) against app.abi_codec. Every pair is
+checked to produce identical bytes / values before timing.
+
+    python -m benchmarks.bench_abi_codec [--seconds 0.5]
+"""
+
+import argparse
+import time
+
+from eth_abi import decode, encode
+from eth_utils import keccak, to_checksum_address
+
+from app import abi_codec
+from app.config import WBNB_BSC
+
+TOKEN = to_checksum_address("0x1bdd3cf7f79cfb8edbb955f20ad99211551ba275")
+WBNB = to_checksum_address(WBNB_BSC)
+OWNER = to_checksum_address("0x000000000000000000000000000000000000dead")
+PATH = [WBNB, TOKEN]
+AMOUNTS = encode(["uint256[]"], [[10**18, 987654321987654321]])
+RESERVES = encode(["uint112", "uint112", "uint32"], [10**21, 5 * 10**23, 1_700_000_000])
+
+
+def _sel(sig: str) -> bytes:
+    # utils.selector / erc20._sel before the codec: keccak on every call.
+    return keccak(text=sig)[:4]
+
+
+CASES = [
+    (
+        "swapExactETHForTokens",
+        lambda: _sel("swapExactETHForTokens(uint256,address[],address,uint256)")
+        + encode(["uint256", "address[]", "address", "uint256"], [1234, PATH, OWNER, 2**31 - 1]),
+        lambda: abi_codec.encode_swap_exact_eth_for_tokens(1234, PATH, OWNER, 2**31 - 1),
+    ),
+    (
+        "getAmountsOut",
+        lambda: _sel("getAmountsOut(uint256,address[])")
+        + encode(["uint256", "address[]"], [10**18, PATH]),
+        lambda: abi_codec.encode_get_amounts_out(10**18, PATH),
+    ),
+    (
+        "balanceOf",
+        lambda: _sel("balanceOf(address)") + encode(["address"], [OWNER]),
+        lambda: abi_codec.encode_balance_of(OWNER),
+    ),
+    ("decimals", lambda: _sel("decimals()"), lambda: abi_codec.DECIMALS_CALLDATA),
+    (
+        "decode uint256[]",
+        lambda: list(decode(["uint256[]"], AMOUNTS)[0]),
+        lambda: abi_codec.decode_uint_array(AMOUNTS),
+    ),
+    (
+        "decode getReserves",
+        lambda: tuple(decode(["uint112", "uint112", "uint32"], RESERVES)),
+        lambda: abi_codec.decode_reserves(RESERVES),
+    ),
+]
+
+
+def _ops_per_s(fn, seconds: float) -> float:
+    n, batch = 0, 200
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        for _ in range(batch):
+            fn()
+        n += batch
+    return n / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=0.5)
+    args = ap.parse_args()
+    print(f"{'case':<22}{'before ops/s':>14}{'codec ops/s':>14}{'speed-up':>10}")
+    for name, old, new in CASES:
+        assert old() == new(), name
+        before = _ops_per_s(old, args.seconds)
+        after = _ops_per_s(new, args.seconds)
+        print(f"{name:<22}{before:>14,.0f}{after:>14,.0f}{after / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+auto_slippage_bps on a GeckoTerminal `tokens/{address}?include=top_pools`
+response (benchmarks/data/gt_top_pools_bnbx.json: BNBx, 10 top pools, in
+the API's shape; numbers are illustrative). The HTTP request itself is
+replaced by the stored body, so only the agent-side cost is measured.
+
+    python -m benchmarks.bench_auto_slippage [--calls 20000]
+
+Rows:
+- before: parse the body, pick the pool by json.dumps(attrs) substring search
+- after, cache miss: parse the body, pick the pool by relationships ids
+- after, cached: per-token TTL cache hit
+"""
+
+import argparse
+import json
+import os
+import time
+
+from app import slippage
+from app.config import WBNB_BSC
+
+_DATA = os.path.join(os.path.dirname(__file__), "data", "gt_top_pools_bnbx.json")
+TOKEN = "0x1bdd3cf7f79cfb8edbb955f20ad99211551ba275"
+
+
+class _Response:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def _old_select(body: bytes):
+    # app/slippage.py before the change: serialise every pool's attributes.
+    chosen = None
+    for it in json.loads(body).get("included", []) or []:
+        if it.get("type") != "pool":
+            continue
+        attrs = it.get("attributes", {}) or {}
+        if WBNB_BSC in json.dumps(attrs).lower():
+            return attrs
+        if chosen is None:
+            chosen = attrs
+    return chosen
+
+
+def _per_call(fn, calls: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - t0) / calls
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=20000)
+    args = ap.parse_args()
+    with open(_DATA, "rb") as f:
+        body = f.read()
+    slippage.requests.get = lambda *a, **kw: _Response(body)
+
+    old = _old_select(body)
+    new = slippage._select_pool(json.loads(body))
+    print(f"pool picked  before: {old['name']}  after: {new['name']}")
+
+    def miss():
+        slippage._pool_stats.clear()
+        slippage.auto_slippage_bps(TOKEN)
+
+    rows = [
+        ("before (dumps search)", lambda: slippage._stats_from_attrs(_old_select(body))),
+        ("after, cache miss", miss),
+        ("after, cached", lambda: slippage.auto_slippage_bps(TOKEN)),
+    ]
+    for name, fn in rows:
+        print(f"{name:<22} {_per_call(fn, args.calls) * 1e6:9.2f} µs/call")
+
+
+if __name__ == "__main__":
+    main()
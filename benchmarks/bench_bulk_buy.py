@@ -0,0 +1,125 @@
+"""
+Order-creation throughput: N × create_managed_buy against one
+create_managed_buys call, on uAgents' JSON KeyValueStore in a temp dir.
+
+    python -m benchmarks.bench_bulk_buy [--orders 200] [--history 1000]
+        [--lookup-ms 150] [--hd [--warm-pool]] [--backend kv|sqlite]
+
+--history pre-fills the store (every ctx.storage save rewrites the file;
+a kv commit saves it once, the sqlite one is one transaction).
+--lookup-ms stands in for the auto-slippage GeckoTerminal lookup that a
+cold cache costs; the bulk path makes it once per token. --hd derives
+order wallets from a test mnemonic instead of random keys; by default its
+address pool starts empty (every address derived inline), --warm-pool fills
+it first, as warm_pool does at agent startup.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from uagents.storage import KeyValueStore
+
+from app import managed_buy, order_wallets, orders_kv
+from app.orders_sqlite import SqliteOrderStore
+from app.registry import LST_REGISTRY_BSC
+
+MNEMONIC = "test test test test test test test test test test test junk"
+RECIPIENT = "0x000000000000000000000000000000000000dEaD"
+
+
+class _Ctx:
+    def __init__(self, storage):
+        self.storage = storage
+        self.logger = logging.getLogger("bench")
+        self.logger.setLevel(logging.CRITICAL)
+
+
+def _store(tmp: str, history: int) -> KeyValueStore:
+    done = [
+        {"id": f"{i:024x}", "status": "complete", "created_at": i, "finished_at": i,
+         "recv_addr": f"0x{i:040x}", "recipient": RECIPIENT, "recv_priv": "0x" + "11" * 32}
+        for i in range(history)
+    ]
+    data = {orders_kv._key(o["id"]): o for o in done}
+    data[orders_kv.DONE_INDEX_KEY] = [[o["id"], o["finished_at"]] for o in done]
+    with open(os.path.join(tmp, "bench_data.json"), "w") as f:
+        json.dump(data, f)
+    return KeyValueStore("bench", cwd=tmp)
+
+
+def _run(label: str, fn, orders: int, history: int) -> float:
+    # Fresh auto-slippage cache per run: the first lookup per token is cold.
+    warm: set[str] = set()
+
+    def lookup(token_addr: str):
+        if token_addr not in warm:
+            time.sleep(_run.lookup_s)
+            warm.add(token_addr)
+        return 50, "bench"
+
+    managed_buy.auto_slippage_bps = lookup
+    # Both runs start from index 0: no derived address may carry over.
+    order_wallets.account_for.cache_clear()
+    order_wallets._pool = order_wallets.AddressPool()
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = _Ctx(_store(tmp, history))
+        if orders_kv.ORDERS_BACKEND == "sqlite":
+            orders_kv._sqlite = SqliteOrderStore(os.path.join(tmp, "orders.db"))
+            orders_kv.migrate_orders(ctx)
+        if _run.warm_pool:
+            order_wallets.warm_pool(ctx)
+            while order_wallets._pool._refilling:
+                time.sleep(0.01)
+        t0 = time.perf_counter()
+        fn(ctx)
+        dt = time.perf_counter() - t0
+    print(f"{label:<28} {dt:8.3f} s  {orders / dt:9.1f} orders/s")
+    return dt
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=200)
+    ap.add_argument("--history", type=int, default=1000)
+    ap.add_argument("--lookup-ms", type=float, default=150)
+    ap.add_argument("--hd", action="store_true")
+    ap.add_argument("--warm-pool", action="store_true")
+    ap.add_argument("--backend", choices=("kv", "sqlite"), default="kv")
+    args = ap.parse_args()
+    orders_kv.ORDERS_BACKEND = args.backend
+    _run.lookup_s = args.lookup_ms / 1000
+    _run.warm_pool = args.hd and args.warm_pool
+    orders_kv.ORDERS_CHANGELOG_PATH = ""
+    if args.hd:
+        order_wallets.ORDER_WALLET_MNEMONIC = MNEMONIC
+
+    symbols = [t["symbol"] for t in LST_REGISTRY_BSC]
+    items = [
+        {"symbol_or_address": symbols[i % len(symbols)], "recipient_address": RECIPIENT}
+        for i in range(args.orders)
+    ]
+
+    def one_by_one(ctx):
+        for it in items:
+            managed_buy.create_managed_buy(ctx, it["symbol_or_address"], it["recipient_address"])
+
+    def bulk(ctx):
+        res = managed_buy.create_managed_buys(ctx, items)
+        assert res["created"] == len(items), res
+
+    print(
+        f"{args.orders} orders, {args.history} orders of history, backend: {args.backend}, "
+        f"wallets: {'HD' if args.hd else 'random keys'}"
+        f"{' (warm pool)' if _run.warm_pool else ''}"
+    )
+    before = _run("create_managed_buy × N", one_by_one, args.orders, args.history)
+    after = _run("create_managed_buys (bulk)", bulk, args.orders, args.history)
+    print(f"speed-up: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
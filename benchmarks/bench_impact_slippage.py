@@ -0,0 +1,138 @@
+"""
+Revert rate of the two auto-slippage policies, replayed over a reserve
+series: the liquidity/volatility buckets (slippage.auto_slippage_bps) and
+the price-impact policy (impact.impact_slippage_bps, current
+SLIPPAGE_* settings).
+
+    python -m benchmarks.bench_impact_slippage [--blocks 28800] [--latency 1]
+        [--sizes 0.05,0.5,5,25] [--seed 1]
+
+The series is SYNTHETIC, not recorded: three WBNB/LST pairs (deep, mid,
+shallow) whose reserves move block by block under random buys and sells
+(Poisson count per block, log-normal size as a fraction of the pool) with
+arbitrage pulling the price halfway back to its reference each block.
+Bucket inputs come from the same series: liquidity_usd = 2 × WBNB reserve
+× BNB_USD and the 24h move = price change over the replayed window
+(28,800 three-second blocks ≈ 24h).
+
+For every --every-th block and every order size, amount_out_min is quoted
+with quoting.get_amount_out_min on that block's reserves (as settlement
+does) and checked against the exact v2 output after --latency blocks of
+other trades land first. A shortfall counts as a revert. The mean
+tolerance is shown too: a wider tolerance reverts less but leaves more to
+sandwich bots.
+"""
+
+import argparse
+import math
+import random
+
+from app import slippage
+from app.config import WBNB_BSC
+from app.impact import impact_slippage_bps
+from app.quoting import amount_out_v2, get_amount_out_min
+
+TOKEN = "0x1bdd3cf7f79cfb8edbb955f20ad99211551ba275"
+BNB_USD = 600.0
+PRICE_BNB = 1.05  # LST price in BNB
+WEI = 10**18
+
+# name, WBNB reserve (BNB), median trade (fraction of pool), trades per block
+POOLS = (
+    ("deep", 20_000, 5e-5, 3.0),
+    ("mid", 1_000, 3e-4, 1.0),
+    ("shallow", 50, 1e-3, 0.3),
+)
+TRADE_SIGMA = 1.5  # log-normal spread of trade sizes
+ARB_PULL = 0.5  # share of the price gap closed by arbitrage each block
+
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    n, p, limit = 0, 1.0, math.exp(-lam)
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return n
+        n += 1
+
+
+def _trade(r_bnb: int, r_tok: int, bnb_in: int) -> tuple[int, int]:
+    """Reserves after a buy (bnb_in > 0) or a sell worth -bnb_in BNB."""
+    if bnb_in > 0:
+        return r_bnb + bnb_in, r_tok - amount_out_v2(bnb_in, r_bnb, r_tok)
+    tok_in = -bnb_in * r_tok // r_bnb
+    return r_bnb - amount_out_v2(tok_in, r_tok, r_bnb), r_tok + tok_in
+
+
+def _series(rng: random.Random, blocks: int, depth: int, frac: float, lam: float):
+    """Reserves at the start of each block, plus per-block lists of trades."""
+    r_bnb, r_tok = depth * WEI, int(depth * WEI / PRICE_BNB)
+    states, flows = [], []
+    for _ in range(blocks):
+        states.append((r_bnb, r_tok))
+        trades = []
+        for _ in range(_poisson(rng, lam)):
+            size = int(depth * WEI * frac * math.exp(rng.gauss(0.0, TRADE_SIGMA)))
+            trades.append(size if rng.random() < 0.5 else -size)
+        flows.append(trades)
+        for t in trades:
+            r_bnb, r_tok = _trade(r_bnb, r_tok, t)
+        # Arbitrage: part of the way back to the reference price, along the
+        # current constant product.
+        k = r_bnb * r_tok
+        r_bnb = int(r_bnb + (math.sqrt(k * PRICE_BNB) - r_bnb) * ARB_PULL)
+        r_tok = k // r_bnb
+    return states, flows
+
+
+def _lands(state: tuple[int, int], flows: list[list[int]]) -> tuple[int, int]:
+    r_bnb, r_tok = state
+    for trades in flows:
+        for t in trades:
+            r_bnb, r_tok = _trade(r_bnb, r_tok, t)
+    return r_bnb, r_tok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blocks", type=int, default=28_800)
+    ap.add_argument("--every", type=int, default=10)
+    ap.add_argument("--latency", type=int, default=1)
+    ap.add_argument("--sizes", default="0.05,0.5,5,25")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    sizes = [float(x) for x in args.sizes.split(",")]
+    rng = random.Random(args.seed)
+    slippage.IS_DEV = False
+    path = [WBNB_BSC, TOKEN]
+
+    print(f"{'pool':<8} {'size BNB':>9} {'bucket bps':>11} {'reverts':>8} {'impact bps':>11} {'reverts':>8}")
+    for name, depth, frac, lam in POOLS:
+        states, flows = _series(rng, args.blocks, depth, frac, lam)
+        first, last = states[0], states[-1]
+        move = abs((last[0] / last[1]) / (first[0] / first[1]) - 1) * 100
+        stats = {"liquidity_usd": 2 * depth * BNB_USD, "price_change_24h": move}
+        slippage.cached_pool_stats = lambda token, s=stats: s
+        bucket, _ = slippage.auto_slippage_bps(TOKEN)
+
+        for size in sizes:
+            amount = int(size * WEI)
+            n = b_rev = i_rev = i_bps = 0
+            for t in range(0, args.blocks - args.latency, args.every):
+                quote = states[t]
+                r_bnb, r_tok = _lands(quote, flows[t : t + args.latency])
+                out = amount_out_v2(amount, r_bnb, r_tok)
+                imp, _ = impact_slippage_bps(TOKEN, amount, quote)
+                b_rev += out < get_amount_out_min(amount, path, bucket, quote)
+                i_rev += out < get_amount_out_min(amount, path, imp, quote)
+                i_bps += imp
+                n += 1
+            print(
+                f"{name:<8} {size:>9g} {bucket:>11} {b_rev / n:>8.1%} "
+                f"{i_bps / n:>11.0f} {i_rev / n:>8.1%}"
+            )
+        print(f"{'':<8} liquidity ${stats['liquidity_usd']:,.0f}, window move {move:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Block → settlement wake-up delay with the newHeads trigger, against a local
+websocket stand-in for a BSC node (eth_subscribe + pushed newHeads).
+
+    python -m benchmarks.bench_new_heads [--blocks 40] [--block-ms 250] [--tick-ms 0]
+
+The stand-in pushes a head every --block-ms; each head is taken as the
+block that funded an order. The delay is measured from the push to the
+start of the settlement run (follow_new_heads → SettlementTrigger). A
+settlement run lasting --tick-ms shows how heads that land during a run
+collapse into one follow-up run. The old 6 s interval is printed for
+comparison (uniform wait, mean period / 2, before its tick even starts).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from aiohttp import web
+
+from app import heads
+
+
+class _Ctx:
+    logger = logging.getLogger("bench")
+
+
+async def _node(blocks: int, block_s: float, pushed: dict) -> web.AppRunner:
+    async def ws_handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        msg = json.loads((await ws.receive()).data)
+        await ws.send_str(json.dumps({"jsonrpc": "2.0", "id": msg["id"], "result": "0x1"}))
+        for n in range(1, blocks + 1):
+            await asyncio.sleep(block_s)
+            pushed[n] = time.perf_counter()
+            await ws.send_str(
+                json.dumps(
+                    {
+                        "jsonrpc": "2.0",
+                        "method": "eth_subscription",
+                        "params": {"subscription": "0x1", "result": {"number": hex(n)}},
+                    }
+                )
+            )
+        await ws.receive()  # hold the subscription open until shutdown
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/", ws_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner
+
+
+async def _bench(blocks: int, block_s: float, tick_s: float) -> None:
+    pushed: dict[int, float] = {}
+    runs: list[tuple[int, float]] = []
+    runner = await _node(blocks, block_s, pushed)
+    port = runner.addresses[0][1]
+    heads.BSC_WS_URL = f"ws://127.0.0.1:{port}/"
+
+    trigger: heads.SettlementTrigger
+
+    async def settle() -> None:
+        runs.append((trigger.last_block, time.perf_counter()))
+        await asyncio.sleep(tick_s)
+
+    trigger = heads.SettlementTrigger(settle)
+    tasks = [
+        asyncio.create_task(trigger.serve(_Ctx())),
+        asyncio.create_task(heads.follow_new_heads(_Ctx(), trigger.wake)),
+    ]
+    await asyncio.sleep(block_s * (blocks + 2) + tick_s)
+    for t in tasks:
+        t.cancel()
+    await runner.cleanup()
+
+    delays = [(t - pushed[b]) * 1e3 for b, t in runs if b in pushed]
+    delays.sort()
+    print(f"heads pushed: {len(pushed)}  settlement runs: {len(runs)}")
+    print(
+        f"newHeads block→settlement delay: mean {statistics.fmean(delays):.2f} ms"
+        f"  p50 {delays[len(delays) // 2]:.2f} ms  max {delays[-1]:.2f} ms"
+    )
+    print("6 s interval (before): mean 3000 ms wait, up to 6000 ms, plus the previous tick")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blocks", type=int, default=40)
+    ap.add_argument("--block-ms", type=float, default=250)
+    ap.add_argument("--tick-ms", type=float, default=0)
+    args = ap.parse_args()
+    logging.getLogger("bench").setLevel(logging.WARNING)
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+    asyncio.run(_bench(args.blocks, args.block_ms / 1000, args.tick_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Order store latency at growing history sizes: uAgents' JSON KeyValueStore
+(ctx.storage, per-order v6 layout) against the SQLite (WAL) backend.
+
+    python -m benchmarks.bench_order_store [--sizes 1000,10000,100000] [--active-pct 1]
+
+Each store is pre-filled with N orders, --active-pct of them pending and
+the rest complete, then timed on list_active, get_order, mark_error (one
+status update) and create_order. migrate is one startup migration of N
+orders from the legacy orders_v5 blob (timed once).
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from uagents.storage import KeyValueStore
+
+from app import orders_kv
+from app.orders_sqlite import SqliteOrderStore
+
+
+class _Ctx:
+    def __init__(self, storage):
+        self.storage = storage
+        self.logger = logging.getLogger("bench")
+        self.logger.setLevel(logging.CRITICAL)
+
+
+def _orders(n: int, active_pct: float) -> list[dict]:
+    n_active = max(1, int(n * active_pct / 100))
+    out = []
+    for i in range(n):
+        status = "pending" if i < n_active else "complete"
+        out.append(
+            {
+                "id": f"{i:024x}",
+                "symbol": "BNBX",
+                "token_address": "0x1bdd3cf7f79cfb8edbb955f20ad99211551ba275",
+                "recipient": f"0x{i + 1:040x}",
+                "slippage_bps": 50,
+                "slippage_auto": False,
+                "recv_priv": "0x" + f"{i + 1:064x}",
+                "recv_addr": f"0x{i + 10**9:040x}",
+                "status": status,
+                "created_at": 1_700_000_000 + i,
+                "finished_at": 1_700_000_000 + i if status == "complete" else None,
+                "last_error": None,
+                "tx_hash": None,
+                "delivered_raw": None,
+                "notify_agent": None,
+                "notified_funded": False,
+                "attempts": 0,
+            }
+        )
+    return out
+
+
+def _kv_store(tmp: str, orders: list[dict]) -> KeyValueStore:
+    data = {orders_kv._key(o["id"]): o for o in orders}
+    data[orders_kv.ACTIVE_INDEX_KEY] = [o["id"] for o in orders if o["status"] == "pending"]
+    data[orders_kv.DONE_INDEX_KEY] = [
+        [o["id"], o["finished_at"]] for o in orders if o["status"] == "complete"
+    ]
+    with open(os.path.join(tmp, "bench_data.json"), "w") as f:
+        json.dump(data, f)
+    return KeyValueStore("bench", cwd=tmp)
+
+
+def _time(fn, reps: int) -> float:
+    samples = []
+    for i in range(reps):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def _migrate(backend: str, tmp: str, orders: list[dict]) -> float:
+    path = os.path.join(tmp, "migrate")
+    os.makedirs(path)
+    with open(os.path.join(path, "bench_data.json"), "w") as f:
+        json.dump({orders_kv.LEGACY_ORDERS_KEY: {o["id"]: o for o in orders}}, f)
+    ctx = _Ctx(KeyValueStore("bench", cwd=path))
+    orders_kv._sqlite = (
+        SqliteOrderStore(os.path.join(path, "orders.db")) if backend == "sqlite" else None
+    )
+    t0 = time.perf_counter()
+    orders_kv.migrate_orders(ctx)
+    return time.perf_counter() - t0
+
+
+def _run(backend: str, tmp: str, orders: list[dict], reps: int) -> dict:
+    if backend == "sqlite":
+        db = SqliteOrderStore(os.path.join(tmp, "orders.db"))
+        db.put_many(orders)
+        orders_kv._sqlite = db
+        ctx = _Ctx(KeyValueStore("bench", cwd=tmp))
+    else:
+        orders_kv._sqlite = None
+        ctx = _Ctx(_kv_store(tmp, orders))
+    orders_kv.ORDERS_BACKEND = backend
+    ids = [o["id"] for o in orders]
+    step = max(1, len(ids) // reps)
+    new = ("BNBX", orders[0]["token_address"], orders[0]["recipient"], 50)
+    res = {
+        "list_active": _time(lambda i: orders_kv.list_active(ctx), reps),
+        "get_order": _time(lambda i: orders_kv.get_order(ctx, ids[i * step]), reps),
+        "mark_error": _time(lambda i: orders_kv.mark_error(ctx, ids[i], "bench"), reps),
+        "create_order": _time(lambda i: orders_kv.create_order(ctx, *new), reps),
+    }
+    res["migrate"] = _migrate(backend, tmp, orders)
+    return res
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,100000")
+    ap.add_argument("--active-pct", type=float, default=1.0)
+    ap.add_argument("--reps", type=int, default=5)
+    args = ap.parse_args()
+    orders_kv.ORDERS_CHANGELOG_PATH = ""
+
+    ops = ("list_active", "get_order", "mark_error", "create_order", "migrate")
+    print(f"{'orders':>8} {'backend':<8}" + "".join(f"{op:>15}" for op in ops))
+    for n in (int(x) for x in args.sizes.split(",")):
+        orders = _orders(n, args.active_pct)
+        for backend in ("kv", "sqlite"):
+            with tempfile.TemporaryDirectory() as tmp:
+                res = _run(backend, tmp, orders, args.reps)
+            print(
+                f"{n:>8} {backend:<8}"
+                + "".join(f"{res[op] * 1e3:>12.3f} ms" for op in ops)
+            )
+
+
+if __name__ == "__main__":
+    main()
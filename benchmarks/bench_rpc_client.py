@@ -0,0 +1,73 @@
+"""
+Per-call latency of the old rpc() (a fresh requests.post per call) against
+the pooled keep-alive RpcClient, both talking to a local fake JSON-RPC
+server.
+
+    python -m benchmarks.bench_rpc_client [--calls 500] [--connect-delay-ms 0]
+
+--connect-delay-ms adds a per-connection delay on the server side to model
+the TCP+TLS handshake of a remote node; on loopback it is close to zero.
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+from . import fake_rpc
+from app.rpc import RpcClient
+
+
+def _old_rpc(url: str, method: str, params: list) -> dict:
+    # app/rpc.py before the pooled client: no session, id 1, flat timeout.
+    r = requests.post(
+        url,
+        json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params},
+        timeout=20,
+    )
+    r.raise_for_status()
+    return r.json()
+
+
+def _measure(fn, calls: int) -> list[float]:
+    fn()  # warm-up
+    out = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def _report(name: str, samples: list[float], connections: int) -> None:
+    s = sorted(samples)
+    print(
+        f"{name:<22} mean {statistics.fmean(s) * 1e3:7.3f} ms"
+        f"  p50 {s[len(s) // 2] * 1e3:7.3f} ms"
+        f"  p99 {s[int(len(s) * 0.99) - 1] * 1e3:7.3f} ms"
+        f"  connections {connections}"
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=500)
+    ap.add_argument("--connect-delay-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    with fake_rpc.FakeRpcServer(args.connect_delay_ms / 1000) as srv:
+        before = _measure(lambda: _old_rpc(srv.url, "eth_blockNumber", []), args.calls)
+        _report("requests.post per call", before, srv.connections)
+
+    with fake_rpc.FakeRpcServer(args.connect_delay_ms / 1000) as srv:
+        client = RpcClient(srv.url)
+        after = _measure(lambda: client.call("eth_blockNumber", []), args.calls)
+        _report("RpcClient (pooled)", after, srv.connections)
+        client.close()
+
+    print(f"speed-up (mean): {statistics.fmean(before) / statistics.fmean(after):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
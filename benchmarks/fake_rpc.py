@@ -0,0 +1,63 @@
+"""
+Minimal local JSON-RPC server over HTTP/1.1 keep-alive, for benchmarks.
+Every method answers {"result": "0x1"}; batches are answered item by item.
+connect_delay_s is slept once per new TCP connection, to stand in for the
+TCP+TLS handshake a remote node costs.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import socket
+import threading
+import time
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in two writes; without this, Nagle plus
+        # the client's delayed ACK adds ~40 ms to every keep-alive response.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.connections += 1
+        if self.server.connect_delay_s:
+            time.sleep(self.server.connect_delay_s)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        req = json.loads(body)
+        if isinstance(req, list):
+            out = [{"jsonrpc": "2.0", "id": r.get("id"), "result": "0x1"} for r in req]
+        else:
+            out = {"jsonrpc": "2.0", "id": req.get("id"), "result": "0x1"}
+        data = json.dumps(out).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeRpcServer:
+    def __init__(self, connect_delay_s: float = 0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.connect_delay_s = connect_delay_s
+        self.httpd.connections = 0
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    @property
+    def connections(self) -> int:
+        return self.httpd.connections
+
+    def __enter__(self) -> "FakeRpcServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
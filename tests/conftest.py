@@ -0,0 +1,76 @@
+import logging
+import os
+
+# app.config fails fast without these; the tests never reach the network.
+os.environ.setdefault("ASI1_API_KEY", "test")
+os.environ.setdefault("BSC_RPC_URL", "http://127.0.0.1:9")
+os.environ.setdefault("AGENT_PRIV", "0x" + "11" * 32)
+
+import pytest
+from uagents.storage import KeyValueStore
+
+
+class MemoryStorage(KeyValueStore):
+    """
+    uAgents' KeyValueStore kept in memory: get returns the stored object
+    itself, like the real one; set/remove calls and file saves are counted.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self.calls = []
+        self.saves = 0
+
+    @property
+    def data(self):
+        return self._data
+
+    def set(self, key, value):
+        self.calls.append(("set", key))
+        super().set(key, value)
+
+    def remove(self, key):
+        self.calls.append(("remove", key))
+        super().remove(key)
+
+    def _save(self):
+        self.saves += 1
+
+
+class FakeContext:
+    def __init__(self):
+        self.storage = MemoryStorage()
+        self.logger = logging.getLogger("tests")
+
+
+@pytest.fixture
+def ctx():
+    return FakeContext()
+
+
+@pytest.fixture(autouse=True)
+def kv_orders(tmp_path, monkeypatch):
+    """
+    Orders live in ctx.storage unless a test asks for sqlite_orders; the
+    change log and archive go to the test's tmp_path.
+    """
+    from app import orders_kv
+    from app.orders_archive import OrderArchive
+
+    monkeypatch.setattr(orders_kv, "ORDERS_BACKEND", "kv")
+    monkeypatch.setattr(orders_kv, "_sqlite", None)
+    monkeypatch.setattr(orders_kv, "ORDERS_CHANGELOG_PATH", str(tmp_path / "orders_changes.jsonl"))
+    monkeypatch.setattr(orders_kv, "_archive", OrderArchive(str(tmp_path / "orders_archive")))
+
+
+@pytest.fixture
+def sqlite_orders(tmp_path, monkeypatch):
+    """
+    Switch orders_kv to a fresh SQLite database for one test.
+    """
+    from app import orders_kv
+    from app.orders_sqlite import SqliteOrderStore
+
+    monkeypatch.setattr(orders_kv, "ORDERS_BACKEND", "sqlite")
+    monkeypatch.setattr(orders_kv, "_sqlite", SqliteOrderStore(str(tmp_path / "orders.db")))
+    return orders_kv._sqlite
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app import funding
+
+RECV = "0x00000000000000000000000000000000000000aa"
+
+
+@pytest.fixture(autouse=True)
+def fresh_cursor(monkeypatch):
+    monkeypatch.setattr(funding, "_cursor", None)
+    monkeypatch.setattr(funding, "_saved_at", float("-inf"))
+
+
+def _chain(monkeypatch, latest, fail_at=None):
+    seen = []
+
+    async def fake_rpc(method, params):
+        return {"result": hex(latest)}
+
+    async def fake_batch(calls):
+        nums = [int(params[0], 16) for _, params in calls]
+        seen.append(nums)
+        out = []
+        for n in nums:
+            if n == fail_at:
+                out.append({"error": {"code": -32000, "message": "header not found"}})
+                continue
+            txs = [{"to": RECV}] if n == 13 else []
+            out.append({"result": {"timestamp": hex(1000 + n), "transactions": txs}})
+        return out
+
+    monkeypatch.setattr(funding, "async_rpc", fake_rpc)
+    monkeypatch.setattr(funding, "async_rpc_batch", fake_batch)
+    monkeypatch.setattr(funding, "FUNDING_CHUNK_BLOCKS", 4)
+    return seen
+
+
+def test_scan_reads_blocks_in_chunks(ctx, monkeypatch):
+    seen = _chain(monkeypatch, latest=20)
+    ctx.storage.set(funding.FUNDING_CURSOR_KEY, 10)
+
+    hits = asyncio.run(funding.scan_funding(ctx, [{"id": "o1", "recv_addr": RECV}]))
+
+    assert hits == {"o1": 1013}
+    assert seen == [[11, 12, 13, 14], [15, 16, 17, 18], [19, 20]]
+    assert funding._cursor == 20
+
+
+def test_failed_chunk_keeps_earlier_progress(ctx, monkeypatch):
+    seen = _chain(monkeypatch, latest=20, fail_at=16)
+    ctx.storage.set(funding.FUNDING_CURSOR_KEY, 10)
+
+    assert asyncio.run(funding.scan_funding(ctx, [])) is None
+    assert len(seen) == 2
+    assert funding._cursor == 14
+
+
+def test_cursor_is_saved_at_most_once_per_interval(ctx, monkeypatch):
+    _chain(monkeypatch, latest=20)
+    ctx.storage.set(funding.FUNDING_CURSOR_KEY, 10)
+    ctx.storage.calls.clear()
+
+    asyncio.run(funding.scan_funding(ctx, []))
+    _chain(monkeypatch, latest=30)
+    asyncio.run(funding.scan_funding(ctx, []))
+
+    assert funding._cursor == 30
+    assert ctx.storage.calls == [("set", funding.FUNDING_CURSOR_KEY)]
+    assert ctx.storage.get(funding.FUNDING_CURSOR_KEY) == 14
@@ -0,0 +1,43 @@
+import asyncio
+
+from app import receipts
+from app.gas_model import gas_limit_for, record_gas_used
+from app.config import GAS_MODEL_MIN_SAMPLES
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+
+
+def _warm(ctx):
+    for _ in range(GAS_MODEL_MIN_SAMPLES):
+        record_gas_used(ctx, TOKEN, 150_000)
+    assert gas_limit_for(ctx, TOKEN) is not None
+
+
+def _reverted(ctx, monkeypatch, gas_used, tx_gas):
+    order = {
+        "id": "o1",
+        "status": "broadcast",
+        "tx_hash": "0x01",
+        "token_address": TOKEN,
+        "recipient": "0xbeef",
+        "sent_tx": {"gas": tx_gas},
+    }
+    ctx.storage.set("order_v6:o1", dict(order))
+
+    async def fake_batch(calls):
+        return [{"result": {"status": "0x0", "gasUsed": hex(gas_used), "logs": []}}]
+
+    monkeypatch.setattr(receipts, "async_rpc_batch", fake_batch)
+    return asyncio.run(receipts.track_receipts(ctx, [order]))
+
+
+def test_out_of_gas_revert_forgets_learned_limit(ctx, monkeypatch):
+    _warm(ctx)
+    assert _reverted(ctx, monkeypatch, gas_used=199_900, tx_gas=200_000) == ["o1"]
+    assert gas_limit_for(ctx, TOKEN) is None
+
+
+def test_slippage_revert_keeps_learned_limit(ctx, monkeypatch):
+    _warm(ctx)
+    assert _reverted(ctx, monkeypatch, gas_used=90_000, tx_gas=200_000) == ["o1"]
+    assert gas_limit_for(ctx, TOKEN) is not None
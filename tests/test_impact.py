@@ -0,0 +1,16 @@
+from app.impact import impact_bps, impact_slippage_bps
+from app.config import SLIPPAGE_MIN_BPS, SLIPPAGE_MAX_BPS
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+RESERVES = (1_000 * 10**18, 950 * 10**18)
+
+
+def test_impact_grows_with_size_past_uint64_amounts():
+    # 25 BNB in wei does not fit a uint64.
+    small, large = impact_bps(TOKEN, 10**17, RESERVES), impact_bps(TOKEN, 25 * 10**18, RESERVES)
+    assert 0 <= small < large
+
+
+def test_slippage_is_clamped():
+    assert impact_slippage_bps(TOKEN, 10**15, RESERVES)[0] == SLIPPAGE_MIN_BPS
+    assert impact_slippage_bps(TOKEN, 10**21, RESERVES)[0] == SLIPPAGE_MAX_BPS
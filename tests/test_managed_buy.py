@@ -0,0 +1,41 @@
+from app import order_wallets
+from app.managed_buy import create_managed_buys
+from app.order_wallets import NEXT_INDEX_KEY
+from app.registry import LST_REGISTRY_BSC
+
+MNEMONIC = "test test test test test test test test test test test junk"
+RECIPIENT = "0x000000000000000000000000000000000000dEaD"
+
+
+def test_bulk_reserves_wallet_indices_with_one_write(ctx, monkeypatch):
+    monkeypatch.setattr(order_wallets, "ORDER_WALLET_MNEMONIC", MNEMONIC)
+    monkeypatch.setattr(order_wallets, "_seed", None)
+    monkeypatch.setattr(order_wallets, "_parent", None)
+    # No background derivation thread outliving the patched mnemonic.
+    monkeypatch.setattr(order_wallets, "_pool", order_wallets.AddressPool(size=0))
+    symbol = LST_REGISTRY_BSC[0]["symbol"]
+    items = [
+        {"symbol_or_address": symbol, "recipient_address": RECIPIENT, "slippage_bps": 50}
+        for _ in range(3)
+    ] + [{"symbol_or_address": "nope", "recipient_address": RECIPIENT}]
+
+    res = create_managed_buys(ctx, items)
+
+    assert res["created"] == 3 and res["failed"] == 1
+    assert [k for op, k in ctx.storage.calls if k == NEXT_INDEX_KEY] == [NEXT_INDEX_KEY]
+    assert ctx.storage.get(NEXT_INDEX_KEY) == 3
+    addrs = [o["recv_addr"] for o in res["orders"] if o["ok"]]
+    assert addrs == [order_wallets.account_for(i).address for i in range(3)]
+
+
+def test_bulk_rejects_out_of_range_slippage_per_item(ctx):
+    symbol = LST_REGISTRY_BSC[0]["symbol"]
+    items = [
+        {"symbol_or_address": symbol, "recipient_address": RECIPIENT, "slippage_bps": bps}
+        for bps in (50, 10_000, -1, "x")
+    ]
+
+    res = create_managed_buys(ctx, items)
+
+    assert [o["ok"] for o in res["orders"]] == [True, False, False, False]
+    assert [o["index"] for o in res["orders"]] == [0, 1, 2, 3]
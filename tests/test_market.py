@@ -0,0 +1,41 @@
+from app import market, market_poller, prices
+from app.registry import LST_REGISTRY_BSC
+
+
+def test_onchain_tools_read_only_the_snapshot(monkeypatch):
+    def no_network(*a, **kw):
+        raise AssertionError("tool path made a network call")
+
+    monkeypatch.setattr(prices, "fetch_onchain_prices", no_network)
+    monkeypatch.setattr(prices, "fetch_reserves", no_network)
+    monkeypatch.setattr(prices, "multicall3", no_network)
+    monkeypatch.setattr(prices, "LST_PRICE_MODE", "onchain")
+
+    addr = LST_REGISTRY_BSC[0]["address"].lower()
+    chain = {
+        "bnb_usd": 600.0,
+        "price_bnb": {addr: 1.05},
+        "dex_price_bnb": {addr: 1.06},
+    }
+    monkeypatch.setattr(market_poller, "fetch_onchain_prices", lambda addrs: chain)
+    monkeypatch.setattr(market, "_current", None)
+    monkeypatch.setattr(market_poller, "_last", market.MarketSnapshot())
+    market_poller._merge(**market_poller.refresh_onchain(123))
+
+    info = prices.get_bnb_info()
+    assert info["price_usd"] == 600.0 and info["block"] == 123
+    row = next(r for r in prices.list_lst_tokens() if r["address"].lower() == addr)
+    assert row["price_bnb"] == 1.05 and row["dex_price_bnb"] == 1.06
+    assert row["price_source"] == "onchain"
+
+
+def test_onchain_mode_skips_router_dex_quotes(monkeypatch):
+    monkeypatch.setattr(market_poller, "LST_PRICE_MODE", "onchain")
+    monkeypatch.setattr(market_poller, "_fetch_bnb_info", lambda: {"price_usd": 600.0})
+    monkeypatch.setattr(market_poller, "fetch_lst_prices_bsc", lambda a, m: {})
+
+    def router(*a):
+        raise AssertionError("router quotes polled in on-chain mode")
+
+    monkeypatch.setattr(market_poller, "fetch_dex_prices_bnb", router)
+    assert "dex_prices" not in market_poller.refresh_prices()
@@ -0,0 +1,56 @@
+import pytest
+from eth_account.hdaccount import key_from_seed
+
+from app import order_wallets
+
+MNEMONIC = "test test test test test test test test test test test junk"
+
+
+def test_child_keys_match_full_path_derivation(monkeypatch):
+    monkeypatch.setattr(order_wallets, "ORDER_WALLET_MNEMONIC", MNEMONIC)
+    monkeypatch.setattr(order_wallets, "_seed", None)
+    monkeypatch.setattr(order_wallets, "_parent", None)
+    seed = order_wallets._get_seed()
+    for i in (0, 1, 41, 2**31 - 1):
+        assert order_wallets._key(i) == key_from_seed(seed, f"m/44'/60'/0'/0/{i}")
+    # Hardhat's well-known first account for this mnemonic.
+    assert (
+        order_wallets.Account.from_key(order_wallets._key(0)).address
+        == "0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266"
+    )
+
+
+class _Thread:
+    started = []
+
+    def __init__(self, target, args, daemon):
+        self.args = args
+
+    def start(self):
+        self.started.append(self.args)
+
+
+def test_pool_is_topped_up_after_every_allocation(monkeypatch):
+    monkeypatch.setattr(order_wallets.threading, "Thread", _Thread)
+    pool = order_wallets.AddressPool(size=4)
+    pool._addrs = {0: "a", 1: "b", 2: "c", 3: "d"}
+
+    assert pool.take(0) == "a"
+    pool.refill(1)
+
+    assert _Thread.started == [(1,)]
+
+
+def test_hd_orders_without_mnemonic_fail_the_startup_check(ctx, monkeypatch):
+    monkeypatch.setattr(order_wallets, "ORDER_WALLET_MNEMONIC", None)
+    order_wallets.check_hd_orders(ctx, [{"id": "a", "recv_priv": "0x11"}])
+
+    with pytest.raises(RuntimeError, match="ORDER_WALLET_MNEMONIC"):
+        order_wallets.check_hd_orders(ctx, [{"id": "b", "wallet_index": 0}])
+
+    ctx.storage.set(order_wallets.NEXT_INDEX_KEY, 3)
+    with pytest.raises(RuntimeError):
+        order_wallets.check_hd_orders(ctx, [])
+
+    monkeypatch.setattr(order_wallets, "ORDER_WALLET_MNEMONIC", MNEMONIC)
+    order_wallets.check_hd_orders(ctx, [{"id": "b", "wallet_index": 0}])
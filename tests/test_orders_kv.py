@@ -0,0 +1,99 @@
+import pytest
+
+from app import orders_kv
+from app.orders_kv import batch, mark_error, mark_refund_pending
+
+
+def _order(oid, status="pending", **kw):
+    return {
+        "id": oid,
+        "status": status,
+        "recv_addr": f"0x{oid}",
+        "recipient": "0xbeef",
+        "created_at": 1,
+        **kw,
+    }
+
+
+def _seed(ctx, *orders):
+    orders_kv._apply_kv(ctx, list(orders))
+    ctx.storage.calls.clear()
+
+
+def test_aborted_batch_writes_nothing(ctx):
+    _seed(ctx, _order("a"))
+    with pytest.raises(RuntimeError):
+        with batch(ctx):
+            mark_error(ctx, "a", "boom")
+            raise RuntimeError("abort")
+    # An unrelated write must not carry the aborted mutation to disk.
+    ctx.storage.set("other", 1)
+    stored = ctx.storage.get(orders_kv._key("a"))
+    assert stored["status"] == "pending"
+    assert "last_error" not in stored
+
+
+def test_batch_commits_with_one_save(ctx):
+    _seed(ctx, _order("a"), _order("b"))
+    saves = ctx.storage.saves
+    with batch(ctx):
+        mark_error(ctx, "a", "x")
+        mark_refund_pending(ctx, "a", "x")
+        mark_error(ctx, "b", "y")
+        assert ctx.storage.saves == saves
+    assert ctx.storage.saves == saves + 1
+    assert ctx.storage.calls == []
+    assert ctx.storage.get(orders_kv.JOURNAL_KEY) is None
+    assert ctx.storage.get(orders_kv._key("a"))["status"] == "refund_pending"
+    assert ctx.storage.get(orders_kv._key("b"))["attempts"] == 1
+
+
+def test_migrate_legacy_blob_with_one_save(ctx):
+    legacy = {f"o{i}": _order(f"o{i}") for i in range(50)}
+    legacy["o0"]["status"] = "complete"
+    ctx.storage.set(orders_kv.LEGACY_ORDERS_KEY, legacy)
+    saves = ctx.storage.saves
+
+    assert orders_kv.migrate_orders(ctx) == 50
+    assert ctx.storage.saves == saves + 1
+    assert ctx.storage.get(orders_kv.LEGACY_ORDERS_KEY) is None
+    assert len(orders_kv.list_active(ctx)) == 49
+
+
+def test_migrate_to_sqlite_replays_journal_first(ctx, sqlite_orders):
+    stale = _order("a", status="stale")
+    _seed(ctx, stale)
+    ctx.storage.set(orders_kv.JOURNAL_KEY, [_order("a"), _order("b", "complete", finished_at=2)])
+    ctx.storage.set(orders_kv.LEGACY_ORDERS_KEY, {"c": _order("c")})
+
+    assert orders_kv.migrate_orders(ctx) == 3
+    assert ctx.storage.data == {}
+    assert sorted(o["id"] for o in orders_kv.list_active(ctx)) == ["a", "c"]
+    assert orders_kv.get_order(ctx, "b")["status"] == "complete"
+    # Idempotent on the next startup.
+    assert orders_kv.migrate_orders(ctx) == 0
+
+
+def test_compact_archives_with_one_save(ctx):
+    old = [_order(f"d{i}", "complete", finished_at=1) for i in range(20)]
+    _seed(ctx, _order("a"), _order("fresh", "complete", finished_at=2**40), *old)
+    saves = ctx.storage.saves
+
+    assert orders_kv.compact_orders(ctx, older_than_s=0) == 20
+    assert ctx.storage.saves == saves + 1
+    assert ctx.storage.get(orders_kv._key("d0")) is None
+    assert orders_kv.get_order(ctx, "d0")["status"] == "complete"
+    assert orders_kv._done_entries(ctx) == [["fresh", 2**40]]
+
+
+def test_changelog_rotates_at_max_bytes(ctx, monkeypatch):
+    path = orders_kv.ORDERS_CHANGELOG_PATH
+    monkeypatch.setattr(orders_kv, "ORDERS_CHANGELOG_MAX_BYTES", 200)
+    _seed(ctx, _order("a"))
+    for i in range(10):
+        mark_error(ctx, "a", f"err {i}")
+
+    with open(path) as f:
+        assert len(f.read()) < 400
+    with open(path + ".1") as f:
+        assert f.read()
@@ -0,0 +1,158 @@
+import asyncio
+
+from app import receipts
+from app.orders_kv import _key, get_order
+from app.settlement import _budget, _legacy_tx
+
+SENT = {
+    "chainId": 56,
+    "to": "0x01",
+    "value": 10**16,
+    "gas": 200_000,
+    "gasPrice": 1_000_000_000,
+    "nonce": 0,
+    "data": "0x",
+}
+
+
+def _stuck_order(ctx):
+    o = {
+        "id": "o1",
+        "status": "broadcast",
+        "tx_hash": "0xold",
+        "broadcast_at": 1,
+        "token_address": "0x00000000000000000000000000000000000000aa",
+        "recipient": "0x000000000000000000000000000000000000beef",
+        "recv_priv": "0x" + "22" * 32,
+        "sent_tx": dict(SENT),
+    }
+    ctx.storage.set(_key("o1"), o)
+    return o
+
+
+def _rpc(monkeypatch, replies):
+    seen = []
+
+    async def fake_batch(calls):
+        seen.append(calls)
+        return [replies(method, params) for method, params in calls]
+
+    monkeypatch.setattr(receipts, "async_rpc_batch", fake_batch)
+    return seen
+
+
+def test_pending_tx_is_replaced_with_same_nonce_and_old_hash_kept(ctx, monkeypatch):
+    sent = []
+
+    async def fake_send(acct, tx):
+        sent.append(tx)
+        return "0xnew"
+
+    monkeypatch.setattr(receipts, "async_sign_and_send", fake_send)
+    # No receipt yet, but the node still has the tx in its mempool.
+    _rpc(
+        monkeypatch,
+        lambda m, p: {"result": {"hash": p[0]} if m == "eth_getTransactionByHash" else None},
+    )
+
+    assert asyncio.run(receipts.track_receipts(ctx, [_stuck_order(ctx)])) == []
+
+    assert sent[0]["nonce"] == SENT["nonce"]
+    assert sent[0]["gasPrice"] > SENT["gasPrice"] * 1.1
+    o = get_order(ctx, "o1")
+    assert o["status"] == "broadcast"
+    assert o["tx_hash"] == "0xnew" and o["prior_tx_hashes"] == ["0xold"]
+
+
+def test_receipt_of_a_replaced_hash_completes_the_order(ctx, monkeypatch):
+    o = _stuck_order(ctx)
+    o.update(tx_hash="0xnew", prior_tx_hashes=["0xold"])
+    ctx.storage.set(_key("o1"), dict(o))
+    receipt = {"status": "0x1", "gasUsed": hex(120_000), "logs": []}
+    seen = _rpc(monkeypatch, lambda m, p: {"result": receipt if p[0] == "0xold" else None})
+
+    assert asyncio.run(receipts.track_receipts(ctx, [o])) == []
+
+    assert [p[0] for _, p in seen[0]] == ["0xnew", "0xold"]
+    done = get_order(ctx, "o1")
+    assert done["status"] == "complete" and done["tx_hash"] == "0xold"
+
+
+def test_unknown_tx_is_resent_unchanged(ctx, monkeypatch):
+    sent = []
+
+    async def fake_send(acct, tx):
+        sent.append(tx)
+        return "0xold"
+
+    monkeypatch.setattr(receipts, "async_sign_and_send", fake_send)
+    _rpc(monkeypatch, lambda m, p: {"result": None})
+
+    asyncio.run(receipts.track_receipts(ctx, [_stuck_order(ctx)]))
+
+    assert sent == [SENT]
+    o = get_order(ctx, "o1")
+    assert o["tx_hash"] == "0xold" and not o.get("prior_tx_hashes")
+    assert o["broadcast_at"] > 1
+
+
+def _funded_wallet_send(balance, sent):
+    async def fake_send(acct, tx):
+        if tx["value"] + tx["gas"] * tx["gasPrice"] > balance:
+            raise RuntimeError("insufficient funds for gas * price + value")
+        sent.append(tx)
+        return "0xnew"
+
+    return fake_send
+
+
+def test_replacement_fits_the_wallet_balance(ctx, monkeypatch):
+    # Settlement funds value + gas_limit × gas price × GAS_BUDGET_MULTIPLIER;
+    # the tx goes out with _tx_gas(gas_limit).
+    gas_limit, gas_price, amount_in = 150_000, 1_000_000_000, 10**16
+    balance = amount_in + _budget(gas_limit, gas_price)
+    o = _stuck_order(ctx)
+    o["sent_tx"] = _legacy_tx(
+        {"to": "0x" + "01" * 20, "value": amount_in, "data": "0x"}, gas_limit, gas_price, 7
+    )
+    ctx.storage.set(_key("o1"), dict(o))
+    sent = []
+    monkeypatch.setattr(receipts, "async_sign_and_send", _funded_wallet_send(balance, sent))
+    _rpc(
+        monkeypatch,
+        lambda m, p: {"result": {"hash": p[0]} if m == "eth_getTransactionByHash" else None},
+    )
+
+    asyncio.run(receipts.track_receipts(ctx, [o]))
+
+    assert len(sent) == 1
+    assert sent[0]["gasPrice"] > gas_price and sent[0]["nonce"] == 7
+    assert get_order(ctx, "o1")["tx_hash"] == "0xnew"
+
+
+def test_refused_replacement_counts_and_waits(ctx, monkeypatch):
+    o = _stuck_order(ctx)
+    monkeypatch.setattr(receipts, "async_sign_and_send", _funded_wallet_send(0, []))
+    _rpc(
+        monkeypatch,
+        lambda m, p: {"result": {"hash": p[0]} if m == "eth_getTransactionByHash" else None},
+    )
+
+    asyncio.run(receipts.track_receipts(ctx, [o]))
+
+    o = get_order(ctx, "o1")
+    assert o["tx_hash"] == "0xold" and o["replacements"] == 1
+    assert o["broadcast_at"] > 1 and "insufficient funds" in o["last_error"]
+
+
+def test_onchain_revert_is_one_commit(ctx, monkeypatch):
+    o = _stuck_order(ctx)
+    receipt = {"status": "0x0", "gasUsed": hex(90_000), "logs": []}
+    _rpc(monkeypatch, lambda m, p: {"result": receipt})
+    saves = ctx.storage.saves
+
+    assert asyncio.run(receipts.track_receipts(ctx, [o])) == ["o1"]
+
+    assert ctx.storage.saves == saves + 1
+    o = get_order(ctx, "o1")
+    assert o["status"] == "refund_pending" and o["attempts"] == 1
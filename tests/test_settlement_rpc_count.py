@@ -0,0 +1,86 @@
+"""
+Round trips a funded order costs in try_settle_one once the tick's pre-pass
+has supplied balance, nonce, reserves and gas price. Every JSON-RPC request
+(single or batched) counts as one round trip.
+"""
+
+import asyncio
+import sys
+
+import pytest
+from eth_abi import encode
+
+from app import settlement
+from app.config import GAS_MODEL_MIN_SAMPLES
+from app.gas_model import record_gas_used
+
+TOKEN = "0x00000000000000000000000000000000000000aa"
+BAL = 10**17
+RESERVES = (10**21, 5 * 10**23)
+
+
+class RpcCounter:
+    def __init__(self):
+        self.methods = []
+
+    def reply(self, method, params):
+        if method == "eth_estimateGas":
+            return {"result": hex(150_000)}
+        if method == "eth_call":
+            return {"result": "0x" + encode(["uint256[]"], [[BAL, 10**18]]).hex()}
+        if method == "eth_sendRawTransaction":
+            return {"result": "0x" + "ab" * 32}
+        return {"result": "0x1"}
+
+    async def rpc(self, method, params):
+        self.methods.append(method)
+        return self.reply(method, params)
+
+    async def rpc_batch(self, calls):
+        self.methods.append(tuple(m for m, _ in calls))
+        return [self.reply(m, p) for m, p in calls]
+
+
+@pytest.fixture
+def rpc_counter(monkeypatch):
+    counter = RpcCounter()
+    for name, mod in list(sys.modules.items()):
+        if not name.startswith("app.") or mod is None:
+            continue
+        if hasattr(mod, "async_rpc"):
+            monkeypatch.setattr(mod, "async_rpc", counter.rpc)
+        if hasattr(mod, "async_rpc_batch"):
+            monkeypatch.setattr(mod, "async_rpc_batch", counter.rpc_batch)
+    return counter
+
+
+def _order():
+    return {
+        "id": "o1",
+        "status": "pending",
+        "symbol": "TKN",
+        "token_address": TOKEN,
+        "recipient": "0x000000000000000000000000000000000000bEEF",
+        "recv_addr": "0x1563915e194D8CfBA1943570603F7606A3115508",
+        "recv_priv": "0x" + "22" * 32,
+        "slippage_bps": 50,
+        "slippage_auto": False,
+    }
+
+
+def _settle(ctx):
+    return asyncio.run(
+        settlement.try_settle_one(ctx, _order(), BAL, 0, RESERVES, 1_000_000_000)
+    )
+
+
+def test_cold_token_costs_two_round_trips_before_broadcast(ctx, rpc_counter):
+    assert _settle(ctx) is not None
+    assert rpc_counter.methods == ["eth_estimateGas", "eth_call", "eth_sendRawTransaction"]
+
+
+def test_warm_gas_model_skips_estimate(ctx, rpc_counter):
+    for _ in range(GAS_MODEL_MIN_SAMPLES):
+        record_gas_used(ctx, TOKEN, 140_000)
+    assert _settle(ctx) is not None
+    assert rpc_counter.methods == ["eth_call", "eth_sendRawTransaction"]